@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(SCRIPTS_DIR, "..")
+sys.path.append(os.path.join(ROOT_DIR, "src"))
+
+from benchmark_suite import DEFAULT_DB, canned_reply, load_corpus, prepare_database
+
+LAYOUTS = ("pruned", "prefix")
+
+def run_layout(ctx, questions, layout, make_llm):
+    """Send the write_query prompt of every question in order; prompt and prefill figures for the layout"""
+    from chain import build_query_prompt, select_tables
+
+    os.environ["PROMPT_LAYOUT"] = layout
+    llm = make_llm()
+    if llm is not None:
+        ctx.use_llm(llm, "ollama")
+    llm = ctx.llm
+
+    calls = []
+    for question in questions:
+        state = {"question": question, **select_tables({"question": question})}
+        prompt = build_query_prompt(question, ctx.schema_cache.get_table_info(state["tables"] or None))
+        start = time.perf_counter()
+        response = llm.invoke(prompt)
+        metadata = response.response_metadata or {}
+        calls.append({
+            "ms": (time.perf_counter() - start) * 1000,
+            # Reported by Ollama: tokens actually evaluated and the time spent on them
+            "prompt_eval_count": metadata.get("prompt_eval_count"),
+            "prompt_eval_ms": metadata["prompt_eval_duration"] / 1e6 if metadata.get("prompt_eval_duration") else None,
+        })
+
+    result = {
+        "layout": layout,
+        "calls": len(calls),
+        "mean_ms": round(sum(call["ms"] for call in calls) / len(calls), 2),
+        "mean_ms_after_first": round(sum(call["ms"] for call in calls[1:]) / max(len(calls) - 1, 1), 2),
+    }
+    if hasattr(llm, "cached_tokens"):
+        result.update({
+            "prompt_tokens": llm.prompt_tokens,
+            "cached_tokens": llm.cached_tokens,
+            "prefill_tokens": llm.prompt_tokens - llm.cached_tokens,
+            "prefill_ms": round((llm.prompt_tokens - llm.cached_tokens) * llm.token_latency * 1000, 2),
+        })
+    evaluated = [call for call in calls if call["prompt_eval_ms"] is not None]
+    if evaluated:
+        result.update({
+            "prefill_tokens": sum(call["prompt_eval_count"] or 0 for call in evaluated),
+            "prefill_ms": round(sum(call["prompt_eval_ms"] for call in evaluated), 2),
+        })
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefill work per layout: full schema prefix versus per-question pruned schema")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite Chinook file, built from the dump if missing")
+    parser.add_argument("--live", action="store_true", help="use the configured Ollama backend instead of the fake model")
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="fake model seconds per call")
+    parser.add_argument("--token-latency", type=float, default=0.0005, help="fake model seconds per uncached prompt token")
+    parser.add_argument("--limit", type=int, default=0, help="only the first N questions")
+    parser.add_argument("-o", "--output", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    if not args.live:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(prepare_database(args.db, False))}"
+    os.environ.setdefault("FEW_SHOT", "1")
+    os.environ["FEW_SHOT_PATH"] = ""
+
+    from app_context import get_context
+    from fake_llm import FakeChatModel
+
+    corpus = load_corpus()
+    questions = [entry["question"] for entry in corpus][:args.limit or None]
+    ctx = get_context()
+
+    def make_llm():
+        if args.live:
+            return None
+        return FakeChatModel(
+            model="fake-prefill", reply=canned_reply(corpus), latency=args.llm_latency,
+            token_latency=args.token_latency, prefix_cache=True,
+        )
+
+    results = [run_layout(ctx, questions, layout, make_llm) for layout in LAYOUTS]
+
+    print(f"{len(questions)} questions, {'live ' + ctx.model_id if args.live else 'fake model with a prefix cache'}")
+    print(f"{'layout':<8} {'prefill tokens':>15} {'prefill ms':>11} {'mean ms':>9} {'mean ms (warm)':>15}")
+    for result in results:
+        print(f"{result['layout']:<8} {result.get('prefill_tokens', '-'):>15} {result.get('prefill_ms', '-'):>11} "
+              f"{result['mean_ms']:>9} {result['mean_ms_after_first']:>15}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
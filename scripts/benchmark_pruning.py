@@ -0,0 +1,79 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+QUESTIONS = [
+    "How many artists are there?",
+    "List the 5 longest tracks",
+    "Which genre has the most tracks?",
+    "What are the total sales by country?",
+    "Which employee supports the most customers?",
+    "How many tracks are in each playlist?",
+    "Which artist has the most albums?",
+    "What is the most common media type?",
+]
+
+def prompt_text(prompt):
+    return "\n".join(message.content for message in prompt.to_messages())
+
+def run_case(ctx, question, tables, call_llm):
+    """Prompt tokens and LLM latency for one question and table set"""
+    from chain import build_query_prompt
+    from text_index import estimate_tokens
+
+    table_info = ctx.schema_cache.get_table_info(tables)
+    prompt = build_query_prompt(question, table_info)
+    tokens = estimate_tokens(prompt_text(prompt))
+
+    latency = None
+    if call_llm:
+        start = time.perf_counter()
+        ctx.llm.invoke(prompt)
+        latency = time.perf_counter() - start
+    return tokens, latency
+
+def summarize(label, tokens, latencies):
+    line = f"{label:<10} prompt tokens: mean {statistics.mean(tokens):8.1f}  max {max(tokens):6d}"
+    if latencies:
+        line += f"  |  latency: mean {statistics.mean(latencies):6.2f}s  max {max(latencies):6.2f}s"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SQL prompt size and latency with and without table pruning")
+    parser.add_argument("--no-llm", action="store_true", help="only count prompt tokens, skip LLM calls")
+    parser.add_argument("--top-k", type=int, default=None, help="tables kept before adding FK neighbors")
+    args = parser.parse_args()
+
+    from app_context import get_context
+
+    ctx = get_context().warm()
+    all_tables = ctx.schema_cache.get_usable_table_names()
+    results = {"full": ([], []), "pruned": ([], [])}
+    selection_times = []
+
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        pruned_tables = ctx.table_selector.select(question, k=args.top_k)
+        selection_times.append(time.perf_counter() - start)
+
+        for label, tables in (("full", all_tables), ("pruned", pruned_tables)):
+            tokens, latency = run_case(ctx, question, tables, not args.no_llm)
+            results[label][0].append(tokens)
+            if latency is not None:
+                results[label][1].append(latency)
+
+        print(f"{question}\n  -> {', '.join(pruned_tables)}")
+
+    print("\nResults")
+    print("=" * 30)
+    print(f"LLM: {ctx.llm_type.upper()}, {len(all_tables)} tables, {len(QUESTIONS)} questions")
+    for label, (tokens, latencies) in results.items():
+        summarize(label, tokens, latencies)
+    print(f"Table selection: mean {statistics.mean(selection_times) * 1000:.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+def legacy_discovery():
+    """The old startup path: a full generation against each Ollama model in turn"""
+    from langchain_ollama import ChatOllama
+    from llm_config import OLLAMA_MODELS
+
+    for model in OLLAMA_MODELS:
+        try:
+            llm = ChatOllama(
+                model=model,
+                base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+                temperature=0,
+            )
+            response = llm.invoke("Create a PostgreSQL query to count records in table 'artist'. Return only SQL:")
+            if "select" in response.content.lower():
+                return llm
+        except Exception:
+            continue
+    return None
+
+def timed(func, runs):
+    times = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, times
+
+def report(label, times):
+    print(f"{label:<28} mean {statistics.mean(times) * 1000:10.1f} ms  min {min(times) * 1000:10.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure LLM backend discovery time at startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--legacy", action="store_true", help="also time the old sequential generation probes")
+    parser.add_argument("--first-request", action="store_true", help="also time the first real LLM request")
+    args = parser.parse_args()
+
+    os.environ["LLM_STATE_FILE"] = os.path.join(tempfile.mkdtemp(), "llm_backend.json")
+    from llm_config import clear_backend_state, get_available_llm
+
+    print("Startup Benchmark")
+    print("=" * 30)
+
+    def cold():
+        clear_backend_state()
+        return get_available_llm()
+
+    (llm, llm_type), times = timed(cold, args.runs)
+    print(f"Backend: {llm_type.upper()} ({getattr(llm, 'model', None) or getattr(llm, 'model_name', '')})")
+    report("Discovery (no state file)", times)
+
+    _, times = timed(get_available_llm, args.runs)
+    report("Discovery (cached state)", times)
+
+    if args.first_request:
+        start = time.perf_counter()
+        llm.invoke("Return only: SELECT 1")
+        report("First request (model load)", [time.perf_counter() - start])
+
+    if args.legacy:
+        _, times = timed(legacy_discovery, 1)
+        report("Legacy sequential probes", times)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(SCRIPTS_DIR, "..")
+sys.path.append(os.path.join(ROOT_DIR, "src"))
+
+from chinook_dump import find_dump, load_sqlite, parse_dump
+from load_test import percentile
+
+CORPUS_FILE = os.path.join(ROOT_DIR, "data", "chinook_questions.jsonl")
+DEFAULT_DB = os.path.join(ROOT_DIR, "data", "chinook.db")
+RESULTS_DIR = os.path.join(ROOT_DIR, "data", "benchmarks")
+ANSWER_MARKERS = ("Database Result:", "Query Result:")
+
+def load_corpus(path=CORPUS_FILE):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def canned_reply(corpus):
+    """Deterministic LLM: the corpus SQL for a SQL prompt, a fixed sentence for an answer prompt"""
+    by_question = sorted(((item["question"], item["sql"]) for item in corpus), key=lambda pair: -len(pair[0]))
+
+    def reply(prompt):
+        if any(marker in prompt for marker in ANSWER_MARKERS):
+            return "Here is the answer based on the query result."
+        # Few-shot examples also start with "Question:", the asked one comes last
+        asked = prompt.rsplit("Question:", 1)[-1]
+        for question, sql in by_question:
+            if question in asked:
+                return sql
+        return "SELECT 1"
+
+    return reply
+
+def prepare_database(db_path, rebuild):
+    if rebuild or not os.path.exists(db_path):
+        dump = find_dump() or os.path.join(ROOT_DIR, "data", "Chinook_PostgreSql.sql")
+        start = time.perf_counter()
+        load_sqlite(parse_dump(dump), db_path)
+        print(f"Built {db_path} from {dump} in {time.perf_counter() - start:.1f}s")
+    return db_path
+
+class RecordCollector(logging.Handler):
+    """Keeps the per-request JSON lines written by the instrumentation"""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(json.loads(record.getMessage()))
+
+def summarize_ms(values):
+    if not values:
+        return {}
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p90": round(percentile(values, 90), 3),
+        "p99": round(percentile(values, 99), 3),
+        "mean": round(statistics.mean(values), 3),
+        "max": round(max(values), 3),
+    }
+
+async def run_level(graph, questions, concurrency):
+    """Answer every question with `concurrency` workers; per-request latencies in ms and wall time"""
+    pending = iter(questions)
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        for item in pending:
+            start = time.perf_counter()
+            try:
+                await graph.ainvoke({"question": item["question"]})
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+def stage_summary(records):
+    stages, tokens = {}, {"prompt": 0, "completion": 0}
+    cache = {"query_cache_hits": 0, "result_cache_hits": 0, "llm_answer_calls": 0}
+    for record in records:
+        for stage, ms in record.get("stages", {}).items():
+            stages.setdefault(stage, []).append(ms)
+        for llm in record.get("llm", {}).values():
+            tokens["prompt"] += llm["prompt_tokens"]
+            tokens["completion"] += llm["completion_tokens"]
+        cache["query_cache_hits"] += record.get("query_cache") == "hit"
+        cache["result_cache_hits"] += record.get("result_cache") == "hit"
+        cache["llm_answer_calls"] += record.get("answer_path") == "llm"
+    return {stage: summarize_ms(values) for stage, values in sorted(stages.items())}, tokens, cache
+
+def reset_caches(ctx):
+    for cache in (ctx.query_cache, ctx.semantic_cache, ctx.result_cache):
+        if cache is not None:
+            cache.invalidate()
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(run["concurrency"], run["pass"]): run for run in baseline["runs"]}
+
+    print(f"\nCompared with {baseline.get('label') or baseline_path}")
+    for run in results["runs"]:
+        old = previous.get((run["concurrency"], run["pass"]))
+        if old is None:
+            continue
+        def change(new, before):
+            return f"{(new - before) / before * 100:+6.1f}%" if before else "   n/a"
+        print(
+            f"c={run['concurrency']:<3} pass {run['pass']}  "
+            f"p50 {change(run['latency_ms']['p50'], old['latency_ms']['p50'])}  "
+            f"p99 {change(run['latency_ms']['p99'], old['latency_ms']['p99'])}  "
+            f"throughput {change(run['throughput_rps'], old['throughput_rps'])}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline NL->SQL benchmark with a fake LLM and a local SQLite Chinook")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite file built from the Chinook dump")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the SQLite file from the dump")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--passes", type=int, default=2, help="passes per level; pass 1 starts with empty caches")
+    parser.add_argument("--repeat", type=int, default=1, help="times the corpus is asked per pass")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM seconds per call")
+    parser.add_argument("--token-latency", type=float, default=0.0001, help="fake LLM seconds per prompt token")
+    parser.add_argument("--trace-memory", action="store_true", help="track peak Python heap with tracemalloc")
+    parser.add_argument("--label", default="", help="name stored with the results")
+    parser.add_argument("--output", default=None, help="results JSON path")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    db_path = prepare_database(os.path.abspath(args.db), args.rebuild)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    # Caches live in memory only, so every run starts from the same state
+    os.environ["QUERY_CACHE_PATH"] = ""
+    os.environ["SEMANTIC_CACHE_PATH"] = ""
+    os.environ["RESULT_CACHE_LISTEN"] = "0"
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    from app_context import get_context
+    from chain import graph_builder
+    from fake_llm import FakeChatModel
+    from instrumentation import request_log
+
+    corpus = load_corpus()
+    llm = FakeChatModel(
+        model="benchmark",
+        reply=canned_reply(corpus),
+        latency=args.llm_latency,
+        token_latency=args.token_latency,
+    )
+    ctx = get_context().use_llm(llm, "ollama")
+
+    start = time.perf_counter()
+    ctx.warm()
+    warm_ms = (time.perf_counter() - start) * 1000
+
+    collector = RecordCollector()
+    request_log.addHandler(collector)
+    request_log.setLevel(logging.INFO)
+    request_log.propagate = False
+
+    questions = corpus * args.repeat
+    results = {
+        "label": args.label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "questions": len(questions),
+            "passes": args.passes,
+            "llm_latency": args.llm_latency,
+            "token_latency": args.token_latency,
+            "env": {name: os.getenv(name) for name in (
+                "QUERY_CACHE", "SEMANTIC_CACHE", "RESULT_CACHE", "FAST_PATH",
+                "SINGLE_FLIGHT", "RESULT_TOKEN_BUDGET", "FEW_SHOT", "PROMPT_LAYOUT",
+            )},
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "warm_ms": round(warm_ms, 3),
+        "runs": [],
+    }
+
+    print("Benchmark")
+    print("=" * 30)
+    print(f"{len(questions)} questions, fake LLM {args.llm_latency * 1000:.0f} ms + {args.token_latency * 1000:.2f} ms/token")
+    for concurrency in [int(level) for level in args.concurrency.split(",")]:
+        reset_caches(ctx)
+        for number in range(1, args.passes + 1):
+            collector.records = []
+            latencies, errors, elapsed = asyncio.run(run_level(graph_builder, questions, concurrency))
+            stages, tokens, cache = stage_summary(collector.records)
+            run = {
+                "concurrency": concurrency,
+                "pass": number,
+                "requests": len(latencies),
+                "errors": errors,
+                "elapsed_s": round(elapsed, 3),
+                "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+                "latency_ms": summarize_ms(latencies),
+                "stages_ms": stages,
+                "llm_tokens": tokens,
+                "cache": cache,
+            }
+            results["runs"].append(run)
+            print(
+                f"c={concurrency:<3} pass {number}  p50 {run['latency_ms']['p50']:8.1f} ms  "
+                f"p99 {run['latency_ms']['p99']:8.1f} ms  {run['throughput_rps']:7.1f} req/s  "
+                f"prompt tokens {tokens['prompt']}"
+            )
+
+    results["memory"] = {"max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    if args.trace_memory:
+        results["memory"]["python_peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    print(f"Peak memory: {results['memory']}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{args.label or 'run'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
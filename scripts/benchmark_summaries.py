@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import sys
+import time
+import sqlalchemy
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(SCRIPTS_DIR, "..")
+sys.path.append(os.path.join(ROOT_DIR, "src"))
+
+from bulk_load import key_offsets
+from chinook_dump import find_dump, load_sqlite, parse_dump
+from index_advisor import run_time
+from summaries import SUMMARIES, create_summaries, refresh_all
+
+DEFAULT_DB = os.path.join(ROOT_DIR, "data", "chinook_scaled.db")
+
+def scale_dump(dump, scale):
+    """The dump with scale - 1 key-shifted copies of every row, the same replicas bulk_load writes"""
+    offsets = key_offsets(dump)
+    rows = {}
+    for table, original in dump["rows"].items():
+        shifts = offsets.get(table, {})
+        scaled = list(original)
+        for copy in range(1, scale if shifts else 1):
+            for row in original:
+                row = list(row)
+                for position, shift in shifts.items():
+                    if row[position] is not None:
+                        row[position] += copy * shift
+                scaled.append(tuple(row))
+        rows[table] = scaled
+    return {**dump, "rows": rows}
+
+def append_rows(engine, table, key, count):
+    """Copy the first `count` rows of the table under new ids, as fresh facts for an incremental refresh"""
+    columns = [column["name"] for column in sqlalchemy.inspect(engine).get_columns(table)]
+    select = ", ".join(f"{column} + :shift" if column == key else column for column in columns)
+    with engine.begin() as conn:
+        shift = conn.execute(sqlalchemy.text(f"SELECT MAX({key}) FROM {table}")).scalar()
+        conn.execute(
+            sqlalchemy.text(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {select} FROM {table} ORDER BY {key} LIMIT :count"),
+            {"shift": shift, "count": count},
+        )
+
+def timed_refresh(engine, mode):
+    start = time.perf_counter()
+    rows = refresh_all(engine, mode)
+    return {"ms": round((time.perf_counter() - start) * 1000, 2), "modes": {row["name"]: row["mode"] for row in rows}}
+
+def compare_queries(engine, repeat):
+    """Best-of-N time for each aggregate computed from the base tables and read from its summary"""
+    results = {}
+    with engine.connect() as conn:
+        for name, summary in SUMMARIES.items():
+            order = summary["additive"][0]
+            raw = f"SELECT * FROM ({summary['query'].format(where='')}) s ORDER BY {order} DESC LIMIT 10"
+            stored = f"SELECT * FROM {name} ORDER BY {order} DESC LIMIT 10"
+            raw_ms = run_time(conn, raw, repeat)
+            stored_ms = run_time(conn, stored, repeat)
+            results[name] = {
+                "raw_ms": round(raw_ms, 3),
+                "summary_ms": round(stored_ms, 3),
+                "speedup": round(raw_ms / stored_ms, 1) if stored_ms else None,
+            }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure summary table refresh cost and query latency against the base tables")
+    parser.add_argument("--url", default=None, help="database to use instead of a scaled SQLite copy, e.g. $DATABASE_URL")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite file to build")
+    parser.add_argument("--scale", type=int, default=20, help="copies of the Chinook rows in the SQLite file")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the SQLite file even if it exists")
+    parser.add_argument("--append", type=int, default=1000, help="new driver rows before the incremental refresh")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    if args.url:
+        engine = sqlalchemy.create_engine(args.url)
+    else:
+        if args.rebuild or not os.path.exists(args.db):
+            dump = find_dump() or os.path.join(ROOT_DIR, "data", "Chinook_PostgreSql.sql")
+            start = time.perf_counter()
+            load_sqlite(scale_dump(parse_dump(dump), args.scale), args.db)
+            print(f"Built {args.db} at scale {args.scale} in {time.perf_counter() - start:.1f}s")
+        engine = sqlalchemy.create_engine(f"sqlite:///{args.db}")
+
+    create_summaries(engine)
+    results = {"full_refresh": timed_refresh(engine, "full"), "noop_refresh": timed_refresh(engine, "incremental")}
+    for table, _, key in {summary["driver"] for summary in SUMMARIES.values()}:
+        append_rows(engine, table, key, args.append)
+    results["incremental_refresh"] = timed_refresh(engine, "incremental")
+    results["queries"] = compare_queries(engine, args.repeat)
+
+    print(f"Full refresh         {results['full_refresh']['ms']:>9.1f} ms")
+    print(f"Refresh, no changes  {results['noop_refresh']['ms']:>9.1f} ms")
+    print(f"Refresh, +{args.append} rows {results['incremental_refresh']['ms']:>9.1f} ms")
+    print()
+    print(f"{'summary':<28} {'base tables':>12} {'summary':>10} {'speedup':>8}")
+    for name, row in results["queries"].items():
+        print(f"{name:<28} {row['raw_ms']:>9.2f} ms {row['summary_ms']:>7.2f} ms {row['speedup']:>7}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
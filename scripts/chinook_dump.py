@@ -0,0 +1,155 @@
+import decimal
+import os
+import re
+import sqlite3
+
+DUMP_FILES = [
+    "scripts/Chinook_PostgreSql.sql",
+    "data/Chinook_PostgreSql.sql",
+    "Chinook_PostgreSql.sql",
+]
+
+CREATE_TABLE = re.compile(r"CREATE\s+TABLE\s+(\w+)\s*\((.*)\)\s*$", re.S | re.I)
+FOREIGN_KEY = re.compile(r"ALTER\s+TABLE\s+(\w+)\s+ADD\s+(CONSTRAINT\s+\w+\s+FOREIGN\s+KEY.*)$", re.S | re.I)
+CREATE_INDEX = re.compile(r"CREATE\s+(UNIQUE\s+)?INDEX\s+\w+\s+ON\s+(\w+)", re.I)
+INSERT = re.compile(r"INSERT\s+INTO\s+(\w+)\s*\(([^)]*)\)\s*VALUES\s*(.*)$", re.S | re.I)
+NUMBER = re.compile(r"-?\d+(\.\d+)?")
+SLASH_DATE = re.compile(r"(\d{4})/(\d{1,2})/(\d{1,2})")
+
+def find_dump():
+    for path in DUMP_FILES:
+        if os.path.exists(path):
+            return path
+    return None
+
+def split_statements(text):
+    """Top-level statements, with comments dropped and quoted semicolons kept"""
+    statements, current = [], []
+    i, n = 0, len(text)
+    while i < n:
+        char = text[i]
+        if char == "'":
+            end = i + 1
+            while end < n:
+                if text[end] == "'":
+                    if end + 1 < n and text[end + 1] == "'":
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(text[i:end + 1])
+            i = end + 1
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = end + 2 if end != -1 else n
+        elif text.startswith("--", i):
+            end = text.find("\n", i)
+            i = end if end != -1 else n
+        elif char == ";":
+            statements.append("".join(current).strip())
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    tail = "".join(current).strip()
+    if tail:
+        statements.append(tail)
+    return [statement for statement in statements if statement]
+
+def parse_values(text):
+    """Rows from the VALUES list of an INSERT: strings, integers, decimals and NULL"""
+    rows, row = [], None
+    i, n = 0, len(text)
+    while i < n:
+        char = text[i]
+        if char.isspace() or char == ",":
+            i += 1
+        elif char == "(":
+            row = []
+            i += 1
+        elif char == ")":
+            rows.append(tuple(row))
+            row = None
+            i += 1
+        elif char == "'" or (char in "Nn" and text.startswith("'", i + 1)):
+            i += 2 if char != "'" else 1
+            parts = []
+            while True:
+                end = text.index("'", i)
+                parts.append(text[i:end])
+                if text.startswith("'", end + 1):
+                    parts.append("'")
+                    i = end + 2
+                    continue
+                i = end + 1
+                break
+            row.append("".join(parts))
+        elif text[i:i + 4].upper() == "NULL":
+            row.append(None)
+            i += 4
+        else:
+            match = NUMBER.match(text, i)
+            if match is None:
+                raise ValueError(f"Unexpected value near: {text[i:i + 40]!r}")
+            value = match.group(0)
+            row.append(decimal.Decimal(value) if match.group(1) else int(value))
+            i = match.end()
+    return rows
+
+def parse_dump(path):
+    """Tables, foreign keys, indexes and rows from the Chinook PostgreSQL dump, parsed once"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+
+    dump = {"tables": {}, "foreign_keys": [], "indexes": [], "columns": {}, "rows": {}}
+    for statement in split_statements(text):
+        if match := CREATE_TABLE.match(statement):
+            dump["tables"][match.group(1)] = statement
+        elif match := FOREIGN_KEY.match(statement):
+            dump["foreign_keys"].append((match.group(1), match.group(2), statement))
+        elif match := CREATE_INDEX.match(statement):
+            dump["indexes"].append((match.group(2), statement))
+        elif match := INSERT.match(statement):
+            table = match.group(1)
+            dump["columns"][table] = [column.strip() for column in match.group(2).split(",")]
+            dump["rows"].setdefault(table, []).extend(parse_values(match.group(3)))
+    return dump
+
+def _sqlite_value(value):
+    """SQLite has no DECIMAL and only understands ISO dates"""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, str) and (match := SLASH_DATE.fullmatch(value)):
+        year, month, day = match.groups()
+        return f"{year}-{int(month):02d}-{int(day):02d} 00:00:00"
+    return value
+
+def load_sqlite(dump, db_path):
+    """Write the dump into a SQLite file, with foreign keys inlined so they show in the schema"""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        for table, create in dump["tables"].items():
+            body = CREATE_TABLE.match(create).group(2).rstrip()
+            constraints = [constraint for name, constraint, _ in dump["foreign_keys"] if name == table]
+            for constraint in constraints:
+                constraint = re.sub(r"\s+ON\s+(DELETE|UPDATE)\s+NO\s+ACTION", "", constraint, flags=re.I)
+                body += ",\n    " + " ".join(constraint.split())
+            conn.execute(f"CREATE TABLE {table}\n(\n    {body.strip()}\n)")
+        for table, rows in dump["rows"].items():
+            columns = dump["columns"][table]
+            placeholders = ", ".join("?" for _ in columns)
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                ([_sqlite_value(value) for value in row] for row in rows),
+            )
+        for _, create in dump["indexes"]:
+            conn.execute(create)
+        conn.commit()
+    finally:
+        conn.close()
+    return db_path
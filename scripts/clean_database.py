@@ -1,7 +1,7 @@
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-import subprocess
 import os
+import sys
 
 def clean_and_recreate_database():
     """Clean and recreate database with correct encoding"""
@@ -41,38 +41,30 @@ def clean_and_recreate_database():
         return False
 
 def import_chinook_data():
-    """Import Chinook data from SQL file"""
-    sql_files = [
-        "scripts/Chinook_PostgreSql.sql",
-        "data/Chinook_PostgreSql.sql", 
-        "Chinook_PostgreSql.sql"
-    ]
-    
-    sql_file = None
-    for file_path in sql_files:
-        if os.path.exists(file_path):
-            sql_file = file_path
-            break
+    """Import Chinook data: parse the dump once and COPY the rows in, CHINOOK_SCALE copies of them"""
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from bulk_load import bulk_load, print_report
+    from chinook_dump import find_dump, parse_dump
     
+    sql_file = find_dump()
     if not sql_file:
         print("Chinook SQL file not found")
         return create_sample_data()
     
     try:
-        env = os.environ.copy()
-        env["PGPASSWORD"] = "nooveel"
-        env["PGCLIENTENCODING"] = "UTF8"
-        
-        cmd = [
-            "psql",
-            "-h", "localhost",
-            "-U", "postgres",
-            "-d", "chinook",
-            "-f", sql_file,
-            "--set", "ON_ERROR_STOP=off"
-        ]
-        
-        result = subprocess.run(cmd, env=env, capture_output=True, text=True, encoding='utf-8')
+        conn = psycopg2.connect(
+            host="localhost",
+            port=5432,
+            database="chinook",
+            user="postgres",
+            password="nooveel",
+            client_encoding="utf8"
+        )
+        try:
+            report = bulk_load(conn, parse_dump(sql_file), scale=int(os.getenv("CHINOOK_SCALE", "1")))
+        finally:
+            conn.close()
+        print_report(report)
         return True
         
     except Exception as e:
@@ -160,6 +152,32 @@ def create_sample_data():
         print(f"Error creating sample data: {e}")
         return False
 
+def install_change_triggers():
+    """NOTIFY on writes to any table, so running services can drop stale cached results"""
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+    from result_cache import notify_trigger_sql
+    
+    try:
+        conn = psycopg2.connect(
+            host="localhost",
+            port=5432,
+            database="chinook",
+            user="postgres",
+            password="nooveel",
+            client_encoding="utf8"
+        )
+        cursor = conn.cursor()
+        cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_type = 'BASE TABLE'")
+        for statement in notify_trigger_sql([row[0] for row in cursor.fetchall()]):
+            cursor.execute(statement)
+        conn.commit()
+        conn.close()
+        return True
+        
+    except Exception as e:
+        print(f"Error installing change triggers: {e}")
+        return False
+
 def verify_database():
     """Verify database tables and data"""
     try:
@@ -206,6 +224,8 @@ if __name__ == "__main__":
         print("Database created successfully")
         if import_chinook_data():
             print("Data imported successfully")
+        if install_change_triggers():
+            print("Change notification triggers installed")
         verify_database()
     else:
         print("Failed to create database")
\ No newline at end of file
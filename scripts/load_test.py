@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import time
+from collections import Counter
+import httpx
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "chinook_questions.jsonl")
+
+def load_questions(path=CORPUS_FILE):
+    """Questions from a JSONL file of {"question": ...} objects, the benchmark corpus by default"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["question"] for line in f if line.strip()]
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+async def worker(client, url, questions, use_cache, results):
+    for question in questions:
+        start = time.perf_counter()
+        body = {}
+        try:
+            response = await client.post(url, json={"question": question, "use_cache": use_cache})
+            status = response.status_code
+            if status == 200:
+                body = response.json()
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        results.append((status, time.perf_counter() - start, body))
+
+async def run(url, questions, total, concurrency, timeout, use_cache=True):
+    shared = itertools.islice(itertools.cycle(questions), total)
+    results = []
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, url, shared, use_cache, results) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return results, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the SQL Q&A HTTP service")
+    parser.add_argument("--url", default="http://localhost:8000/ask")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--questions", default=CORPUS_FILE, help="JSONL questions, cycled (default: the benchmark corpus)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="skip the server's question, semantic and result caches so every request runs the full pipeline")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    results, elapsed = asyncio.run(
+        run(args.url, questions, args.requests, args.concurrency, args.timeout, use_cache=not args.no_cache)
+    )
+
+    statuses = Counter(status for status, _, _ in results)
+    latencies = [latency for status, latency, _ in results if status == 200]
+    bodies = [body for status, _, body in results if status == 200]
+
+    print("Load Test Results")
+    print("=" * 30)
+    print(f"Requests: {len(results)} in {elapsed:.2f}s (concurrency {args.concurrency}, "
+          f"{len(questions)} distinct questions, caches {'off' if args.no_cache else 'on'})")
+    print(f"Throughput: {len(results) / elapsed:.2f} req/s, {len(latencies) / elapsed:.2f} ok/s")
+    print(f"Status codes: {dict(statuses)}")
+    if bodies:
+        # Throughput with mostly cache hits measures lookups, not the pipeline
+        print(f"Query cache hits: {sum(bool(body.get('cache_hit')) for body in bodies) / len(bodies):.0%}, "
+              f"result cache hits: {sum(bool(body.get('result_cache_hit')) for body in bodies) / len(bodies):.0%}")
+    if latencies:
+        print(f"Latency p50: {percentile(latencies, 50):.3f}s")
+        print(f"Latency p95: {percentile(latencies, 95):.3f}s")
+        print(f"Latency p99: {percentile(latencies, 99):.3f}s")
+        print(f"Latency max: {max(latencies):.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_MISSING = object()
+
+class AppContext:
+    """Database, LLM and caches, built on first use and shared by every request
+
+    Nothing is created at import time. After a fork the child disposes the
+    inherited connection pool and rebuilds everything else on demand, so
+    pre-fork servers get their own engines and clients per worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._values = {}
+
+    def _get(self, name, factory):
+        value = self._values.get(name, _MISSING)
+        if value is _MISSING:
+            with self._lock:
+                value = self._values.get(name, _MISSING)
+                if value is _MISSING:
+                    value = factory()
+                    self._values[name] = value
+        return value
+
+    def is_ready(self, name):
+        return name in self._values
+
+    @property
+    def db(self):
+        from database import create_database_connection
+
+        return self._get("db", create_database_connection)
+
+    @property
+    def async_engine(self):
+        from database import create_async_database_engine
+
+        return self._get("async_engine", lambda: create_async_database_engine(self.db))
+
+    @property
+    def schema_cache(self):
+        from schema_cache import SchemaCache
+        from summaries import REFRESH_TABLE, summary_annotations
+
+        def annotations():
+            if os.getenv("SUMMARY_TABLES", "1") == "0":
+                return {}, {REFRESH_TABLE}
+            return summary_annotations(self.db._engine)
+
+        return self._get("schema_cache", lambda: SchemaCache(self.db, annotations=annotations).warm())
+
+    @property
+    def table_selector(self):
+        from table_selector import TableSelector
+
+        return self._get("table_selector", lambda: TableSelector(self.schema_cache))
+
+    def _backend(self):
+        from llm_config import get_available_llm, load_backend_state
+
+        def build():
+            # Discovery is skipped for a saved backend, so its first call is what proves it still works
+            self._values["backend_unverified"] = not os.getenv("LLM_BACKENDS", "").strip() and load_backend_state() is not None
+            return get_available_llm()
+
+        return self._get("backend", build)
+
+    def llm_succeeded(self):
+        self._values["backend_unverified"] = False
+
+    def llm_failed(self):
+        """Drop a saved backend whose first call failed; the next request runs discovery and can fall back"""
+        from llm_config import clear_backend_state
+
+        with self._lock:
+            if not self._values.get("backend_unverified"):
+                return
+            clear_backend_state()
+            for name in ("backend", "backend_unverified", "prompts", "query_prompt"):
+                self._values.pop(name, None)
+
+    def use_llm(self, llm, llm_type):
+        """Serve requests with this chat model instead of a discovered backend (tests, benchmarks)"""
+        with self._lock:
+            for name in ("backend", "backend_unverified", "prompts", "query_prompt"):
+                self._values.pop(name, None)
+            self._values["backend"] = (llm, llm_type)
+        return self
+
+    @property
+    def llm(self):
+        return self._backend()[0]
+
+    @property
+    def llm_type(self):
+        return self._backend()[1]
+
+    @property
+    def model_id(self):
+        llm = self.llm
+        return f"{self.llm_type}:{getattr(llm, 'model', None) or getattr(llm, 'model_name', '')}"
+
+    @property
+    def prompts(self):
+        from llm_config import get_llm_specific_prompt
+
+        return self._get("prompts", lambda: get_llm_specific_prompt(self.llm_type))
+
+    @property
+    def query_prompt(self):
+        def build():
+            from langchain_core.prompts import ChatPromptTemplate
+
+            if self.llm_type == "ollama":
+                return ChatPromptTemplate.from_template(self.prompts["system_template"])
+            return ChatPromptTemplate.from_messages([
+                ("system", self.prompts["system_template"]),
+                ("user", self.prompts["question_template"])
+            ])
+
+        return self._get("query_prompt", build)
+
+    @property
+    def query_cache(self):
+        def build():
+            if os.getenv("QUERY_CACHE", "1") == "0":
+                return None
+            from query_cache import QueryCache
+
+            return QueryCache()
+
+        return self._get("query_cache", build)
+
+    @property
+    def semantic_cache(self):
+        def build():
+            if os.getenv("SEMANTIC_CACHE", "1") == "0":
+                return None
+            from embeddings import get_embedder
+            from semantic_cache import SemanticCache
+
+            return SemanticCache(get_embedder())
+
+        return self._get("semantic_cache", build)
+
+    @property
+    def example_store(self):
+        def build():
+            if os.getenv("FEW_SHOT", "1") == "0":
+                return None
+            from example_store import ExampleStore
+
+            embedder = None
+            if os.getenv("FEW_SHOT_EMBEDDINGS", "0") == "1":
+                from embeddings import get_embedder
+
+                embedder = get_embedder()
+            return ExampleStore(embedder=embedder)
+
+        return self._get("example_store", build)
+
+    @property
+    def result_cache(self):
+        def build():
+            if os.getenv("RESULT_CACHE", "1") == "0":
+                return None
+            from result_cache import ResultCache, TableChangeListener
+
+            cache = ResultCache()
+            engine = self.db._engine
+            if os.getenv("RESULT_CACHE_LISTEN", "0") == "1" and engine.dialect.name == "postgresql":
+                self._values["result_cache_listener"] = TableChangeListener(engine, cache).start()
+            return cache
+
+        return self._get("result_cache", build)
+
+    @property
+    def summary_refresher(self):
+        def build():
+            if float(os.getenv("SUMMARY_REFRESH_INTERVAL", "300")) <= 0:
+                return None
+            from summaries import SummaryRefresher
+
+            def on_refresh(rows):
+                for row in rows:
+                    if self.result_cache is not None:
+                        self.result_cache.invalidate(row["name"])
+                # Notes follow freshness: a summary that failed to refresh drops out once it is too old
+                if self.is_ready("schema_cache"):
+                    self.schema_cache.refresh_annotations()
+
+            return SummaryRefresher(self.db._engine, on_refresh=on_refresh).start()
+
+        return self._get("summary_refresher", build)
+
+    @property
+    def workload_recorder(self):
+        def build():
+            if not os.getenv("WORKLOAD_LOG", ""):
+                return None
+            from workload import WorkloadRecorder
+
+            return WorkloadRecorder()
+
+        return self._get("workload_recorder", build)
+
+    @property
+    def limiter(self):
+        from concurrency import ConcurrencyLimiter
+
+        return self._get("limiter", ConcurrencyLimiter)
+
+    def single_flight(self, name):
+        """Shared SingleFlight group for one stage, or None with SINGLE_FLIGHT=0"""
+        if os.getenv("SINGLE_FLIGHT", "1") == "0":
+            return None
+        from single_flight import SingleFlight
+
+        return self._get(f"single_flight:{name}", SingleFlight)
+
+    def coalescing_stats(self):
+        """Per-stage counts of calls that waited on an identical in-flight call"""
+        return {
+            name.split(":", 1)[1]: group.stats()
+            for name, group in list(self._values.items())
+            if name.startswith("single_flight:")
+        }
+
+    def pool_stats(self):
+        """Pool statistics for the engines created so far"""
+        from database import pool_stats
+
+        stats = {}
+        if self.is_ready("db"):
+            stats["sync"] = pool_stats(self.db._engine)
+        if self.is_ready("async_engine"):
+            stats["async"] = pool_stats(self.async_engine)
+        return stats
+
+    def warm(self):
+        """Build the database connection, schema catalog and LLM up front"""
+        self.schema_cache
+        self.llm
+        self.query_cache
+        self.semantic_cache
+        self.result_cache
+        self.summary_refresher
+        if self.example_store is not None:
+            self.example_store.prepare()
+        return self
+
+    def after_fork(self):
+        """Drop state a child process must not share with its parent"""
+        db = self._values.get("db")
+        if db is not None:
+            # Leave the parent's pooled connections alone, just forget them
+            db._engine.dispose(close=False)
+        self._lock = threading.RLock()
+        self._values = {"db": db} if db is not None else {}
+
+    def close(self):
+        listener = self._values.get("result_cache_listener")
+        if listener is not None:
+            listener.stop()
+        refresher = self._values.get("summary_refresher")
+        if refresher is not None:
+            refresher.stop()
+        recorder = self._values.get("workload_recorder")
+        if recorder is not None:
+            recorder.close()
+        semantic_cache = self._values.get("semantic_cache")
+        if semantic_cache is not None:
+            semantic_cache.close()
+        db = self._values.get("db")
+        if db is not None:
+            db._engine.dispose()
+        self._values = {}
+
+_context = AppContext()
+
+def get_context():
+    return _context
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: _context.after_fork())
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app_context import get_context
+from chain import graph_builder
+
+RESULT_KEYS = ("query", "result", "answer", "answer_path", "result_tokens_saved")
+
+def read_questions(path):
+    """Questions from a JSONL file (objects or bare strings) or a CSV file with a "question" column"""
+    questions = []
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for number, row in enumerate(csv.DictReader(f), 1):
+                questions.append({"id": row.get("id") or str(number), "question": row["question"]})
+        return questions
+
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            questions.append({"id": str(item["id"] if "id" in item else number), "question": item["question"]})
+    return questions
+
+def finished_ids(path, retry_failed=False):
+    """Ids already written to an output file, so an interrupted batch can pick up where it stopped"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by the interruption
+                continue
+            if record.get("error") and retry_failed:
+                done.discard(record["id"])
+            else:
+                done.add(record["id"])
+    return done
+
+def needs_newline(path):
+    """True when the file ends in a line cut short by an interruption"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+async def answer_one(item, sql_executor):
+    start = time.perf_counter()
+    record = {"id": item["id"], "question": item["question"]}
+    try:
+        state = await graph_builder.ainvoke(
+            {"question": item["question"]},
+            config={"configurable": {"sql_executor": sql_executor}},
+        )
+        record.update({key: state.get(key) for key in RESULT_KEYS})
+        # The graph turns generation, SQL and answer failures into an error state instead of raising
+        if state.get("error"):
+            record["error"] = state["error"]
+        elif state.get("answer_path") == "error":
+            record["error"] = state.get("answer") or "failed"
+    except Exception as e:
+        record["error"] = str(e)
+    record["elapsed"] = round(time.perf_counter() - start, 4)
+    return record
+
+async def run_batch(questions, output_path, concurrency=None, db_workers=None, resume=True, retry_failed=False, progress=None):
+    """Answer every question, appending one JSONL record per question as it finishes
+
+    Up to `concurrency` questions are in flight at once (bounding concurrent LLM
+    calls) and their SQL runs on a `db_workers` thread pool over the shared
+    connection pool. Returns counts and throughput for the run.
+    """
+    concurrency = concurrency or int(os.getenv("BATCH_CONCURRENCY", "8"))
+    db_workers = db_workers or int(os.getenv("BATCH_DB_WORKERS", os.getenv("DB_POOL_SIZE", "5")))
+
+    done = finished_ids(output_path, retry_failed) if resume else set()
+    todo = [item for item in questions if item["id"] not in done]
+    pending = iter(todo)
+    stats = {"total": len(questions), "skipped": len(questions) - len(todo), "completed": 0, "failed": 0}
+
+    # Schema, LLM client and connection pool are built once and shared by every question
+    await asyncio.to_thread(get_context().warm)
+
+    start = time.perf_counter()
+    partial_line = resume and needs_newline(output_path)
+    with ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix="batch-sql") as sql_executor, \
+            open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        if partial_line:
+            out.write("\n")
+
+        async def worker():
+            for item in pending:
+                record = await answer_one(item, sql_executor)
+                out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+                stats["failed" if record.get("error") else "completed"] += 1
+                if progress:
+                    progress(stats)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    stats["elapsed"] = round(time.perf_counter() - start, 3)
+    answered = stats["completed"] + stats["failed"]
+    stats["questions_per_sec"] = round(answered / stats["elapsed"], 3) if stats["elapsed"] else 0.0
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions and write the results as JSONL")
+    parser.add_argument("input", help="questions as .jsonl or .csv")
+    parser.add_argument("-o", "--output", default="results.jsonl")
+    parser.add_argument("--concurrency", type=int, default=None, help="questions (LLM calls) in flight at once")
+    parser.add_argument("--db-workers", type=int, default=None, help="threads executing SQL")
+    parser.add_argument("--restart", action="store_true", help="overwrite the output instead of resuming")
+    parser.add_argument("--retry-failed", action="store_true", help="run questions that failed last time again")
+    args = parser.parse_args()
+
+    questions = read_questions(args.input)
+
+    def progress(stats):
+        answered = stats["completed"] + stats["failed"]
+        if answered % 50 == 0:
+            print(f"{answered} answered ({stats['failed']} failed)", flush=True)
+
+    stats = asyncio.run(run_batch(
+        questions, args.output, args.concurrency, args.db_workers,
+        resume=not args.restart, retry_failed=args.retry_failed, progress=progress,
+    ))
+
+    print("\nBatch Results")
+    print("=" * 30)
+    print(f"Questions: {stats['total']} ({stats['skipped']} already done)")
+    print(f"Completed: {stats['completed']}, failed: {stats['failed']}")
+    print(f"Elapsed:   {stats['elapsed']:.1f}s")
+    print(f"Throughput: {stats['questions_per_sec']:.2f} questions/s")
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
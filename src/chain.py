@@ -1,103 +1,451 @@
+import asyncio
+import os
+import time
+from contextlib import aclosing
+import sqlalchemy
 from typing_extensions import TypedDict
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool
-from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.graph import START, StateGraph
 from dotenv import load_dotenv
+from app_context import get_context
+from example_store import format_examples
+from executor import arun_query, run_query
+from fast_path import render_answer
+from instrumentation import instrument
+from query_cache import normalize_question
+from query_guard import QueryRejected, guard_query, sql_dialect
+from result_format import render_for_prompt
+from sql_repair import can_repair, classify_error, error_message
 
 load_dotenv()
 
-try:
-    from database import db
-    from llm_config import get_available_llm, get_llm_specific_prompt
-    
-    llm, llm_type = get_available_llm()
-    prompts = get_llm_specific_prompt(llm_type)
-    
-except Exception as e:
-    print(f"Failed to initialize system: {e}")
-    exit(1)
-
 class State(TypedDict):
     question: str
+    use_cache: bool
+    tables: list
     query: str
+    cache_hit: bool
+    result_cache_hit: bool
+    db_ms: float
+    rejected: str
+    plan_cost: float
+    columns: list
+    rows: list
+    truncated: bool
     result: str
+    result_tokens_saved: int
+    fast_answer: str
+    error: str
+    error_kind: str
+    attempts: int
+    started: float
     answer: str
+    answer_path: str
+
+def lookup_query(state: State):
+    ctx = get_context()
+    query = None
+    if state.get("use_cache") is False:
+        return {"cache_hit": False, "started": time.monotonic()}
+    
+    try:
+        fingerprint = ctx.schema_cache.current_fingerprint
+        if ctx.query_cache is not None:
+            query = ctx.query_cache.get(state["question"], ctx.model_id, fingerprint)
+        if query is None and ctx.semantic_cache is not None:
+            query, _ = ctx.semantic_cache.get(state["question"], ctx.model_id, fingerprint)
+    except Exception as e:
+        query = None
+    
+    if query:
+        return {"query": query, "cache_hit": True, "started": time.monotonic()}
+    return {"cache_hit": False, "started": time.monotonic()}
+
+def store_query(state: State, rows):
+    ctx = get_context()
+    fingerprint = ctx.schema_cache.current_fingerprint
+    if ctx.query_cache is not None:
+        ctx.query_cache.put(state["question"], ctx.model_id, fingerprint, state["query"])
+    if ctx.semantic_cache is not None:
+        ctx.semantic_cache.put(state["question"], ctx.model_id, fingerprint, state["query"])
+    # Queries that ran and returned something become few-shot examples for later questions
+    if rows and ctx.example_store is not None:
+        ctx.example_store.add(state["question"], state["query"])
+
+def route_after_lookup(state: State):
+    return "guard_query" if state.get("cache_hit") else "select_tables"
 
-if llm_type == "ollama":
-    query_prompt = ChatPromptTemplate.from_template(prompts["system_template"])
-else:
-    query_prompt = ChatPromptTemplate.from_messages([
-        ("system", prompts["system_template"]),
-        ("user", "Question: {input}")
-    ])
+def select_tables(state: State):
+    ctx = get_context()
+    # PROMPT_LAYOUT=prefix (default) sends the full schema so the prompt prefix is identical across
+    # questions; PROMPT_LAYOUT=pruned sends only the tables picked for the question, fewer tokens but no reuse
+    if os.getenv("PROMPT_LAYOUT", "prefix") != "pruned":
+        return {"tables": ctx.schema_cache.get_usable_table_names()}
+    
+    try:
+        return {"tables": ctx.table_selector.select(state["question"])}
+    except Exception as e:
+        return {"tables": ctx.schema_cache.get_usable_table_names()}
+
+def examples_section(question):
+    """Nearest stored question/SQL examples for the prompt, or an empty string"""
+    store = get_context().example_store
+    if store is None:
+        return ""
+    examples = store.select(question)
+    if not examples:
+        return ""
+    return f"\nExamples:\n{format_examples(examples)}\n"
+
+def build_query_prompt(question, table_info):
+    ctx = get_context()
+    if ctx.llm_type == "ollama":
+        return ctx.query_prompt.invoke({
+            "top_k": 10,
+            "table_info": table_info,
+            "examples": examples_section(question),
+            "input": question,
+        })
+    return ctx.query_prompt.invoke({
+        "dialect": "PostgreSQL",
+        "top_k": 10,
+        "table_info": table_info,
+        "examples": examples_section(question),
+        "input": question,
+    })
+
+def extract_sql(text):
+    query = text.strip()
+    
+    if "```sql" in query:
+        query = query.split("```sql")[1].split("```")[0].strip()
+    elif "```" in query:
+        query = query.split("```")[1].strip()
+    
+    if get_context().llm_type == "ollama":
+        prefixes_to_remove = ["Query:", "SQL:", "Answer:"]
+        for prefix in prefixes_to_remove:
+            if query.startswith(prefix):
+                query = query[len(prefix):].strip()
+    
+    return query
+
+def coalesce(name, key, func):
+    """Run func, or wait for an identical call already running in another thread"""
+    flight = get_context().single_flight(name)
+    return func() if flight is None else flight.do(key, func)
+
+async def acoalesce(name, key, coro_func):
+    """Await coro_func(), or share an identical call already running on this event loop"""
+    flight = get_context().single_flight(name)
+    return await (coro_func() if flight is None else flight.ado(key, coro_func))
+
+def write_query_key(state: State):
+    return (get_context().model_id, normalize_question(state["question"]), tuple(state.get("tables") or ()))
 
 def write_query(state: State):
     try:
-        if llm_type == "ollama":
-            prompt = query_prompt.invoke({
-                "top_k": 10,
-                "table_info": db.get_table_info(),
-                "input": state["question"],
-            })
-        else:
-            prompt = query_prompt.invoke({
-                "dialect": "PostgreSQL",
-                "top_k": 10,
-                "table_info": db.get_table_info(),
-                "input": state["question"],
-            })
+        ctx = get_context()
         
-        response = llm.invoke(prompt)
-        query = response.content.strip()
+        def generate():
+            table_info = ctx.schema_cache.get_table_info(state.get("tables") or None)
+            prompt = build_query_prompt(state["question"], table_info)
+            return extract_sql(ctx.llm.invoke(prompt).content)
         
-        if "```sql" in query:
-            query = query.split("```sql")[1].split("```")[0].strip()
-        elif "```" in query:
-            query = query.split("```")[1].strip()
+        query = coalesce("write_query", write_query_key(state), generate)
+        ctx.llm_succeeded()
+        return {"query": query}
         
-        if llm_type == "ollama":
-            prefixes_to_remove = ["Query:", "SQL:", "Answer:"]
-            for prefix in prefixes_to_remove:
-                if query.startswith(prefix):
-                    query = query[len(prefix):].strip()
+    except Exception as e:
+        return generation_error(e)
+
+async def awrite_query(state: State):
+    try:
+        ctx = get_context()
         
+        async def generate():
+            table_info = ctx.schema_cache.get_table_info(state.get("tables") or None)
+            prompt = build_query_prompt(state["question"], table_info)
+            response = await ctx.llm.ainvoke(prompt)
+            return extract_sql(response.content)
+        
+        query = await acoalesce("write_query", write_query_key(state), generate)
+        ctx.llm_succeeded()
         return {"query": query}
         
     except Exception as e:
-        return {"query": "SELECT 1 as error"}
+        return generation_error(e)
+
+def generation_error(e):
+    get_context().llm_failed()
+    return {"query": "", "error": f"could not generate SQL: {e}", "error_kind": "generation"}
+
+def route_after_write(state: State):
+    return "format_answer" if state.get("error_kind") == "generation" else "guard_query"
+
+def build_repair_input(state: State):
+    ctx = get_context()
+    table_info = ctx.schema_cache.get_table_info(state.get("tables") or None)
+    prompt_text = ctx.prompts["repair_template"].format(
+        top_k=10,
+        table_info=table_info,
+        input=state["question"],
+        query=state["query"],
+        error=state["error"],
+    )
+    
+    if ctx.llm_type == "ollama":
+        return prompt_text
+    # Same system message as write_query, so the schema prefix is shared
+    return [
+        SystemMessage(content=ctx.prompts["system_template"].format(top_k=10, table_info=table_info)),
+        HumanMessage(content=prompt_text),
+    ]
+
+def repaired(state: State, query):
+    # The fixed query replaces a failing cached one once it runs
+    return {
+        "query": query, "attempts": state.get("attempts", 0) + 1, "cache_hit": False,
+        "error": "", "error_kind": "", "rejected": "",
+    }
+
+def repair_query(state: State):
+    """Ask the model to fix the failing SQL, given the database's error message"""
+    try:
+        response = get_context().llm.invoke(build_repair_input(state))
+        return repaired(state, extract_sql(response.content))
+        
+    except Exception as e:
+        return {**generation_error(e), "attempts": state.get("attempts", 0) + 1}
+
+async def arepair_query(state: State):
+    try:
+        response = await get_context().llm.ainvoke(build_repair_input(state))
+        return repaired(state, extract_sql(response.content))
+        
+    except Exception as e:
+        return {**generation_error(e), "attempts": state.get("attempts", 0) + 1}
+
+def check_query(state: State):
+    """Rewrite the generated SQL into a bounded SELECT and reject it if the plan looks too expensive"""
+    try:
+        checked = guard_query(get_context().db._engine, state["query"])
+        return {"query": checked["query"], "plan_cost": checked["cost"], "rejected": ""}
+        
+    except QueryRejected as e:
+        return {"rejected": str(e), "error": error_message(e), "error_kind": classify_error(e)}
+    except sqlalchemy.exc.SQLAlchemyError as e:
+        message = error_message(e)
+        return {"rejected": f"could not check query: {message}", "error": message, "error_kind": classify_error(e)}
+
+def route_after_guard(state: State):
+    if not state.get("rejected"):
+        return "execute_query"
+    return "repair_query" if can_repair(state) else "format_answer"
+
+def fast_answer(result):
+    """Template answer for the result, or None when the answer LLM has to write it"""
+    if os.getenv("FAST_PATH", "1") == "0" or result["truncated"]:
+        return None
+    return render_answer(result["columns"], result["rows"])
+
+def finish_execution(state: State, result):
+    if not state.get("cache_hit"):
+        store_query(state, result["rows"])
+    
+    rendered = render_for_prompt(result["columns"], result["rows"], result["truncated"])
+    return {
+        "columns": result["columns"],
+        "rows": result["rows"],
+        "truncated": result["truncated"],
+        "result": rendered["text"],
+        "result_tokens_saved": rendered["tokens_saved"],
+        # Rendered once here; the router and format_answer only read it
+        "fast_answer": fast_answer(result),
+    }
+
+def execution_error(e):
+    return {
+        "columns": [], "rows": [], "truncated": False, "result": "", "fast_answer": None,
+        "error": error_message(e), "error_kind": classify_error(e),
+    }
+
+def cached_execution(query, engine, run, use_cache=True):
+    """Result from the result cache, or run() and cache it; (result, cache_hit)"""
+    cache = get_context().result_cache if use_cache else None
+    if cache is None:
+        return run(), False
+    dialect = sql_dialect(engine)
+    result = cache.get(query, dialect)
+    if result is not None:
+        return result, True
+    result = run()
+    cache.put(query, result, dialect)
+    return result, False
+
+async def acached_execution(query, engine, run, use_cache=True):
+    cache = get_context().result_cache if use_cache else None
+    if cache is None:
+        return await run(), False
+    dialect = sql_dialect(engine)
+    result = cache.get(query, dialect)
+    if result is not None:
+        return result, True
+    result = await run()
+    cache.put(query, result, dialect)
+    return result, False
+
+def record_workload(query, engine, db_ms, result):
+    recorder = get_context().workload_recorder
+    if recorder is not None:
+        recorder.record(query, sql_dialect(engine), db_ms, len(result["rows"]))
 
 def execute_query(state: State):
+    query = state["query"]
     try:
-        tool = QuerySQLDatabaseTool(db=db)
-        result = tool.invoke(state["query"])
-        return {"result": str(result)}
+        engine = get_context().db._engine
+        start = time.perf_counter()
+        result, cached = cached_execution(
+            query, engine, lambda: coalesce("execute_query", query, lambda: run_query(engine, query)),
+            state.get("use_cache") is not False,
+        )
+        db_ms = (time.perf_counter() - start) * 1000
+        if not cached:
+            record_workload(query, engine, db_ms, result)
+        return {**finish_execution(state, result), "result_cache_hit": cached, "db_ms": db_ms}
         
     except Exception as e:
-        return {"result": f"Error executing query: {str(e)}"}
+        return execution_error(e)
 
-def generate_answer(state: State):
+async def aexecute_query(state: State, config: RunnableConfig = None):
+    """Async execution; with a "sql_executor" in the config the sync engine runs on that thread pool"""
+    sql_executor = ((config or {}).get("configurable") or {}).get("sql_executor")
+    query = state["query"]
+    
+    async def run():
+        if sql_executor is not None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(sql_executor, run_query, get_context().db._engine, query)
+        return await arun_query(get_context().async_engine, query)
+    
     try:
-        prompt_text = prompts["answer_template"].format(
-            question=state["question"],
-            query=state["query"],
-            result=state["result"]
+        start = time.perf_counter()
+        engine = get_context().db._engine
+        result, cached = await acached_execution(
+            query, engine, lambda: acoalesce("execute_query", query, run), state.get("use_cache") is not False,
         )
+        db_ms = (time.perf_counter() - start) * 1000
+        if not cached:
+            record_workload(query, engine, db_ms, result)
+        return {**finish_execution(state, result), "result_cache_hit": cached, "db_ms": db_ms}
         
-        if llm_type == "ollama":
-            response = llm.invoke(prompt_text)
-        else:
-            response = llm.invoke(HumanMessage(content=prompt_text))
+    except Exception as e:
+        return execution_error(e)
+
+def route_after_execute(state: State):
+    """Repair a failed query, and skip the answer LLM call when the result can be rendered from a template"""
+    if state.get("error"):
+        return "repair_query" if can_repair(state) else "format_answer"
+    return "generate_answer" if state.get("fast_answer") is None else "format_answer"
+
+def format_answer(state: State):
+    if state.get("error_kind") == "generation":
+        return {"answer": f"Sorry, I encountered an error: {state['error']}", "answer_path": "error"}
+    if state.get("rejected"):
+        return {"answer": f"Sorry, that query was not run: {state['rejected']}", "answer_path": "rejected"}
+    if state.get("error"):
+        return {"answer": f"Sorry, the query failed: {state['error']}", "answer_path": "error"}
+    return {"answer": state["fast_answer"], "answer_path": "template"}
+
+def build_answer_input(state: State):
+    ctx = get_context()
+    prompt_text = ctx.prompts["answer_template"].format(
+        question=state["question"],
+        query=state["query"],
+        result=state["result"]
+    )
+    
+    if ctx.llm_type == "ollama":
+        return prompt_text
+    return HumanMessage(content=prompt_text)
+
+def answer_error(e):
+    """The query ran but the answer LLM failed; an error state so batch runs retry the question"""
+    get_context().llm_failed()
+    return {
+        "answer": f"Sorry, I encountered an error: {e}", "answer_path": "error",
+        "error": f"could not generate answer: {e}", "error_kind": "generation",
+    }
+
+def generate_answer(state: State):
+    try:
+        response = get_context().llm.invoke(build_answer_input(state))
+        return {"answer": response.content, "answer_path": "llm"}
         
-        answer = response.content
-        return {"answer": answer}
+    except Exception as e:
+        return answer_error(e)
+
+async def agenerate_answer(state: State):
+    try:
+        response = await get_context().llm.ainvoke(build_answer_input(state))
+        return {"answer": response.content, "answer_path": "llm"}
         
     except Exception as e:
-        return {"answer": f"Sorry, I encountered an error: {str(e)}"}
-
-try:
-    graph = StateGraph(State).add_sequence([write_query, execute_query, generate_answer])
-    graph_builder = graph.add_edge(START, "write_query").compile()
-except Exception as e:
-    print(f"Error building graph: {e}")
-    exit(1)
+        return answer_error(e)
+
+graph = StateGraph(State).add_sequence([
+    ("select_tables", select_tables),
+    ("write_query", RunnableLambda(write_query, afunc=awrite_query)),
+])
+graph.add_node("guard_query", check_query)
+graph.add_node("repair_query", RunnableLambda(repair_query, afunc=arepair_query))
+graph.add_node("execute_query", RunnableLambda(execute_query, afunc=aexecute_query))
+graph.add_node("generate_answer", RunnableLambda(generate_answer, afunc=agenerate_answer))
+graph.add_node("format_answer", format_answer)
+graph.add_node("lookup_query", lookup_query)
+graph.add_edge(START, "lookup_query")
+graph.add_conditional_edges("lookup_query", route_after_lookup, ["select_tables", "guard_query"])
+graph.add_conditional_edges("write_query", route_after_write, ["guard_query", "format_answer"])
+graph.add_conditional_edges("repair_query", route_after_write, ["guard_query", "format_answer"])
+graph.add_conditional_edges("guard_query", route_after_guard, ["execute_query", "repair_query", "format_answer"])
+graph.add_conditional_edges("execute_query", route_after_execute, ["generate_answer", "repair_query", "format_answer"])
+graph_builder = instrument(graph.compile())
+
+def answer_token(mode, chunk):
+    """Answer text from a stream_mode=["updates", "messages"] chunk, if it is one"""
+    if mode != "messages":
+        return None
+    message, metadata = chunk
+    if metadata.get("langgraph_node") != "generate_answer":
+        return None
+    return message.content or None
+
+async def astream(question, stream_mode="updates", use_cache=True):
+    """Async graph stream for one question, admitted through the concurrency limiter
+
+    Closing this stream early (a client that went away) closes the graph run
+    and frees the slot right away.
+    """
+    async with get_context().limiter:
+        inputs = {"question": question, "use_cache": use_cache}
+        async with aclosing(graph_builder.astream(inputs, stream_mode=stream_mode)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+async def aanswer(question, use_cache=True):
+    """Final graph state for one question, admitted through the concurrency limiter
+
+    Identical questions arriving while one is being answered wait for that run
+    instead of taking their own slot. With use_cache=False the question, result
+    and semantic caches are skipped and the question gets its own graph run,
+    which is what a load test of the pipeline needs.
+    """
+    async def run():
+        async with get_context().limiter:
+            return await graph_builder.ainvoke({"question": question, "use_cache": use_cache})
+    
+    if not use_cache:
+        return {**await run(), "question": question}
+    state = await acoalesce("graph", normalize_question(question), run)
+    return {**state, "question": question}
@@ -0,0 +1,51 @@
+import asyncio
+import os
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; callers should retry later"""
+
+class ConcurrencyLimiter:
+    """Caps in-flight graph runs and sheds load once the wait queue is full"""
+
+    def __init__(self, max_concurrent=None, max_waiting=None, wait_timeout=None):
+        self.max_concurrent = max_concurrent or int(os.getenv("MAX_CONCURRENT_REQUESTS", "8"))
+        self.max_waiting = max_waiting if max_waiting is not None else int(os.getenv("MAX_QUEUED_REQUESTS", "32"))
+        self.wait_timeout = wait_timeout if wait_timeout is not None else float(os.getenv("QUEUE_TIMEOUT", "30"))
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def __aenter__(self):
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise Overloaded(f"Too many requests in flight ({self.active} running, {self.waiting} queued)")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.wait_timeout or None)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(f"Timed out after {self.wait_timeout}s waiting for a free slot")
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.active -= 1
+        self.completed += 1
+        self._semaphore.release()
+        return False
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
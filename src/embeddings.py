@@ -0,0 +1,92 @@
+import os
+import re
+import zlib
+import numpy as np
+from text_index import COMPARATIVES, question_tokens
+
+# Phrasings of the same request folded to one word before hashing
+PARAPHRASES = [
+    (re.compile(r"\b(?:how many|(?:total )?number of|count of|count)\b"), " count "),
+    (re.compile(r"\b(?:per|(?:for |in )?(?:each|every)|grouped by)\b"), " by "),
+    (re.compile(r"\b(?:exists?|existing|there|overall)\b"), " "),
+]
+
+# Words whose neighbours say which way the question goes: "by country", "Rock more than Jazz"
+MARKERS = COMPARATIVES | {"by"}
+
+class HashingEmbedder:
+    """Offline embedder: hashed word and character-trigram features, L2-normalized
+
+    Common paraphrases ("how many" / "count of", "per" / "by") are folded
+    together and word order is otherwise ignored, so reworded questions land
+    close. Negations, comparatives and numbers are kept, and the words on
+    either side of a comparative or "by" carry their position, so
+    "X more than Y" and "Y more than X" land apart.
+    """
+
+    # Folded paraphrases score close to 1.0; distinct questions in the Chinook corpus stay below 0.8
+    default_threshold = 0.85
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.name = f"hashing-v3-{dim}"
+
+    def _tokens(self, text):
+        text = text.lower()
+        for pattern, replacement in PARAPHRASES:
+            text = pattern.sub(replacement, text)
+        return question_tokens(text, keep=MARKERS)
+
+    def _features(self, text):
+        tokens = self._tokens(text)
+        for i, token in enumerate(tokens):
+            if token in MARKERS:
+                # What is grouped follows "by"; what comes before it is free to move
+                if i > 0 and token != "by":
+                    yield f"{tokens[i - 1]}<{token}", 1.5
+                if i + 1 < len(tokens):
+                    yield f"{token}>{tokens[i + 1]}", 1.5
+                if token == "by":
+                    continue
+            yield token, 1.0
+            padded = f"#{token}#"
+            for j in range(len(padded) - 2):
+                yield padded[j:j + 3], 0.5
+
+    def embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            vector[h % self.dim] += sign * weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class OllamaEmbedder:
+    """Embeddings from a local Ollama embedding model"""
+
+    def __init__(self, model=None, base_url=None):
+        from langchain_ollama import OllamaEmbeddings
+
+        self.model = model or os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+        self.name = f"ollama-{self.model}"
+        self.default_threshold = float(os.getenv("OLLAMA_EMBED_THRESHOLD", "0.92"))
+        self._embeddings = OllamaEmbeddings(
+            model=self.model,
+            base_url=base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+        )
+        self.dim = len(self._embeddings.embed_query("dimension probe"))
+
+    def embed(self, text):
+        vector = np.asarray(self._embeddings.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+def get_embedder(backend=None):
+    """Embedder selected by EMBEDDING_BACKEND (hashing or ollama)"""
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "hashing")
+    if backend == "ollama":
+        return OllamaEmbedder()
+    if backend == "hashing":
+        return HashingEmbedder(int(os.getenv("EMBEDDING_DIM", "384")))
+    raise ValueError(f"Unknown embedding backend: {backend}")
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+from query_cache import normalize_question
+from text_index import BM25Index, estimate_tokens
+
+SEED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "chinook_questions.jsonl")
+
+def _read_jsonl(path):
+    if not path or not os.path.exists(path):
+        return []
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(item, dict) and item.get("question") and item.get("sql"):
+                examples.append(item)
+    return examples
+
+class ExampleStore:
+    """Question -> SQL examples for few-shot prompts, ranked by BM25 and optionally by embeddings
+
+    Curated seeds are read once; examples learned from successful runs are
+    appended to a JSONL file and capped at `max_learned`, oldest first out.
+    A learned example is added to the BM25 index in place (and the one it
+    replaces removed), so steady traffic does not rebuild the index; the
+    embedding matrix is restacked lazily and only new questions are embedded.
+    A lookup is a postings walk plus one matrix-vector product.
+    """
+
+    def __init__(self, seed_path=None, path=None, embedder=None, max_learned=None, lexical_weight=0.5):
+        self.seed_path = seed_path if seed_path is not None else os.getenv("FEW_SHOT_SEED", SEED_FILE)
+        self.path = path if path is not None else os.getenv("FEW_SHOT_PATH", "")
+        self.embedder = embedder
+        self.max_learned = max_learned or int(os.getenv("FEW_SHOT_MAX_LEARNED", "500"))
+        self.lexical_weight = lexical_weight
+        self._lock = threading.Lock()
+        self._seeds = [(item["question"], item["sql"]) for item in _read_jsonl(self.seed_path)]
+        self._learned = [(item["question"], item["sql"]) for item in _read_jsonl(self.path)][-self.max_learned:]
+        self._seed_keys = {normalize_question(question) for question, _ in self._seeds}
+        self._learned_keys = {normalize_question(question) for question, _ in self._learned}
+        self._index = None
+        self._vectors = None
+        self._examples = []
+        self._ids = {}
+        self._embedded = {}
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+
+    def _build(self):
+        self._examples, self._ids = [], {}
+        self._index = BM25Index()
+        # Curated seeds win over learned examples for the same question
+        for question, sql in self._seeds + self._learned[::-1]:
+            key = normalize_question(question)
+            if key not in self._ids:
+                self._insert(key, question, sql)
+        self._embedded = {question: self._embedded.get(question) for question, _ in self._live()}
+
+    def _live(self):
+        return [example for example in self._examples if example is not None]
+
+    def _insert(self, key, question, sql):
+        i = len(self._examples)
+        self._examples.append((question, sql))
+        self._ids[key] = i
+        self._index.add(i, question)
+        self._vectors = None
+
+    def _discard(self, key):
+        i = self._ids.pop(key, None)
+        if i is not None:
+            self._examples[i] = None
+            self._index.remove(i)
+            self._vectors = None
+
+    def _ensure_vectors(self):
+        if self.embedder is None or self._vectors is not None or not self._examples:
+            return
+        # Only questions added since the last stack are embedded; removed slots stay as zero rows
+        zero = None
+        rows = []
+        for example in self._examples:
+            if example is None:
+                zero = zero if zero is not None else np.zeros(self.embedder.dim, dtype=np.float32)
+                rows.append(zero)
+                continue
+            question = example[0]
+            if self._embedded.get(question) is None:
+                self._embedded[question] = self.embedder.embed(question)
+            rows.append(self._embedded[question])
+        self._vectors = np.stack(rows)
+
+    def _ensure_index(self):
+        # Removed examples leave empty slots; start over once they outnumber the live ones
+        if self._index is None or len(self._examples) > 2 * len(self._index) + 64:
+            self._build()
+        self._ensure_vectors()
+
+    def prepare(self):
+        """Build the index now rather than on the first lookup"""
+        with self._lock:
+            self._ensure_index()
+        return self
+
+    def _ranked(self, question, k):
+        lexical = dict(self._index.search(question, k=k * 4))
+        if self._vectors is None:
+            return sorted(lexical, key=lambda i: -lexical[i])[:k]
+
+        # Hybrid: BM25 scaled to [0, 1] by the best match, blended with cosine similarity
+        best = max(lexical.values(), default=0.0)
+        similarities = self._vectors @ self.embedder.embed(question)
+        candidates = set(lexical) | {int(i) for i in np.argsort(-similarities)[:k * 4] if self._examples[i] is not None}
+        scores = {
+            i: self.lexical_weight * (lexical.get(i, 0.0) / best if best else 0.0)
+            + (1 - self.lexical_weight) * float(similarities[i])
+            for i in candidates
+        }
+        return sorted(scores, key=lambda i: -scores[i])[:k]
+
+    def select(self, question, k=None, budget=None):
+        """Up to k nearest (question, sql) examples whose rendered text fits in `budget` tokens"""
+        k = k or int(os.getenv("FEW_SHOT_K", "3"))
+        budget = budget if budget is not None else int(os.getenv("FEW_SHOT_TOKEN_BUDGET", "400"))
+        start = time.perf_counter()
+        with self._lock:
+            self._ensure_index()
+            ranked = [self._examples[i] for i in self._ranked(question, k)]
+            self.lookups += 1
+            self.lookup_seconds += time.perf_counter() - start
+
+        selected, used = [], 0
+        for example in ranked:
+            tokens = estimate_tokens(format_examples([example]))
+            if used + tokens > budget:
+                continue
+            selected.append(example)
+            used += tokens
+        return selected
+
+    def add(self, question, sql):
+        """Remember a question whose SQL ran successfully"""
+        key = normalize_question(question)
+        with self._lock:
+            if key in self._seed_keys:
+                return False
+            if key in self._learned_keys:
+                if (question, sql) in self._learned:
+                    return False
+                self._learned = [(known, known_sql) for known, known_sql in self._learned if normalize_question(known) != key]
+            self._learned.append((question, sql))
+            self._learned_keys.add(key)
+            evicted = self._learned[:-self.max_learned]
+            if evicted:
+                self._learned = self._learned[-self.max_learned:]
+                self._learned_keys.difference_update(normalize_question(known) for known, _ in evicted)
+                self._rewrite()
+            elif self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"question": question, "sql": sql}) + "\n")
+            if self._index is not None:
+                for old_question, _ in evicted:
+                    self._discard(normalize_question(old_question))
+                self._discard(key)
+                self._insert(key, question, sql)
+        return True
+
+    def _rewrite(self):
+        if not self.path:
+            return
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            for question, sql in self._learned:
+                f.write(json.dumps({"question": question, "sql": sql}) + "\n")
+        os.replace(tmp_file, self.path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "seeds": len(self._seeds),
+                "learned": len(self._learned),
+                "lookups": self.lookups,
+                "mean_lookup_ms": self.lookup_seconds * 1000 / self.lookups if self.lookups else 0.0,
+            }
+
+def format_examples(examples):
+    """Examples as Question/SQL pairs for the query prompt"""
+    return "\n\n".join(f"Question: {question}\nSQL Query: {sql}" for question, sql in examples)
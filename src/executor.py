@@ -0,0 +1,119 @@
+import os
+import sqlalchemy
+from result_format import format_value
+
+def query_timeout_ms():
+    """statement_timeout for generated queries: QUERY_TIMEOUT_MS, never above the pool-wide DB_STATEMENT_TIMEOUT"""
+    from database import statement_timeout_ms
+
+    return min(int(os.getenv("QUERY_TIMEOUT_MS", "10000")), statement_timeout_ms())
+
+def _session_sql(engine):
+    """Statements that make the transaction read-only and time-limited on PostgreSQL; none elsewhere
+
+    The read-only transaction backs up the query guard: whatever slips past
+    its checks still cannot write.
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+    return [
+        "SET TRANSACTION READ ONLY",
+        f"SET LOCAL statement_timeout = {query_timeout_ms()}",
+    ]
+
+def _limits(max_rows, max_bytes, batch_size):
+    return (
+        max_rows or int(os.getenv("MAX_RESULT_ROWS", "200")),
+        max_bytes or int(os.getenv("MAX_RESULT_BYTES", "65536")),
+        batch_size or int(os.getenv("FETCH_BATCH_SIZE", "100")),
+    )
+
+def _shrink(row, max_bytes):
+    """The row with long text values cut so it fits in max_bytes"""
+    share = max(max_bytes // max(len(row), 1) - 4, 1)
+    return tuple(
+        value[:share] + "..." if isinstance(value, str) and len(value) > share else value
+        for value in row
+    )
+
+def _row_size(row):
+    return sum(len(format_value(value)) + 1 for value in row)
+
+class ResultCollector:
+    """Keeps fetched rows until the row or byte budget is spent
+
+    A first row larger than the whole budget is kept with its text values cut
+    down, so one huge value cannot blow past the budget either.
+    """
+
+    def __init__(self, max_rows, max_bytes):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = []
+        self.bytes = 0
+        self.truncated = False
+
+    def add(self, batch):
+        """Add a fetched batch; False once the budget is exhausted and fetching should stop"""
+        for row in batch:
+            row = tuple(row)
+            size = _row_size(row)
+            if len(self.rows) >= self.max_rows or (self.rows and self.bytes + size > self.max_bytes):
+                self.truncated = True
+                return False
+            if size > self.max_bytes:
+                row = _shrink(row, self.max_bytes)
+                size = _row_size(row)
+                self.rows.append(row)
+                self.bytes += size
+                self.truncated = True
+                return False
+            self.rows.append(row)
+            self.bytes += size
+        return True
+
+    def result(self, columns):
+        return {"columns": columns, "rows": self.rows, "truncated": self.truncated}
+
+def run_query(engine, query, max_rows=None, max_bytes=None, batch_size=None):
+    """Execute with a server-side cursor, fetching in batches until the budget is spent"""
+    max_rows, max_bytes, batch_size = _limits(max_rows, max_bytes, batch_size)
+    collector = ResultCollector(max_rows, max_bytes)
+
+    with engine.connect() as conn:
+        for statement in _session_sql(engine):
+            conn.exec_driver_sql(statement)
+        conn = conn.execution_options(stream_results=True, max_row_buffer=batch_size)
+        cursor = conn.execute(sqlalchemy.text(query))
+        if not cursor.returns_rows:
+            return collector.result([])
+        columns = list(cursor.keys())
+        try:
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch or not collector.add(batch):
+                    break
+        finally:
+            cursor.close()
+
+    return collector.result(columns)
+
+async def arun_query(async_engine, query, max_rows=None, max_bytes=None, batch_size=None):
+    """Async run_query: streams rows through AsyncConnection.stream"""
+    max_rows, max_bytes, batch_size = _limits(max_rows, max_bytes, batch_size)
+    collector = ResultCollector(max_rows, max_bytes)
+
+    async with async_engine.connect() as conn:
+        for statement in _session_sql(async_engine):
+            await conn.exec_driver_sql(statement)
+        cursor = await conn.stream(sqlalchemy.text(query), execution_options={"max_row_buffer": batch_size})
+        columns = list(cursor.keys())
+        try:
+            while True:
+                batch = await cursor.fetchmany(batch_size)
+                if not batch or not collector.add(batch):
+                    break
+        finally:
+            await cursor.close()
+
+    return collector.result(columns)
@@ -0,0 +1,73 @@
+import asyncio
+import itertools
+import os
+import time
+from typing import Callable, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+from text_index import estimate_tokens
+
+def _prompt_text(messages):
+    return "\n".join(str(message.content) for message in messages)
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model with canned replies and a fixed latency, for tests and benchmarks
+
+    Replies come from `reply(prompt_text)` when given, else cycle through
+    `responses`. Each call sleeps `latency` seconds plus `token_latency` per
+    prompt token, a rough stand-in for prefill cost. With `prefix_cache` the
+    tokens shared with the start of the previous prompt are free, like a
+    server that keeps one KV cache slot between requests.
+    """
+
+    model: str = "fake"
+    responses: list = ["SELECT 1"]
+    reply: Optional[Callable] = None
+    latency: float = 0.0
+    token_latency: float = 0.0
+    prefix_cache: bool = False
+    error: str = ""
+
+    _replies = PrivateAttr(default=None)
+    _last_prompt = PrivateAttr(default="")
+    calls: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def _delay(self, prompt):
+        tokens = estimate_tokens(prompt)
+        cached = 0
+        if self.prefix_cache:
+            cached = estimate_tokens(os.path.commonprefix([self._last_prompt, prompt]))
+            self._last_prompt = prompt
+        self.prompt_tokens += tokens
+        self.cached_tokens += cached
+        return self.latency + self.token_latency * (tokens - cached)
+
+    def _reply(self, prompt):
+        self.calls += 1
+        if self.error:
+            raise RuntimeError(self.error)
+        if self.reply is not None:
+            content = self.reply(prompt)
+        else:
+            if self._replies is None:
+                self._replies = itertools.cycle(self.responses)
+            content = next(self._replies)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = _prompt_text(messages)
+        time.sleep(self._delay(prompt))
+        return self._reply(prompt)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = _prompt_text(messages)
+        await asyncio.sleep(self._delay(prompt))
+        return self._reply(prompt)
@@ -0,0 +1,33 @@
+import os
+import re
+from result_format import format_value
+
+def humanize(column):
+    if not re.fullmatch(r"\w+", column or ""):
+        return "Result"
+    label = column.replace("_", " ").strip()
+    return label[:1].upper() + label[1:]
+
+def render_answer(columns, rows, max_rows=None, max_columns=None):
+    """Template answer for empty, scalar, single-row or small tabular results, else None"""
+    max_rows = max_rows if max_rows is not None else int(os.getenv("FAST_PATH_MAX_ROWS", "10"))
+    max_columns = max_columns if max_columns is not None else int(os.getenv("FAST_PATH_MAX_COLUMNS", "4"))
+
+    if not rows:
+        return "No matching records were found."
+    if len(columns) > max_columns or len(rows) > max_rows:
+        return None
+
+    if len(rows) == 1 and len(columns) == 1:
+        return f"{humanize(columns[0])}: {format_value(rows[0][0])}"
+
+    if len(rows) == 1:
+        return ", ".join(f"{humanize(column)}: {format_value(value)}" for column, value in zip(columns, rows[0]))
+
+    lines = [f"Found {len(rows)} results:"]
+    if len(columns) == 1:
+        lines.extend(f"- {format_value(row[0])}" for row in rows)
+    else:
+        lines.append("  " + " | ".join(humanize(column) for column in columns))
+        lines.extend("- " + " | ".join(format_value(value) for value in row) for row in rows)
+    return "\n".join(lines)
@@ -0,0 +1,246 @@
+import argparse
+import json
+import time
+import sqlalchemy
+import sqlglot
+from sqlglot import exp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from query_guard import sql_dialect
+from workload import aggregate, read_workload
+
+# Comparisons a btree index can serve when the column is not wrapped in a function
+PREDICATES = (exp.EQ, exp.GT, exp.GTE, exp.LT, exp.LTE, exp.In, exp.Between)
+
+def schema_columns(engine):
+    """Lowercase column names per table"""
+    inspector = sqlalchemy.inspect(engine)
+    return {
+        table.lower(): {column["name"].lower() for column in inspector.get_columns(table)}
+        for table in inspector.get_table_names()
+    }
+
+def existing_indexes(engine):
+    """Leading column of every index and primary key, per table"""
+    inspector = sqlalchemy.inspect(engine)
+    leading = {}
+    for table in inspector.get_table_names():
+        columns = leading.setdefault(table.lower(), set())
+        primary_key = inspector.get_pk_constraint(table).get("constrained_columns") or []
+        if primary_key:
+            columns.add(primary_key[0].lower())
+        for index in inspector.get_indexes(table):
+            if index["column_names"] and index["column_names"][0]:
+                columns.add(index["column_names"][0].lower())
+    return leading
+
+def _bare(column, predicate):
+    node = column.parent
+    while node is not None and node is not predicate:
+        if isinstance(node, exp.Func):
+            return False
+        node = node.parent
+    return True
+
+def _resolve(column, aliases, schema):
+    if column.table:
+        return aliases.get(column.table.lower())
+    owners = [table for table in set(aliases.values()) if column.name.lower() in schema.get(table, ())]
+    return owners[0] if len(owners) == 1 else None
+
+def candidate_columns(query, dialect, schema):
+    """(table, column) pairs the query filters or joins on, in order of appearance"""
+    try:
+        tree = sqlglot.parse_one(query, read=dialect)
+    except sqlglot.errors.SqlglotError:
+        return []
+
+    found = []
+    for select in tree.find_all(exp.Select):
+        aliases = {table.alias_or_name.lower(): table.name.lower() for table in select.find_all(exp.Table)}
+        conditions = [select.args["where"]] if select.args.get("where") else []
+        for join in select.args.get("joins") or []:
+            if join.args.get("on") is not None:
+                conditions.append(join.args["on"])
+            for using in join.args.get("using") or []:
+                for table in set(aliases.values()):
+                    if using.name.lower() in schema.get(table, ()):
+                        found.append((table, using.name.lower()))
+        for condition in conditions:
+            for predicate in condition.find_all(*PREDICATES):
+                for column in predicate.find_all(exp.Column):
+                    table = _resolve(column, aliases, schema)
+                    if table is not None and _bare(column, predicate):
+                        found.append((table, column.name.lower()))
+    return list(dict.fromkeys(found))
+
+def has_parameters(query, dialect):
+    """True when the query has literals outside LIMIT, i.e. it answers one specific value"""
+    try:
+        tree = sqlglot.parse_one(query, read=dialect)
+    except sqlglot.errors.SqlglotError:
+        return True
+    return any(not isinstance(literal.parent, exp.Limit) for literal in tree.find_all(exp.Literal))
+
+def is_summary_query(query, dialect):
+    """Aggregates over a join: the shape a materialized view pays off for"""
+    try:
+        tree = sqlglot.parse_one(query, read=dialect)
+    except sqlglot.errors.SqlglotError:
+        return False
+    tables = {table.name.lower() for table in tree.find_all(exp.Table)}
+    return len(tables) > 1 and tree.find(exp.AggFunc) is not None
+
+def view_definition(query, dialect):
+    """The query without ORDER BY and LIMIT, which belong to the readers of the view"""
+    tree = sqlglot.parse_one(query, read=dialect)
+    tree.set("order", None)
+    tree.set("limit", None)
+    return tree.sql(dialect=dialect)
+
+def plan_cost(conn, query):
+    plan = conn.execute(sqlalchemy.text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]["Total Cost"]
+
+def run_time(conn, query, repeat):
+    """Best of `repeat` runs in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sqlalchemy.text(query)).fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def has_hypopg(engine):
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as conn:
+        return conn.execute(sqlalchemy.text("SELECT 1 FROM pg_extension WHERE extname = 'hypopg'")).first() is not None
+
+def what_if(engine, query, table, column, hypothetical=False, repeat=3):
+    """(before, after) for the query with an index on table.column that is thrown away afterwards
+
+    PostgreSQL compares EXPLAIN costs, using a hypopg hypothetical index when
+    available and otherwise a real index inside a rolled-back transaction.
+    Other databases compare best-of-N run times around a temporary index.
+    """
+    ddl = f"CREATE INDEX advisor_what_if ON {table} ({column})"
+    postgres = engine.dialect.name == "postgresql"
+    with engine.connect() as conn:
+        measure = (lambda: plan_cost(conn, query)) if postgres else (lambda: run_time(conn, query, repeat))
+        try:
+            before = measure()
+            if hypothetical:
+                conn.execute(sqlalchemy.text("SELECT * FROM hypopg_create_index(:ddl)"), {"ddl": ddl})
+            else:
+                conn.exec_driver_sql(ddl)
+            after = measure()
+        finally:
+            if postgres:
+                conn.rollback()
+                if hypothetical:
+                    conn.exec_driver_sql("SELECT hypopg_reset()")
+            else:
+                conn.exec_driver_sql("DROP INDEX IF EXISTS advisor_what_if")
+                conn.commit()
+    return before, after
+
+def advise(engine, groups, top=20, min_count=2, min_gain=0.1, build=False):
+    """Index and materialized view proposals for the heaviest query groups, best estimated saving first
+
+    Candidates are measured with hypopg when it is installed. Otherwise only
+    `build=True` measures them, by building each index for real, which takes
+    time and locks on a live database; without it they are listed unmeasured.
+    """
+    dialect = sql_dialect(engine)
+    schema = schema_columns(engine)
+    indexed = existing_indexes(engine)
+    hypothetical = has_hypopg(engine)
+    postgres = engine.dialect.name == "postgresql"
+    measure = hypothetical or build
+
+    indexes = {}
+    views = []
+    for group in groups[:top]:
+        for table, column in candidate_columns(group["example"], dialect, schema):
+            if column in indexed.get(table, ()):
+                continue
+            proposal = indexes.setdefault((table, column), {
+                "kind": "index",
+                "sql": f"CREATE INDEX ON {table} ({column})",
+                "queries": [],
+                "estimated_saving_ms": 0.0 if measure else None,
+            })
+            entry = {"fingerprint": group["fingerprint"], "count": group["count"], "total_ms": round(group["total_ms"], 3)}
+            if measure:
+                try:
+                    before, after = what_if(engine, group["example"], table, column, hypothetical)
+                except sqlalchemy.exc.SQLAlchemyError as e:
+                    print(f"What-if failed for {table}.{column}: {e}")
+                    continue
+                gain = (before - after) / before if before else 0.0
+                if gain < min_gain:
+                    continue
+                # Costs are relative, so scale the observed time; timings are absolute per run
+                saving = group["total_ms"] * gain if postgres else (before - after) * group["count"]
+                entry.update({"before": round(before, 3), "after": round(after, 3), "gain": round(gain, 3)})
+                proposal["estimated_saving_ms"] += saving
+            proposal["queries"].append(entry)
+
+        if group["count"] >= min_count and is_summary_query(group["example"], dialect) and not has_parameters(group["example"], dialect):
+            views.append({
+                "kind": "materialized_view",
+                "sql": f"CREATE MATERIALIZED VIEW advisor_mv_{group['fingerprint'][:8]} AS {view_definition(group['example'], dialect)}",
+                "queries": [{"fingerprint": group["fingerprint"], "count": group["count"], "total_ms": round(group["total_ms"], 3)}],
+                # Every run but one refresh per workload window is served from the view
+                "estimated_saving_ms": group["total_ms"] - group["mean_ms"],
+            })
+
+    proposals = [proposal for proposal in indexes.values() if proposal["queries"]] + views
+    return sorted(proposals, key=lambda proposal: -(proposal["estimated_saving_ms"] or 0.0))
+
+def main():
+    from app_context import get_context
+
+    parser = argparse.ArgumentParser(description="Propose indexes and materialized views for a recorded query workload")
+    parser.add_argument("workload", help="JSONL written with WORKLOAD_LOG")
+    parser.add_argument("--top", type=int, default=20, help="query groups to analyze, by total time")
+    parser.add_argument("--min-count", type=int, default=2, help="runs before a materialized view is proposed")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="smallest relative improvement to report")
+    parser.add_argument("--build", action="store_true",
+                        help="without hypopg, measure candidates by building each index on the database (slow, takes locks)")
+    parser.add_argument("-o", "--output", default=None, help="write the proposals as JSON")
+    args = parser.parse_args()
+
+    groups = aggregate(read_workload(args.workload))
+    engine = get_context().db._engine
+
+    print("Workload")
+    print("=" * 30)
+    for group in groups[:args.top]:
+        print(f"{group['count']:>6}x  {group['total_ms']:>10.1f} ms total  {group['mean_ms']:>8.1f} ms mean  {group['sql'][:100]}")
+
+    if not args.build and not has_hypopg(engine):
+        print("hypopg is not installed: listing candidate indexes without measuring them (--build to measure)\n")
+    proposals = advise(engine, groups, args.top, args.min_count, args.min_gain, build=args.build)
+    print("\nProposals")
+    print("=" * 30)
+    if not proposals:
+        print("No missing indexes or materialized views found")
+    for proposal in proposals:
+        saving = proposal["estimated_saving_ms"]
+        estimate = f"~{saving:.1f} ms saved" if saving is not None else "benefit not measured"
+        print(f"{proposal['sql']}\n    {estimate} across {sum(q['count'] for q in proposal['queries'])} runs")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(proposals, f, indent=2)
+        print(f"\nProposals written to {args.output}")
+
+if __name__ == "__main__":
+    main()
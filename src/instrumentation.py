@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from metrics import (
+    CACHE_REQUESTS, DB_ROWS, DB_SECONDS, LLM_SECONDS, LLM_TOKENS, REQUEST_SECONDS, REQUESTS, SQL_REPAIRS, STAGE_SECONDS,
+)
+from text_index import estimate_tokens
+
+request_log = logging.getLogger("sql_qa.requests")
+
+# Answer paths of requests that ended without an answer from the data
+FAILED_PATHS = ("error", "rejected")
+
+def _tracer():
+    if os.getenv("OTEL_TRACING", "0") != "1":
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace.get_tracer("sql_qa")
+
+def _token_usage(response):
+    """(prompt, completion) tokens as reported by the model, or (None, None)"""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens"), usage.get("output_tokens")
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+def _completion_text(response):
+    return "".join(generation.text for generations in response.generations for generation in generations)
+
+class PipelineInstrumentation(BaseCallbackHandler):
+    """Callback handler that times graph nodes and LLM calls and logs one line per graph run
+
+    Runs are grouped by their root (the graph invocation). Each node records its
+    wall time; LLM calls record latency and token counts under the node that
+    made them; execute_query and lookup_query outputs supply DB time, row
+    counts and cache hits. Optional OpenTelemetry spans mirror the same tree.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._runs = {}
+        self._tracer = _tracer()
+
+    def _start(self, run_id, parent_run_id, name, kind, extra=None):
+        now = time.perf_counter()
+        with self._lock:
+            parent = self._runs.get(parent_run_id)
+            if parent is None:
+                if kind != "chain":
+                    return
+                root = run_id
+                self._requests[root] = {"start": now, "stages": {}, "llm": {}, "attributes": {}}
+                node, stage = False, None
+            else:
+                root = parent["root"]
+                # Node runs are the direct children of the graph run
+                node = parent_run_id == root and kind == "chain"
+                stage = name if node else parent["stage"]
+            self._runs[run_id] = {"root": root, "stage": stage, "node": node, "start": now, **(extra or {})}
+
+        if self._tracer is not None:
+            self._start_span(run_id, parent_run_id, name if parent is not None else "sql_qa.request")
+
+    def _start_span(self, run_id, parent_run_id, name):
+        from opentelemetry import trace
+
+        parent_span = self._runs.get(parent_run_id, {}).get("span")
+        context = trace.set_span_in_context(parent_span) if parent_span is not None else None
+        self._runs[run_id]["span"] = self._tracer.start_span(name, context=context)
+
+    def _end(self, run_id):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None, None
+        run["elapsed"] = time.perf_counter() - run["start"]
+        return run, self._requests.get(run["root"])
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, kwargs.get("name") or "chain", "chain")
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        run, request = self._end(run_id)
+        if run is None:
+            return
+        if run_id == run["root"]:
+            self._finish_request(run_id, request, run, outputs, "ok")
+        elif run["node"]:
+            self._record_stage(request, run, outputs)
+        self._end_span(run)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        run, request = self._end(run_id)
+        if run is None:
+            return
+        if run_id == run["root"]:
+            request["attributes"]["error"] = str(error)
+            self._finish_request(run_id, request, run, {}, "error")
+        self._end_span(run, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        prompt = "\n".join(str(message.content) for batch in messages for message in batch)
+        self._start(run_id, parent_run_id, kwargs.get("name") or "llm", "llm", {"prompt": prompt})
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, kwargs.get("name") or "llm", "llm", {"prompt": "\n".join(prompts)})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run, request = self._end(run_id)
+        if run is None:
+            return
+        stage = run["stage"] or "unknown"
+        prompt_tokens, completion_tokens = _token_usage(response)
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens(run.get("prompt", ""))
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(_completion_text(response))
+
+        LLM_SECONDS.observe(run["elapsed"], stage=stage)
+        LLM_TOKENS.inc(prompt_tokens, stage=stage, kind="prompt")
+        LLM_TOKENS.inc(completion_tokens, stage=stage, kind="completion")
+        if request is not None:
+            with self._lock:
+                llm = request["llm"].setdefault(stage, {"ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+                llm["ms"] += run["elapsed"] * 1000
+                llm["prompt_tokens"] += prompt_tokens
+                llm["completion_tokens"] += completion_tokens
+        if run.get("span") is not None:
+            run["span"].set_attribute("llm.prompt_tokens", prompt_tokens)
+            run["span"].set_attribute("llm.completion_tokens", completion_tokens)
+        self._end_span(run)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run, _ = self._end(run_id)
+        if run is not None:
+            self._end_span(run, error)
+
+    def _record_stage(self, request, run, outputs):
+        stage = run["stage"]
+        STAGE_SECONDS.observe(run["elapsed"], stage=stage)
+        if request is None:
+            return
+        outputs = outputs if isinstance(outputs, dict) else {}
+        attributes = request["attributes"]
+        with self._lock:
+            request["stages"][stage] = round(request["stages"].get(stage, 0.0) + run["elapsed"] * 1000, 3)
+
+        if stage == "lookup_query" and "cache_hit" in outputs:
+            attributes["query_cache"] = "hit" if outputs["cache_hit"] else "miss"
+            CACHE_REQUESTS.inc(cache="query", result=attributes["query_cache"])
+        if stage == "execute_query" and "db_ms" in outputs:
+            attributes["result_cache"] = "hit" if outputs.get("result_cache_hit") else "miss"
+            attributes["rows"] = len(outputs.get("rows") or [])
+            attributes["db_ms"] = round(outputs["db_ms"], 3)
+            CACHE_REQUESTS.inc(cache="result", result=attributes["result_cache"])
+            if not outputs.get("result_cache_hit"):
+                DB_SECONDS.observe(outputs["db_ms"] / 1000)
+                DB_ROWS.inc(attributes["rows"])
+        if run.get("span") is not None:
+            for key, value in attributes.items():
+                run["span"].set_attribute(f"sql_qa.{key}", value)
+
+    def _finish_request(self, run_id, request, run, outputs, status):
+        with self._lock:
+            self._requests.pop(run_id, None)
+        outputs = outputs if isinstance(outputs, dict) else {}
+        answer_path = outputs.get("answer_path") or "none"
+        REQUESTS.inc(status=status, answer_path=answer_path)
+        REQUEST_SECONDS.observe(run["elapsed"])
+        repairs = outputs.get("attempts") or 0
+        if repairs:
+            SQL_REPAIRS.inc(repairs, outcome="failed" if answer_path in FAILED_PATHS else "fixed")
+
+        record = {
+            "event": "request",
+            "status": status,
+            "question": outputs.get("question"),
+            "total_ms": round(run["elapsed"] * 1000, 3),
+            "stages": request["stages"],
+            "llm": {stage: {**llm, "ms": round(llm["ms"], 3)} for stage, llm in request["llm"].items()},
+            "answer_path": answer_path,
+            "repairs": repairs,
+            **request["attributes"],
+        }
+        if request_log.isEnabledFor(logging.INFO):
+            request_log.info(json.dumps(record, default=str))
+
+    def _end_span(self, run, error=None):
+        span = run.get("span")
+        if span is None:
+            return
+        if error is not None:
+            span.record_exception(error)
+        span.end()
+
+def configure_request_log(path=None):
+    """Send the per-request JSON lines to a file, or to stderr with path "-" """
+    path = path if path is not None else os.getenv("REQUEST_LOG", "-")
+    if not path or request_log.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr) if path == "-" else logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    request_log.addHandler(handler)
+    request_log.setLevel(logging.INFO)
+    request_log.propagate = False
+
+def instrument(graph):
+    """The compiled graph with instrumentation attached to every run, unless METRICS=0"""
+    if os.getenv("METRICS", "1") == "0":
+        return graph
+    return graph.with_config(callbacks=[PipelineInstrumentation()])
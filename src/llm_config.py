@@ -1,63 +1,202 @@
+import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 from dotenv import load_dotenv
 from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
 
 load_dotenv()
 
-def get_available_llm():
-    """Get available LLM with priority: Ollama -> OpenAI"""
+OLLAMA_MODELS = [
+    "codellama:7b-instruct-q4_0",
+    "llama2:7b-chat-q4_0",
+    "phi:latest",
+    "mistral:7b-instruct-q4_0"
+]
+
+OPENAI_MODEL = "gpt-3.5-turbo"
+
+def _ollama_base_url():
+    return os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+def _openai_api_key():
+    api_key = os.getenv("OPENAI_API_KEY")
+    if api_key and api_key.strip() and not api_key.startswith('your_'):
+        return api_key
+    return None
+
+def _state_file():
+    return os.getenv("LLM_STATE_FILE", ".llm_backend.json")
+
+def check_ollama(timeout):
+    """First preferred model installed on the Ollama server, from /api/tags (no generation)"""
+    response = httpx.get(f"{_ollama_base_url()}/api/tags", timeout=timeout)
+    response.raise_for_status()
     
-    ollama_models = [
-        "codellama:7b-instruct-q4_0",
-        "llama2:7b-chat-q4_0",
-        "phi:latest",
-        "mistral:7b-instruct-q4_0"
-    ]
+    installed = set()
+    for model in response.json().get("models", []):
+        installed.add(model["name"])
+        if model["name"].endswith(":latest"):
+            installed.add(model["name"][:-len(":latest")])
     
-    for model in ollama_models:
-        try:
-            llm = ChatOllama(
-                model=model,
-                base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
-                temperature=0,
-                top_k=1,
-                top_p=0.1
-            )
-            
-            test_prompt = "Create a PostgreSQL query to count records in table 'artist'. Return only SQL:"
-            test_response = llm.invoke(test_prompt)
-            
-            response_text = test_response.content.strip().lower()
-            if any(word in response_text for word in ['select', 'count', 'from', 'artist']):
-                return llm, "ollama"
-            
-        except Exception:
-            continue
+    preferred = [os.getenv("OLLAMA_MODEL")] + OLLAMA_MODELS
+    for model in preferred:
+        if model and model in installed:
+            return model
+    return None
+
+def check_openai(timeout):
+    """Configured OpenAI model if the key can see it, from the models endpoint (no generation)"""
+    api_key = _openai_api_key()
+    if not api_key:
+        return None
     
+    base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    response = httpx.get(
+        f"{base_url}/models/{OPENAI_MODEL}",
+        headers={"Authorization": f"Bearer {api_key}"},
+        timeout=timeout,
+    )
+    return OPENAI_MODEL if response.status_code == 200 else None
+
+def _safe_check(check, timeout):
     try:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key and api_key.strip() and not api_key.startswith('your_'):
-            llm = ChatOpenAI(
-                temperature=0, 
-                api_key=api_key, 
-                model="gpt-3.5-turbo"
-            )
-            test_response = llm.invoke("Hi")
-            return llm, "openai"
+        return check(timeout)
     except Exception:
+        return None
+
+def discover_backend(timeout=None):
+    """Run the availability checks concurrently and pick Ollama before OpenAI"""
+    timeout = timeout or float(os.getenv("LLM_DISCOVERY_TIMEOUT", "3"))
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        ollama = pool.submit(_safe_check, check_ollama, timeout)
+        openai = pool.submit(_safe_check, check_openai, timeout)
+        ollama_model, openai_model = ollama.result(), openai.result()
+    
+    if ollama_model:
+        return {"llm_type": "ollama", "model": ollama_model, "base_url": _ollama_base_url()}
+    if openai_model:
+        return {"llm_type": "openai", "model": openai_model}
+    return None
+
+def _backend_config():
+    """Settings that decide which backend discovery picks; a saved choice is only reused while they match"""
+    return {
+        "ollama_model": os.getenv("OLLAMA_MODEL", ""),
+        "ollama_base_url": _ollama_base_url(),
+        "openai_key": _openai_api_key() is not None,
+        "openai_base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+    }
+
+def load_backend_state():
+    """Backend chosen by an earlier run, if still fresh and matching the configuration"""
+    try:
+        with open(_state_file(), encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if time.time() - state.get("checked_at", 0) > float(os.getenv("LLM_STATE_TTL", "86400")):
+        return None
+    if state.get("config") != _backend_config():
+        return None
+    return state
+
+def save_backend_state(backend):
+    try:
+        with open(_state_file(), "w", encoding="utf-8") as f:
+            json.dump({**backend, "config": _backend_config(), "checked_at": time.time()}, f)
+    except OSError:
         pass
+
+def clear_backend_state():
+    """Forget the cached backend so the next start, or the next request after a failed first call, runs discovery again"""
+    try:
+        os.remove(_state_file())
+    except OSError:
+        pass
+
+def create_llm(backend):
+    """Chat model for a discovered backend; nothing is loaded until the first request"""
+    if backend["llm_type"] == "fake":
+        from fake_llm import FakeChatModel
+        
+        return FakeChatModel(model=backend["model"] or "fake", latency=float(os.getenv("FAKE_LLM_LATENCY", "0")))
+    if backend["llm_type"] == "ollama":
+        return ChatOllama(
+            model=backend["model"],
+            base_url=backend["base_url"],
+            temperature=0,
+            top_k=1,
+            top_p=0.1,
+            # Keep the model, and with it the cached prompt prefix, loaded between bursts
+            keep_alive=_keep_alive(),
+            num_ctx=int(os.getenv("OLLAMA_NUM_CTX", "4096")),
+        )
+    return ChatOpenAI(
+        temperature=0,
+        api_key=_openai_api_key(),
+        model=backend["model"]
+    )
+
+def parse_backend_spec(spec):
+    """Backend from "ollama:<model>[@<base_url>]", "openai:<model>" or "fake:<name>" """
+    llm_type, _, rest = spec.strip().partition(":")
+    model, _, base_url = rest.partition("@")
+    if llm_type not in ("ollama", "openai", "fake"):
+        raise ValueError(f"Unknown LLM backend type in {spec!r}")
+    backend = {"llm_type": llm_type, "model": model}
+    if llm_type == "ollama":
+        backend["base_url"] = base_url or _ollama_base_url()
+    return backend
+
+def create_router(specs):
+    """LLMRouter over a comma-separated LLM_BACKENDS list; prompts follow the first backend's type"""
+    from llm_router import Backend, LLMRouter
     
-    raise Exception("No LLM available. Please start Ollama or add valid OpenAI API key")
+    backends = [parse_backend_spec(spec) for spec in specs.split(",") if spec.strip()]
+    router = LLMRouter(
+        [Backend(f"{b['llm_type']}:{b['model']}" + (f"@{b['base_url']}" if "base_url" in b else ""), create_llm(b)) for b in backends],
+        model=",".join(sorted({b["model"] for b in backends})),
+        timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+        hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0")),
+        backend_workers=int(os.getenv("LLM_BACKEND_WORKERS", "4")),
+    )
+    return router, "openai" if backends[0]["llm_type"] == "openai" else "ollama"
+
+def get_available_llm(use_cache=True):
+    """Get available LLM with priority: Ollama -> OpenAI, or a router when LLM_BACKENDS is set"""
+    specs = os.getenv("LLM_BACKENDS", "").strip()
+    if specs:
+        return create_router(specs)
+    
+    backend = load_backend_state() if use_cache else None
+    
+    if backend is None:
+        backend = discover_backend()
+        if backend is None:
+            raise Exception("No LLM available. Please start Ollama or add valid OpenAI API key")
+        save_backend_state(backend)
+    
+    return create_llm(backend), backend["llm_type"]
+
+def _keep_alive():
+    value = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    return int(value) if value.lstrip("-").isdigit() else value
 
 def get_llm_specific_prompt(llm_type):
-    """Get LLM-specific prompts"""
+    """Get LLM-specific prompts
+
+    Instructions and schema come first and are identical for every question,
+    so backends that cache the prompt prefix (Ollama's KV cache, OpenAI
+    prompt caching) only process the examples and the question on each call.
+    The repair prompt starts with the same prefix.
+    """
     
     if llm_type == "ollama":
-        return {
-            "system_template": """You are a PostgreSQL expert. Create ONLY a valid SQL query.
-
-Database tables: {table_info}
+        prefix = """You are a PostgreSQL expert. Create ONLY a valid SQL query.
 
 Rules:
 - Return ONLY the SQL query, no explanations
@@ -65,6 +204,10 @@ Rules:
 - Limit to {top_k} results
 - No markdown formatting
 
+Database tables: {table_info}
+"""
+        return {
+            "system_template": prefix + """{examples}
 Question: {input}
 
 SQL Query:""",
@@ -72,25 +215,40 @@ SQL Query:""",
 SQL Query: {query}  
 Database Result: {result}
 
-Provide a clear, concise answer based on the result:"""
+Provide a clear, concise answer based on the result:""",
+            "repair_template": prefix + """
+Question: {input}
+Failed SQL: {query}
+Error: {error}
+
+The failed SQL must be fixed. Return ONLY the corrected SQL query.
+
+SQL Query:"""
         }
     else:
         return {
-            "system_template": """You are a PostgreSQL database expert. Given an input question, create a syntactically correct PostgreSQL query to run. 
+            "system_template": """You are a PostgreSQL database expert. Given an input question, create a syntactically correct PostgreSQL query to run.
 
 Unless the user specifies a specific number of examples, always limit your query to at most {top_k} results using LIMIT clause.
 
-Only use the following tables:
-{table_info}
-
-Question: {input}
+Return ONLY the SQL query, no explanations or markdown formatting.
 
-Return ONLY the SQL query, no explanations or markdown formatting.""",
+Only use the following tables:
+{table_info}""",
+            "question_template": """{examples}
+Question: {input}""",
             "answer_template": """Based on the database query result, provide a clear and concise answer to the user's question.
 
 Question: {question}
 SQL Query: {query}
 Query Result: {result}
 
-Answer:"""
-        }
\ No newline at end of file
+Answer:""",
+            "repair_template": """The following PostgreSQL query failed. Rewrite it so that it runs and answers the question.
+
+Question: {input}
+Failed SQL: {query}
+Error: {error}
+
+Return ONLY the corrected SQL query, no explanations or markdown formatting."""
+        }
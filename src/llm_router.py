@@ -0,0 +1,397 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from pydantic import PrivateAttr
+
+class BackendUnavailable(Exception):
+    """Every backend failed, timed out or has its circuit open"""
+
+class Backend:
+    """One chat model with its in-flight count, latency history and circuit breaker"""
+
+    def __init__(self, name, llm, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.llm = llm
+        self.failure_threshold = failure_threshold or int(os.getenv("LLM_FAILURE_THRESHOLD", "3"))
+        self.reset_timeout = reset_timeout if reset_timeout is not None else float(os.getenv("LLM_CIRCUIT_RESET", "30"))
+        self.outstanding = 0
+        self.latencies = deque(maxlen=200)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def is_open(self, now=None):
+        return (now or time.monotonic()) < self.open_until
+
+    def latency_percentile(self, pct):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+    def record_success(self, latency):
+        self.latencies.append(latency)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self, timeout=False):
+        self.failures += 1
+        self.timeouts += timeout
+        self.consecutive_failures += 1
+        # After reset_timeout the next request is let through as a probe (half-open)
+        if self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.reset_timeout
+
+    def stats(self):
+        p50 = self.latency_percentile(50)
+        return {
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "circuit": "open" if self.is_open() else "closed",
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+        }
+
+class _Call:
+    def __init__(self, backend):
+        self.backend = backend
+        self.sent = time.monotonic()
+        self.start = None
+        self.timed_out = False
+
+    def deadline(self, timeout):
+        """Timeout counts from when the backend call began; a call still queued for a worker is measured from when it was sent"""
+        return (self.start or self.sent) + timeout
+
+    def begin(self):
+        """Start the latency clock once the backend call actually runs, not while it waits for a worker"""
+        self.start = time.monotonic()
+
+def _has_override(llm, name):
+    return getattr(type(llm), name) is not getattr(BaseChatModel, name)
+
+class LLMRouter(BaseChatModel):
+    """Chat model that spreads requests over several backends
+
+    Each request goes to the healthy backend with the fewest requests in flight.
+    A backend that fails failure_threshold times in a row is skipped until
+    reset_timeout has passed. A request that errors or exceeds `timeout` is
+    retried on the next backend. With hedge_percentile set, a second backend is
+    asked as well once the first is slower than that percentile of its recent
+    latencies, and the first answer wins. Streaming calls fail over only before
+    the first chunk arrives and are never hedged.
+
+    Each backend runs its calls on its own `backend_workers` threads, so calls
+    stuck on one backend cannot delay the others. `timeout` counts from when a
+    call starts on a thread. A call that is still waiting for a thread after
+    `timeout` is dropped and the next backend is tried. This does not count
+    as a failure of the backend.
+    """
+
+    model: str = "router"
+    timeout: float = 60.0
+    hedge_percentile: float = 0.0
+    hedge_min_samples: int = 20
+    backend_workers: int = 4
+
+    _backends = PrivateAttr(default_factory=list)
+    _lock = PrivateAttr(default_factory=threading.Lock)
+    _pools = PrivateAttr(default_factory=dict)
+    _counters = PrivateAttr(default_factory=dict)
+
+    def __init__(self, backends, **kwargs):
+        super().__init__(**kwargs)
+        self._backends = list(backends)
+        # One bounded pool per backend: threads stuck on a hung backend cannot starve the others
+        self._pools = {
+            backend: ThreadPoolExecutor(max_workers=self.backend_workers, thread_name_prefix=f"llm-router-{i}")
+            for i, backend in enumerate(self._backends)
+        }
+        self._counters = {"requests": 0, "failovers": 0, "hedges": 0, "hedge_wins": 0, "queue_timeouts": 0}
+
+    @property
+    def _llm_type(self):
+        return "llm-router"
+
+    @property
+    def backends(self):
+        return self._backends
+
+    def _pick(self, exclude):
+        """Least outstanding requests among backends not yet tried whose circuit is closed"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [backend for backend in self._backends if backend not in exclude]
+            healthy = [backend for backend in candidates if not backend.is_open(now)]
+            if not healthy:
+                return None
+            backend = min(healthy, key=lambda b: b.outstanding)
+            backend.outstanding += 1
+            backend.requests += 1
+            return _Call(backend)
+
+    def _end(self, call, error=None, cancelled=False):
+        with self._lock:
+            call.backend.outstanding -= 1
+            if call.timed_out or cancelled:
+                return
+            if error is not None:
+                call.backend.record_failure()
+            else:
+                call.backend.record_success(time.monotonic() - call.start)
+
+    def _time_out(self, call):
+        with self._lock:
+            call.timed_out = True
+            call.backend.record_failure(timeout=True)
+
+    def _hedge_delay(self, backend):
+        if not self.hedge_percentile or len(backend.latencies) < self.hedge_min_samples:
+            return None
+        return backend.latency_percentile(self.hedge_percentile)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _unavailable(self, errors):
+        detail = "; ".join(errors) if errors else "every circuit is open"
+        return BackendUnavailable(f"No LLM backend could answer: {detail}")
+
+    def _submit(self, call, messages, stop, kwargs):
+        def run():
+            call.begin()
+            return call.backend.llm._generate(messages, stop=stop, **kwargs)
+
+        future = self._pools[call.backend].submit(run)
+        future.add_done_callback(lambda f: self._end(call, None if f.cancelled() else f.exception(), f.cancelled()))
+        return future
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self._count("requests")
+        tried, errors = [], []
+        while True:
+            call = self._pick(tried)
+            if call is None:
+                raise self._unavailable(errors)
+            if tried:
+                self._count("failovers")
+            tried.append(call.backend)
+
+            pending = {self._submit(call, messages, stop, kwargs): call}
+            hedge_at = self._hedge_delay(call.backend)
+            while pending:
+                now = time.monotonic()
+                wait_for = min(pending_call.deadline(self.timeout) for pending_call in pending.values()) - now
+                if hedge_at is not None:
+                    wait_for = min(wait_for, call.sent + hedge_at - now)
+                done, _ = wait(list(pending), timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    finished = pending.pop(future)
+                    if future.exception() is None:
+                        if finished is not call:
+                            self._count("hedge_wins")
+                        return future.result()
+                    errors.append(f"{finished.backend.name}: {future.exception()}")
+
+                now = time.monotonic()
+                if hedge_at is not None and now - call.sent >= hedge_at and pending:
+                    hedge_at = None
+                    hedge = self._pick(tried)
+                    if hedge is not None:
+                        self._count("hedges")
+                        tried.append(hedge.backend)
+                        pending[self._submit(hedge, messages, stop, kwargs)] = hedge
+                for future, late in list(pending.items()):
+                    if now < late.deadline(self.timeout):
+                        continue
+                    if late.start is None:
+                        # Never got a worker: the backend's own pool is full of stalled calls, not a new failure
+                        if not future.cancel():
+                            continue
+                        self._count("queue_timeouts")
+                        errors.append(f"{late.backend.name}: no free worker after {self.timeout}s")
+                    else:
+                        self._time_out(late)
+                        errors.append(f"{late.backend.name}: timed out after {self.timeout}s")
+                    del pending[future]
+
+    async def _acall(self, call, messages, stop, kwargs):
+        call.begin()
+        return await call.backend.llm._agenerate(messages, stop=stop, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self._count("requests")
+        tried, errors = [], []
+        while True:
+            call = self._pick(tried)
+            if call is None:
+                raise self._unavailable(errors)
+            if tried:
+                self._count("failovers")
+            tried.append(call.backend)
+
+            pending = {asyncio.ensure_future(self._acall(call, messages, stop, kwargs)): call}
+            hedge_at = self._hedge_delay(call.backend)
+            try:
+                while pending:
+                    now = time.monotonic()
+                    wait_for = min(pending_call.deadline(self.timeout) for pending_call in pending.values()) - now
+                    if hedge_at is not None:
+                        wait_for = min(wait_for, call.sent + hedge_at - now)
+                    done, _ = await asyncio.wait(list(pending), timeout=max(0.0, wait_for), return_when=asyncio.FIRST_COMPLETED)
+
+                    for task in done:
+                        finished = pending.pop(task)
+                        error = task.exception()
+                        self._end(finished, error)
+                        if error is None:
+                            if finished is not call:
+                                self._count("hedge_wins")
+                            return task.result()
+                        errors.append(f"{finished.backend.name}: {error}")
+
+                    now = time.monotonic()
+                    if hedge_at is not None and now - call.sent >= hedge_at and pending:
+                        hedge_at = None
+                        hedge = self._pick(tried)
+                        if hedge is not None:
+                            self._count("hedges")
+                            tried.append(hedge.backend)
+                            task = asyncio.ensure_future(self._acall(hedge, messages, stop, kwargs))
+                            pending[task] = hedge
+                    for task, late in list(pending.items()):
+                        if now >= late.deadline(self.timeout):
+                            self._time_out(late)
+                            errors.append(f"{late.backend.name}: timed out after {self.timeout}s")
+                            del pending[task]
+                            task.cancel()
+                            self._end(late, cancelled=True)
+            finally:
+                # Losers and timed-out calls are cancelled, their slots freed
+                for task, unfinished in pending.items():
+                    task.cancel()
+                    self._end(unfinished, cancelled=True)
+
+    def _backend_stream(self, call, messages, stop, kwargs):
+        call.begin()
+        llm = call.backend.llm
+        if _has_override(llm, "_stream"):
+            yield from llm._stream(messages, stop=stop, **kwargs)
+            return
+        result = llm._generate(messages, stop=stop, **kwargs)
+        yield ChatGenerationChunk(message=AIMessageChunk(content=result.generations[0].message.content))
+
+    async def _abackend_stream(self, call, messages, stop, kwargs):
+        call.begin()
+        llm = call.backend.llm
+        if _has_override(llm, "_astream") or _has_override(llm, "_stream"):
+            async for chunk in llm._astream(messages, stop=stop, **kwargs):
+                yield chunk
+            return
+        result = await llm._agenerate(messages, stop=stop, **kwargs)
+        yield ChatGenerationChunk(message=AIMessageChunk(content=result.generations[0].message.content))
+
+    def _first_chunk(self, call, future):
+        """First chunk of a streaming call, waiting until its deadline; one that starts while queued gets its full timeout"""
+        while True:
+            try:
+                return future.result(timeout=max(0.0, call.deadline(self.timeout) - time.monotonic()))
+            except FutureTimeout:
+                if time.monotonic() >= call.deadline(self.timeout):
+                    raise
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self._count("requests")
+        tried, errors = [], []
+        while True:
+            call = self._pick(tried)
+            if call is None:
+                raise self._unavailable(errors)
+            if tried:
+                self._count("failovers")
+            tried.append(call.backend)
+
+            chunks = self._backend_stream(call, messages, stop, kwargs)
+            # The first chunk is fetched on the pool so a stalled backend can be abandoned
+            first = self._pools[call.backend].submit(next, chunks, None)
+            try:
+                chunk = self._first_chunk(call, first)
+            except FutureTimeout:
+                if call.start is None and first.cancel():
+                    self._end(call, cancelled=True)
+                    self._count("queue_timeouts")
+                    errors.append(f"{call.backend.name}: no free worker after {self.timeout}s")
+                    continue
+                self._time_out(call)
+                first.add_done_callback(lambda f, call=call: self._end(call, cancelled=True))
+                errors.append(f"{call.backend.name}: timed out after {self.timeout}s")
+                continue
+            except Exception as e:
+                self._end(call, e)
+                errors.append(f"{call.backend.name}: {e}")
+                continue
+            break
+
+        try:
+            if chunk is not None:
+                yield chunk
+                yield from chunks
+        except BaseException as e:
+            self._end(call, e)
+            raise
+        self._end(call)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        self._count("requests")
+        tried, errors = [], []
+        while True:
+            call = self._pick(tried)
+            if call is None:
+                raise self._unavailable(errors)
+            if tried:
+                self._count("failovers")
+            tried.append(call.backend)
+
+            chunks = self._abackend_stream(call, messages, stop, kwargs)
+            try:
+                chunk = await asyncio.wait_for(anext(chunks, None), self.timeout)
+            except asyncio.TimeoutError:
+                self._time_out(call)
+                self._end(call, cancelled=True)
+                errors.append(f"{call.backend.name}: timed out after {self.timeout}s")
+                continue
+            except Exception as e:
+                self._end(call, e)
+                errors.append(f"{call.backend.name}: {e}")
+                continue
+            break
+
+        try:
+            if chunk is not None:
+                yield chunk
+                async for chunk in chunks:
+                    yield chunk
+        except BaseException as e:
+            self._end(call, e)
+            raise
+        self._end(call)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counters,
+                "backends": {backend.name: backend.stats() for backend in self._backends},
+            }
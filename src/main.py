@@ -8,10 +8,22 @@ def main():
     print("=" * 30)
     
     try:
-        from chain import graph_builder, llm_type
+        from app_context import get_context
+        from chain import answer_token, graph_builder
         
-        print(f"Using LLM: {llm_type.upper()}")
-        print("Type 'exit' to quit")
+        ctx = get_context()
+        try:
+            ctx.warm()
+        except Exception as e:
+            print(f"CRITICAL ERROR: {e}")
+            print("Troubleshooting steps:")
+            print("1. Check if PostgreSQL service is running")
+            print("2. Run: python scripts/clean_database.py")
+            print("3. Start Ollama or add a valid OpenAI API key")
+            return
+        
+        print(f"Using LLM: {ctx.llm_type.upper()}")
+        print("Type 'stats' for cache and pool statistics, 'exit' to quit")
         
         while True:
             try:
@@ -23,15 +35,41 @@ def main():
                     print("Please enter a question.")
                     continue
                 
+                if question.strip().lower() == 'stats':
+                    for label, cache in [("Query cache", ctx.query_cache), ("Semantic cache", ctx.semantic_cache), ("Result cache", ctx.result_cache)]:
+                        if cache is None:
+                            print(f"{label}: disabled")
+                            continue
+                        print(f"{label}:")
+                        for name, value in cache.stats().items():
+                            print(f"  {name}: {value}")
+                    for pool_name, stats in ctx.pool_stats().items():
+                        print(f"Connection pool ({pool_name}):")
+                        for name, value in stats.items():
+                            print(f"  {name}: {value}")
+                    for stage, stats in ctx.coalescing_stats().items():
+                        print(f"Coalescing ({stage}): {stats['coalesced']} of {stats['calls']} calls shared")
+                    continue
+                
                 print("Processing...")
                 
                 final_answer = None
-                for step in graph_builder.stream({"question": question}, stream_mode="updates"):
-                    for node_name, node_output in step.items():
-                        if node_name == "generate_answer" and "answer" in node_output:
-                            final_answer = node_output["answer"]
+                streamed = False
+                for mode, chunk in graph_builder.stream({"question": question}, stream_mode=["updates", "messages"]):
+                    token = answer_token(mode, chunk)
+                    if token:
+                        if not streamed:
+                            print("\nAnswer: ", end="", flush=True)
+                            streamed = True
+                        print(token, end="", flush=True)
+                    elif mode == "updates":
+                        for node_name, node_output in chunk.items():
+                            if node_name in ("generate_answer", "format_answer") and node_output and "answer" in node_output:
+                                final_answer = node_output["answer"]
                 
-                if final_answer:
+                if streamed:
+                    print()
+                elif final_answer:
                     print(f"\nAnswer: {final_answer}")
                 else:
                     print("Could not generate an answer.")
@@ -0,0 +1,100 @@
+import threading
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            # One slot per bucket plus a last one for values above every bound
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            slot = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            counts[slot] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        counts, _ = self._values.get(tuple(labels.get(name, "") for name in self.labelnames), ([], 0.0))
+        return sum(counts)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class Registry:
+    """Counters and histograms rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+REQUESTS = registry.counter("sqlqa_requests_total", "Graph runs by outcome and answer path", ("status", "answer_path"))
+REQUEST_SECONDS = registry.histogram("sqlqa_request_seconds", "End-to-end graph run time")
+STAGE_SECONDS = registry.histogram("sqlqa_stage_seconds", "Wall time per graph node", ("stage",))
+LLM_SECONDS = registry.histogram("sqlqa_llm_seconds", "LLM call time per graph node", ("stage",))
+LLM_TOKENS = registry.counter("sqlqa_llm_tokens_total", "LLM tokens per graph node (reported by the model, else estimated)", ("stage", "kind"))
+DB_SECONDS = registry.histogram("sqlqa_db_seconds", "Query execution time, result cache hits excluded")
+DB_ROWS = registry.counter("sqlqa_db_rows_total", "Rows returned by executed queries")
+CACHE_REQUESTS = registry.counter("sqlqa_cache_requests_total", "Cache lookups by cache and outcome", ("cache", "result"))
+SQL_REPAIRS = registry.counter("sqlqa_sql_repairs_total", "SQL repair attempts, by whether the request then got an answer", ("outcome",))
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    text = re.sub(r"\s+", " ", question.strip().lower())
+    return text.rstrip(" ?!.;")
+
+class QueryCache:
+    """LRU/TTL cache of generated SQL keyed on question, model and schema fingerprint"""
+
+    def __init__(self, max_entries=None, ttl=None, path=None):
+        self.max_entries = max_entries or int(os.getenv("QUERY_CACHE_SIZE", "1000"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("QUERY_CACHE_TTL", "86400"))
+        self.path = path if path is not None else os.getenv("QUERY_CACHE_PATH", "")
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.path:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS query_cache (
+                    key TEXT PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(question, model_id, fingerprint):
+        raw = "\x1f".join([normalize_question(question), model_id or "", fingerprint or ""])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at, now):
+        return self.ttl > 0 and now - created_at > self.ttl
+
+    def _evict_overflow(self):
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+
+    def _load(self, key, now):
+        if self._conn is None:
+            return None
+        row = self._conn.execute(
+            "SELECT query, created_at FROM query_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self._expired(row[1], now):
+            self._conn.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        return row
+
+    def get(self, question, model_id, fingerprint):
+        """Cached SQL for the question, or None on a miss"""
+        key = self.make_key(question, model_id, fingerprint)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[1], now):
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+
+            if entry is None:
+                entry = self._load(key, now)
+                if entry is not None:
+                    self._entries[key] = entry
+                    self._evict_overflow()
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if self._conn is not None:
+                self._conn.execute("UPDATE query_cache SET last_used = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            return entry[0]
+
+    def put(self, question, model_id, fingerprint, query):
+        key = self.make_key(question, model_id, fingerprint)
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (query, now)
+            self._entries.move_to_end(key)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO query_cache (key, question, query, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, normalize_question(question), query, now, now),
+                )
+            self._evict_overflow()
+            if self._conn is not None:
+                # Entries persisted by earlier runs are not in memory yet
+                cursor = self._conn.execute(
+                    "DELETE FROM query_cache WHERE key NOT IN "
+                    "(SELECT key FROM query_cache ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+                self.evictions += max(cursor.rowcount, 0)
+                self._conn.commit()
+
+    def invalidate(self):
+        """Remove every entry from memory and the persistent store"""
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM query_cache")
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,95 @@
+import json
+import os
+import sqlalchemy
+import sqlglot
+from sqlglot import exp
+
+SQLGLOT_DIALECTS = {
+    "postgresql": "postgres",
+    "sqlite": "sqlite",
+}
+
+# Anything that writes, locks or changes the session is never run
+FORBIDDEN_NODES = (
+    exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop, exp.Alter,
+    exp.TruncateTable, exp.Command, exp.Into, exp.Lock, exp.Set, exp.Transaction,
+)
+
+FORBIDDEN_FUNCTIONS = {
+    "pg_sleep", "pg_terminate_backend", "pg_cancel_backend", "pg_reload_conf",
+    "pg_read_file", "pg_read_binary_file", "pg_ls_dir", "lo_import", "lo_export",
+    "dblink", "dblink_exec", "set_config", "nextval", "setval", "lo_unlink",
+}
+
+# Advisory locks are allowed even in a read-only transaction, so they are denied by name
+FORBIDDEN_FUNCTION_PREFIXES = ("pg_advisory", "pg_try_advisory")
+
+class QueryRejected(Exception):
+    """The generated SQL is not safe or cheap enough to run"""
+
+def sql_dialect(engine):
+    return SQLGLOT_DIALECTS.get(engine.dialect.name, engine.dialect.name)
+
+def _max_limit():
+    return int(os.getenv("QUERY_MAX_LIMIT", "1000"))
+
+def rewrite_query(query, dialect="postgres", max_limit=None):
+    """Parse, allow a single read-only SELECT, and inject or clamp its LIMIT"""
+    max_limit = max_limit or _max_limit()
+    try:
+        statements = [s for s in sqlglot.parse(query, read=dialect) if s is not None]
+    except sqlglot.errors.SqlglotError as e:
+        errors = getattr(e, "errors", None)
+        description = errors[0]["description"] if errors else str(e)
+        raise QueryRejected(f"could not parse SQL ({description})") from e
+
+    if len(statements) != 1:
+        raise QueryRejected("exactly one statement is allowed")
+    tree = statements[0]
+    if not isinstance(tree, exp.Query):
+        raise QueryRejected(f"only SELECT statements are allowed, got {tree.key.upper()}")
+    forbidden = next(tree.find_all(*FORBIDDEN_NODES), None)
+    if forbidden is not None:
+        raise QueryRejected(f"{forbidden.key.upper()} is not allowed in a read-only query")
+    for func in tree.find_all(exp.Func):
+        name = (func.name if isinstance(func, exp.Anonymous) else func.sql_name()).lower()
+        if name in FORBIDDEN_FUNCTIONS or name.startswith(FORBIDDEN_FUNCTION_PREFIXES):
+            raise QueryRejected(f"function {name} is not allowed")
+
+    limit = tree.args.get("limit")
+    value = limit.expression if limit is not None else None
+    if value is None:
+        tree = tree.limit(max_limit)
+    elif not (isinstance(value, exp.Literal) and value.is_int and int(value.this) <= max_limit):
+        tree = tree.limit(max_limit)
+
+    return tree.sql(dialect=dialect)
+
+def explain(engine, query):
+    """(total cost, estimated rows) of the top plan node; (None, None) where EXPLAIN has no costs"""
+    if engine.dialect.name != "postgresql":
+        return None, None
+    with engine.connect() as conn:
+        plan = conn.execute(sqlalchemy.text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    top = plan[0]["Plan"]
+    return top["Total Cost"], top["Plan Rows"]
+
+def guard_query(engine, query, max_cost=None, max_rows=None, max_limit=None):
+    """Rewritten SQL plus its plan estimates, or QueryRejected"""
+    max_cost = max_cost or float(os.getenv("QUERY_MAX_COST", "1000000"))
+    max_rows = max_rows or float(os.getenv("QUERY_MAX_PLAN_ROWS", "1000000"))
+
+    rewritten = rewrite_query(query, sql_dialect(engine), max_limit)
+    try:
+        cost, rows = explain(engine, rewritten)
+    except sqlalchemy.exc.SQLAlchemyError as e:
+        raise QueryRejected(f"EXPLAIN failed: {getattr(e, 'orig', None) or e}") from e
+
+    if cost is not None and cost > max_cost:
+        raise QueryRejected(f"estimated cost {cost:.0f} exceeds the limit of {max_cost:.0f}")
+    if rows is not None and rows > max_rows:
+        raise QueryRejected(f"estimated {rows:.0f} rows exceeds the limit of {max_rows:.0f}")
+
+    return {"query": rewritten, "cost": cost, "rows": rows}
@@ -0,0 +1,192 @@
+import os
+import re
+import select
+import threading
+import time
+from collections import OrderedDict
+import sqlglot
+from sqlglot import exp
+from result_format import format_value
+
+NOTIFY_CHANNEL = "table_changes"
+
+def normalize_sql(query, dialect="postgres"):
+    """Canonical SQL text, so formatting and keyword case do not split cache entries"""
+    try:
+        return sqlglot.transpile(query, read=dialect, write=dialect, normalize=True)[0]
+    except sqlglot.errors.SqlglotError:
+        return " ".join(query.split())
+
+def tables_read(query, dialect="postgres"):
+    """Lowercase names of the tables a statement reads, CTE names excluded"""
+    try:
+        tree = sqlglot.parse_one(query, read=dialect)
+    except sqlglot.errors.SqlglotError:
+        return None
+    ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    return {table.name.lower() for table in tree.find_all(exp.Table) if table.name.lower() not in ctes}
+
+def result_size(result):
+    """Rough in-memory size of a result in bytes"""
+    size = 200 + sum(len(column) + 50 for column in result["columns"])
+    for row in result["rows"]:
+        size += 56 + sum(len(format_value(value)) + 40 for value in row)
+    return size
+
+class ResultCache:
+    """Query results by normalized SQL, bounded by bytes with LRU eviction
+
+    Each entry remembers the tables its statement reads so a write to one table
+    drops only the results that depend on it.
+    """
+
+    def __init__(self, max_bytes=None, ttl=None):
+        self.max_bytes = max_bytes or int(os.getenv("RESULT_CACHE_BYTES", str(64 * 1024 * 1024)))
+        self.ttl = ttl if ttl is not None else float(os.getenv("RESULT_CACHE_TTL", "300"))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, query, dialect="postgres"):
+        key = normalize_sql(query, dialect)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.time() - entry["created_at"] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["result"]
+
+    def put(self, query, result, dialect="postgres"):
+        tables = tables_read(query, dialect)
+        size = result_size(result)
+        if tables is None or size > self.max_bytes:
+            return
+        key = normalize_sql(query, dialect)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {"result": result, "tables": tables, "size": size, "created_at": time.time()}
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry["size"]
+        for table in entry["tables"]:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def invalidate(self, table=None):
+        """Drop the results that read `table`, or everything; returns how many were dropped"""
+        with self._lock:
+            if table is None:
+                keys = list(self._entries)
+            else:
+                keys = list(self._by_table.get(table.lower(), ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+def notify_trigger_sql(tables, channel=NOTIFY_CHANNEL):
+    """Statement-level triggers that NOTIFY `channel` with the table name on every write"""
+    if not re.fullmatch(r"\w+", channel):
+        raise ValueError(f"Invalid channel name: {channel}")
+    statements = [f"""
+        CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{channel}', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql"""]
+    for table in tables:
+        statements.append(f'DROP TRIGGER IF EXISTS {table}_notify_change ON "{table}"')
+        statements.append(
+            f'CREATE TRIGGER {table}_notify_change AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "{table}" '
+            "FOR EACH STATEMENT EXECUTE PROCEDURE notify_table_change()"
+        )
+    return statements
+
+class TableChangeListener:
+    """Background LISTEN on a PostgreSQL channel that invalidates the cache per changed table"""
+
+    def __init__(self, engine, cache, channel=None, poll_interval=1.0):
+        self.engine = engine
+        self.cache = cache
+        self.channel = channel or os.getenv("RESULT_CACHE_CHANNEL", NOTIFY_CHANNEL)
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="result-cache-listener", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=self.poll_interval * 2)
+
+    def _connect(self):
+        # A dedicated connection, not one held out of the shared pool
+        cargs, cparams = self.engine.dialect.create_connect_args(self.engine.url)
+        conn = self.engine.dialect.dbapi.connect(*cargs, **cparams)
+        conn.autocommit = True
+        conn.cursor().execute(f"LISTEN {self.channel}")
+        return conn
+
+    def _run(self):
+        backoff = self.poll_interval
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                # Changes made while we were not listening are unknown
+                self.cache.invalidate()
+                backoff = self.poll_interval
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.cache.invalidate(notify.payload or None)
+            except Exception as e:
+                print(f"Result cache listener error: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
@@ -0,0 +1,109 @@
+import datetime
+import decimal
+import os
+from text_index import estimate_tokens
+
+def format_value(value):
+    """Human-readable scalar without Decimal(...)/datetime(...) reprs"""
+    if value is None:
+        return "none"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, decimal.Decimal):
+        return format(value.normalize(), "f")
+    if isinstance(value, float):
+        return f"{value:.4f}".rstrip("0").rstrip(".")
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat() if value.time() == datetime.time() else value.isoformat(sep=" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+def _cell(value, style):
+    text = format_value(value).replace("\t", " ").replace("\n", " ")
+    return text.replace("|", "\\|") if style == "markdown" else text
+
+def _line(values, style):
+    if style == "markdown":
+        return "| " + " | ".join(values) + " |"
+    return "\t".join(values)
+
+def render_rows(columns, rows, style="tsv"):
+    """Header plus one line per row, as TSV or a markdown table"""
+    lines = [_line([_cell(column, style) for column in columns], style)]
+    if style == "markdown":
+        lines.append(_line(["---"] * len(columns), style))
+    lines.extend(_line([_cell(value, style) for value in row], style) for row in rows)
+    return lines
+
+def format_result(columns, rows, truncated=False, style="tsv"):
+    """Every row with column names, with a note when rows were cut off"""
+    if not columns:
+        return ""
+    lines = render_rows(columns, rows, style)
+    if not rows:
+        lines.append("(no rows)")
+    if truncated:
+        lines.append(f"(truncated: only the first {len(rows)} rows are shown, the query returned more)")
+    return "\n".join(lines)
+
+def _is_number(value):
+    return isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool)
+
+def describe_column(name, values):
+    """One summary line: non-null count, distinct values and the min/max where comparable"""
+    present = [value for value in values if value is not None]
+    line = f"- {name}: {len(present)} values, {len(set(map(format_value, present)))} distinct"
+    if present and (all(_is_number(value) for value in present) or len({type(value) for value in present}) == 1):
+        try:
+            line += f", min {format_value(min(present))}, max {format_value(max(present))}"
+        except TypeError:
+            pass
+    return line
+
+def summarize_result(columns, rows, truncated=False, budget=None, style="tsv"):
+    """Counts, per-column min/max and a head/tail sample that fit the token budget"""
+    budget = budget or int(os.getenv("RESULT_TOKEN_BUDGET", "800"))
+    count = f"{len(rows)}+" if truncated else str(len(rows))
+    lines = [f"{count} rows, {len(columns)} columns (summary; not every row is shown)"]
+    lines.extend(describe_column(column, [row[i] for row in rows]) for i, column in enumerate(columns))
+
+    header = render_rows(columns, [], style)
+    row_lines = render_rows(columns, rows, style)[len(header):]
+    spent = estimate_tokens("\n".join(lines + header)) + 16
+
+    # Take rows alternately from the front and the back until the budget runs out
+    head, tail = [], []
+    front, back = 0, len(row_lines) - 1
+    while front <= back:
+        take_front = len(head) <= len(tail)
+        line = row_lines[front] if take_front else row_lines[back]
+        cost = estimate_tokens(line) + 1
+        if spent + cost > budget:
+            break
+        spent += cost
+        if take_front:
+            head.append(line)
+            front += 1
+        else:
+            tail.insert(0, line)
+            back -= 1
+
+    lines.append(f"Sample ({len(head)} first and {len(tail)} last rows):")
+    lines.extend(header + head)
+    if front <= back:
+        lines.append(f"... {back - front + 1} rows omitted ...")
+    lines.extend(tail)
+    return "\n".join(lines)
+
+def render_for_prompt(columns, rows, truncated=False, budget=None, style=None):
+    """Result text for the answer prompt plus token counts: the full table if it fits, else a summary"""
+    budget = budget or int(os.getenv("RESULT_TOKEN_BUDGET", "800"))
+    style = style or os.getenv("RESULT_FORMAT", "tsv")
+
+    text = format_result(columns, rows, truncated, style)
+    full_tokens = estimate_tokens(text)
+    if full_tokens > budget:
+        text = summarize_result(columns, rows, truncated, budget, style)
+    tokens = estimate_tokens(text)
+    return {"text": text, "tokens": tokens, "full_tokens": full_tokens, "tokens_saved": max(0, full_tokens - tokens)}
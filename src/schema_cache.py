@@ -0,0 +1,143 @@
+import hashlib
+import os
+import threading
+import time
+import sqlalchemy
+from langchain_community.utilities import SQLDatabase
+
+FINGERPRINT_QUERY = """
+    SELECT table_name, column_name, data_type, is_nullable, ordinal_position
+    FROM information_schema.columns
+    WHERE table_schema = :schema
+    ORDER BY table_name, ordinal_position
+"""
+
+SQLITE_FINGERPRINT_QUERY = """
+    SELECT type, name, sql FROM sqlite_master
+    WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'
+    ORDER BY name
+"""
+
+class SchemaCache:
+    """Table DDL and sample rows, built once and reused until the schema changes
+
+    `annotations()` returns (notes, hidden) and is called on every load: a note
+    is a comment above a table's DDL in the prompt, hidden tables are ones the
+    model never sees.
+    """
+
+    def __init__(self, db, ttl=None, check_interval=None, annotations=None):
+        self.db = db
+        self.annotations = annotations
+        self._annotated = ({}, set())
+        self.ttl = ttl if ttl is not None else float(os.getenv("SCHEMA_CACHE_TTL", "3600"))
+        self.check_interval = check_interval if check_interval is not None else float(
+            os.getenv("SCHEMA_CHECK_INTERVAL", "60")
+        )
+        self._lock = threading.RLock()
+        self._tables = None
+        self._fingerprint = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._needs_reflect = False
+
+    @property
+    def schema(self):
+        return self.db._schema or "public"
+
+    def fingerprint(self):
+        """Hash of the column layout reported by information_schema.columns (sqlite_master on SQLite)"""
+        with self.db._engine.connect() as conn:
+            if self.db._engine.dialect.name == "sqlite":
+                rows = conn.execute(sqlalchemy.text(SQLITE_FINGERPRINT_QUERY)).fetchall()
+            else:
+                rows = conn.execute(sqlalchemy.text(FINGERPRINT_QUERY), {"schema": self.schema}).fetchall()
+        digest = hashlib.sha256()
+        for row in rows:
+            digest.update("|".join(str(value) for value in row).encode("utf-8"))
+            digest.update(b"\n")
+        return digest.hexdigest()
+
+    def _reflect(self):
+        """Reflect a fresh SQLDatabase so new or altered tables are picked up"""
+        return SQLDatabase(
+            engine=self.db._engine,
+            schema=self.db._schema,
+            sample_rows_in_table_info=self.db._sample_rows_in_table_info,
+        )
+
+    def _load(self, fingerprint, reflect):
+        source = self._reflect() if reflect else self.db
+        notes, hidden = self.annotations() if self.annotations is not None else ({}, set())
+        self._annotated = (notes, hidden)
+        tables = {}
+        for table in sorted(source.get_usable_table_names()):
+            if table in hidden:
+                continue
+            info = source.get_table_info([table])
+            if table in notes:
+                info = f"\n/* {notes[table]} */{info}"
+            tables[table] = info
+
+        now = time.monotonic()
+        self._tables = tables
+        self._fingerprint = fingerprint
+        self._loaded_at = now
+        self._checked_at = now
+        self._needs_reflect = False
+
+    def _ensure_fresh(self):
+        """Tables dict that is current under the lock; callers read only this snapshot
+
+        invalidate() may run on another thread (the summary refresher) and clear
+        self._tables right after the lock is released.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._tables is None:
+                self._load(self.fingerprint(), reflect=self._needs_reflect)
+            elif now - self._loaded_at >= self.ttl:
+                self._load(self.fingerprint(), reflect=True)
+            elif now - self._checked_at >= self.check_interval:
+                current = self.fingerprint()
+                if current != self._fingerprint:
+                    self._load(current, reflect=True)
+                else:
+                    self._checked_at = now
+            return self._tables
+
+    def warm(self):
+        """Build the catalog up front so the first question does not pay for it"""
+        self._ensure_fresh()
+        return self
+
+    def invalidate(self):
+        """Drop the cached catalog; the next lookup reflects the database again"""
+        with self._lock:
+            self._tables = None
+            self._needs_reflect = True
+
+    def refresh_annotations(self):
+        """Reload the catalog if the notes or hidden tables changed since it was built"""
+        if self.annotations is not None and self.annotations() != self._annotated:
+            self.invalidate()
+
+    def get_usable_table_names(self):
+        return list(self._ensure_fresh())
+
+    def get_table_info(self, table_names=None):
+        """Drop-in replacement for SQLDatabase.get_table_info served from the cache"""
+        tables = self._ensure_fresh()
+        if table_names is None:
+            names = list(tables)
+        else:
+            missing = set(table_names) - set(tables)
+            if missing:
+                raise ValueError(f"table_names {missing} not found in database")
+            names = [name for name in tables if name in set(table_names)]
+        return "\n\n".join(tables[name] for name in names)
+
+    @property
+    def current_fingerprint(self):
+        self._ensure_fresh()
+        return self._fingerprint
@@ -0,0 +1,222 @@
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+from text_index import NEGATIONS, question_tokens
+
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+def _numbers(text):
+    """Numbers in the order they appear, so a reversed range is a different question"""
+    return NUMBER_PATTERN.findall(text)
+
+def _negations(text):
+    return {token for token in question_tokens(text) if token in NEGATIONS}
+
+class SemanticCache:
+    """Reuses SQL from earlier questions whose embeddings are close to the new one
+
+    Vectors live in a fixed-size float32 matrix (capacity x dim), so memory is
+    bounded; when it is full the least recently used slot is overwritten. With
+    a path the matrix is a memory-mapped .npy file next to a JSON index; each
+    put appends one line to a journal that is replayed over the index on open
+    and folded back into it once it grows past the capacity.
+    """
+
+    def __init__(self, embedder, capacity=None, threshold=None, path=None, ann=None, n_bits=16, max_hamming=2):
+        self.embedder = embedder
+        self.capacity = capacity or int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))
+        # Similarities are only comparable within one embedder, so each brings its own calibrated default
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("SEMANTIC_CACHE_THRESHOLD") or embedder.default_threshold
+        )
+        self.path = path if path is not None else os.getenv("SEMANTIC_CACHE_PATH", "")
+        self.ann = ann if ann is not None else os.getenv("SEMANTIC_CACHE_ANN", "0") == "1"
+        self.max_hamming = max_hamming
+        self.dim = embedder.dim
+        self._lock = threading.Lock()
+        self._planes = np.random.default_rng(0).standard_normal((n_bits, self.dim)).astype(np.float32)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._open()
+
+    def _files(self):
+        return (
+            os.path.join(self.path, "vectors.npy"),
+            os.path.join(self.path, "index.json"),
+            os.path.join(self.path, "journal.jsonl"),
+        )
+
+    def _open(self):
+        self._entries = [None] * self.capacity
+        self._last_used = np.zeros(self.capacity, dtype=np.float64)
+        self._active = np.zeros(self.capacity, dtype=bool)
+        self._journal = None
+        self._journal_lines = 0
+
+        if not self.path:
+            self._vectors = np.zeros((self.capacity, self.dim), dtype=np.float32)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            vectors_file, index_file, journal_file = self._files()
+            index = None
+            if os.path.exists(vectors_file) and os.path.exists(index_file):
+                with open(index_file, encoding="utf-8") as f:
+                    index = json.load(f)
+                if index.get("embedder") != self.embedder.name or index.get("capacity") != self.capacity:
+                    index = None
+
+            if index is None:
+                self._vectors = np.lib.format.open_memmap(
+                    vectors_file, mode="w+", dtype=np.float32, shape=(self.capacity, self.dim)
+                )
+            else:
+                self._vectors = np.load(vectors_file, mmap_mode="r+")
+                for slot, entry in enumerate(index["entries"]):
+                    if entry is not None:
+                        self._entries[slot] = tuple(entry)
+                        self._active[slot] = True
+                self._last_used[:] = index["last_used"]
+                self._replay(journal_file)
+                self._journal = open(journal_file, "a", encoding="utf-8")
+            if index is None:
+                self._save()
+
+        self._signatures = (self._vectors @ self._planes.T) > 0
+
+    def _replay(self, journal_file):
+        if not os.path.exists(journal_file):
+            return
+        with open(journal_file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    change = json.loads(line)
+                except json.JSONDecodeError:
+                    # A put interrupted mid-write; its vector slot is simply unused
+                    continue
+                slot = change["slot"]
+                self._entries[slot] = tuple(change["entry"]) if change["entry"] is not None else None
+                self._active[slot] = change["entry"] is not None
+                self._last_used[slot] = change["last_used"]
+                self._journal_lines += 1
+
+    def _log(self, slot):
+        """Append the slot's new state to the journal; rewrite the index once the journal outgrows it"""
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps({"slot": slot, "entry": self._entries[slot], "last_used": self._last_used[slot]}) + "\n")
+        self._journal.flush()
+        self._journal_lines += 1
+        if self._journal_lines > self.capacity:
+            self._save()
+
+    def _save(self):
+        """Write the full index and start an empty journal"""
+        if not self.path:
+            return
+        _, index_file, journal_file = self._files()
+        self._vectors.flush()
+        tmp_file = index_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({
+                "embedder": self.embedder.name,
+                "capacity": self.capacity,
+                "entries": self._entries,
+                "last_used": self._last_used.tolist(),
+            }, f)
+        os.replace(tmp_file, index_file)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(journal_file, "w", encoding="utf-8")
+        self._journal_lines = 0
+
+    def _candidates(self, vector):
+        if not self.ann:
+            return np.flatnonzero(self._active)
+        signature = (self._planes @ vector) > 0
+        distance = (self._signatures != signature).sum(axis=1)
+        return np.flatnonzero(self._active & (distance <= self.max_hamming))
+
+    def _search(self, vector, model_id, fingerprint, question=None, k=5):
+        candidates = self._candidates(vector)
+        if candidates.size == 0:
+            return None, 0.0
+        similarities = self._vectors[candidates] @ vector
+        best = float(similarities.max())
+        for i in np.argsort(-similarities)[:k]:
+            similarity = float(similarities[i])
+            if similarity < self.threshold:
+                break
+            slot = int(candidates[i])
+            cached_question, _, cached_model, cached_fingerprint = self._entries[slot]
+            if cached_model != model_id or cached_fingerprint != fingerprint:
+                continue
+            # "top 5 albums" and "top 10 albums" embed almost identically
+            if question is not None and _numbers(cached_question) != _numbers(question):
+                continue
+            # A negated question must never reuse the SQL of the plain one
+            if question is not None and _negations(cached_question) != _negations(question):
+                continue
+            return slot, similarity
+        return None, best
+
+    def get(self, question, model_id, fingerprint):
+        """(query, similarity) of the closest cached question above the threshold, or (None, score)"""
+        vector = self.embedder.embed(question)
+        with self._lock:
+            slot, similarity = self._search(vector, model_id, fingerprint, question)
+            if slot is None:
+                self.misses += 1
+                return None, similarity
+            self.hits += 1
+            self._last_used[slot] = time.time()
+            return self._entries[slot][1], similarity
+
+    def put(self, question, model_id, fingerprint, query):
+        vector = self.embedder.embed(question)
+        with self._lock:
+            slot, similarity = self._search(vector, model_id, fingerprint, question, k=1)
+            if slot is None or similarity < 0.999:
+                free = np.flatnonzero(~self._active)
+                if free.size:
+                    slot = int(free[0])
+                else:
+                    slot = int(np.argmin(self._last_used))
+                    self.evictions += 1
+
+            self._vectors[slot] = vector
+            self._signatures[slot] = (self._planes @ vector) > 0
+            self._entries[slot] = (question, query, model_id, fingerprint)
+            self._active[slot] = True
+            self._last_used[slot] = time.time()
+            self._log(slot)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = [None] * self.capacity
+            self._active[:] = False
+            self._last_used[:] = 0
+            self._save()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(self._active.sum()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_bytes": int(self._vectors.nbytes),
+            }
+
+    def close(self):
+        """Fold the journal into the index and release the files"""
+        with self._lock:
+            self._save()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import Optional
+
+load_dotenv()
+
+from app_context import get_context
+from chain import aanswer, answer_token, astream
+from concurrency import Overloaded
+from instrumentation import configure_request_log
+from metrics import registry
+
+@asynccontextmanager
+async def lifespan(app):
+    # Runs in each worker process, after any fork
+    configure_request_log()
+    await asyncio.to_thread(get_context().warm)
+    yield
+    get_context().close()
+
+app = FastAPI(title="SQL Q&A System", lifespan=lifespan)
+
+RESPONSE_KEYS = (
+    "question", "query", "result", "answer", "answer_path", "result_tokens_saved", "error", "attempts",
+    "cache_hit", "result_cache_hit",
+)
+
+class Question(BaseModel):
+    question: str
+    # False skips the question, semantic and result caches (load tests of the full pipeline)
+    use_cache: bool = True
+
+class Invalidation(BaseModel):
+    table: Optional[str] = None
+
+@app.post("/ask")
+async def ask(body: Question):
+    if not body.question.strip():
+        raise HTTPException(status_code=400, detail="Please enter a question.")
+
+    try:
+        state = await aanswer(body.question, body.use_cache)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    return {key: state.get(key) for key in RESPONSE_KEYS}
+
+class EventStreamResponse(StreamingResponse):
+    """StreamingResponse that closes its generator as soon as sending stops, instead of leaving it to the GC"""
+
+    async def stream_response(self, send):
+        try:
+            await super().stream_response(send)
+        finally:
+            await self.body_iterator.aclose()
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_stream(body: Question):
+    """Server-sent events: one "token" event per answer chunk, then "done" with the final state"""
+    if not body.question.strip():
+        raise HTTPException(status_code=400, detail="Please enter a question.")
+
+    stream = astream(body.question, stream_mode=["updates", "messages"], use_cache=body.use_cache)
+    try:
+        # Admission happens on the first step, so overload still maps to a 503
+        first = await anext(stream)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    async def events():
+        state = {"question": body.question}
+        streamed = False
+        chunk = first
+        try:
+            while True:
+                mode, data = chunk
+                token = answer_token(mode, data)
+                if token:
+                    streamed = True
+                    yield sse("token", token)
+                elif mode == "updates":
+                    for node_output in data.values():
+                        state.update(node_output or {})
+                try:
+                    chunk = await anext(stream)
+                except StopAsyncIteration:
+                    break
+        finally:
+            # A disconnected client cancels or abandons this generator; free the limiter slot and the graph run now
+            await stream.aclose()
+
+        if not streamed and state.get("answer"):
+            yield sse("token", state["answer"])
+        yield sse("done", {key: state.get(key) for key in RESPONSE_KEYS})
+
+    return EventStreamResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/cache/invalidate")
+async def invalidate_results(body: Invalidation):
+    """Drop cached query results that read one table, or all of them"""
+    cache = get_context().result_cache
+    return {"invalidated": cache.invalidate(body.table) if cache is not None else 0}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of per-stage timings, token counts and cache hits"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health")
+async def health():
+    ctx = get_context()
+    return {
+        "status": "ok",
+        "llm": ctx.llm_type,
+        "llm_backends": ctx.llm.stats() if hasattr(ctx.llm, "stats") else None,
+        "concurrency": ctx.limiter.stats(),
+        "pool": ctx.pool_stats(),
+        "coalescing": ctx.coalescing_stats(),
+        "result_cache": ctx.result_cache.stats() if ctx.result_cache is not None else None,
+        "few_shot": ctx.example_store.stats() if ctx.example_store is not None else None,
+        "summary_refresh": ctx.summary_refresher.stats() if ctx.summary_refresher is not None else None,
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.getenv("HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8000")))
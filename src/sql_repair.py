@@ -0,0 +1,101 @@
+import os
+import re
+import time
+import sqlalchemy
+from query_guard import QueryRejected
+
+# SQLSTATE codes for mistakes in the query text itself, which a rewrite can fix
+SQLSTATE_KINDS = {
+    "42601": "syntax",
+    "42703": "undefined_column",
+    "42P01": "undefined_table",
+    "42883": "undefined_function",
+    "42702": "ambiguous_column",
+    "42725": "ambiguous_function",
+    "42803": "grouping",
+    "42804": "datatype_mismatch",
+    "42P18": "indeterminate_datatype",
+    "22P02": "invalid_value",
+    "22007": "invalid_value",
+    "22008": "invalid_value",
+    "22012": "division_by_zero",
+    "57014": "timeout",
+    "42501": "permission",
+}
+
+# Whole SQLSTATE classes that no rewrite of the query will fix
+SQLSTATE_CLASSES = {
+    "08": "connection",
+    "28": "permission",
+    "53": "resources",
+    "57": "unavailable",
+    "58": "unavailable",
+}
+
+# SQLite (and driver) messages without a SQLSTATE
+MESSAGE_KINDS = [
+    (re.compile(r"syntax error|could not parse SQL|incomplete input", re.I), "syntax"),
+    (re.compile(r"no such column|column .* does not exist|column not present", re.I), "undefined_column"),
+    (re.compile(r"no such table|relation .* does not exist", re.I), "undefined_table"),
+    (re.compile(r"no such function|function .* does not exist", re.I), "undefined_function"),
+    (re.compile(r"ambiguous column", re.I), "ambiguous_column"),
+    (re.compile(r"misuse of aggregate|must appear in the GROUP BY", re.I), "grouping"),
+    (re.compile(r"statement timeout|canceling statement", re.I), "timeout"),
+]
+
+REPAIRABLE_KINDS = {
+    "syntax", "undefined_column", "undefined_table", "undefined_function", "ambiguous_column",
+    "ambiguous_function", "grouping", "datatype_mismatch", "indeterminate_datatype", "invalid_value",
+    "division_by_zero",
+}
+
+def _driver_error(error):
+    """The DBAPI exception behind a SQLAlchemy error or a QueryRejected raised from one"""
+    while error is not None:
+        if isinstance(error, sqlalchemy.exc.DBAPIError):
+            return error.orig
+        error = error.__cause__
+    return None
+
+def _sqlstate(error):
+    orig = _driver_error(error)
+    return getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+
+def error_message(error):
+    """First line of the database's own message, without SQLAlchemy's wrapping"""
+    orig = _driver_error(error)
+    message = str(orig if orig is not None and not isinstance(error, QueryRejected) else error).strip()
+    return message.splitlines()[0] if message else type(error).__name__
+
+def classify_error(error):
+    """Kind of a parse, guard or execution error, e.g. "undefined_column" or "connection" """
+    code = _sqlstate(error)
+    if code:
+        if code in SQLSTATE_KINDS:
+            return SQLSTATE_KINDS[code]
+        if code[:2] in SQLSTATE_CLASSES:
+            return SQLSTATE_CLASSES[code[:2]]
+
+    message = str(_driver_error(error) or error)
+    for pattern, kind in MESSAGE_KINDS:
+        if pattern.search(message):
+            return kind
+    if isinstance(error, QueryRejected):
+        return "rejected"
+    if getattr(error, "connection_invalidated", False) or isinstance(
+        error, (sqlalchemy.exc.InterfaceError, sqlalchemy.exc.TimeoutError)
+    ):
+        return "connection"
+    return "unknown"
+
+def is_repairable(kind):
+    return kind in REPAIRABLE_KINDS
+
+def can_repair(state):
+    """Repair only fixable errors, and only while attempts and time budget remain"""
+    if not is_repairable(state.get("error_kind", "")):
+        return False
+    if state.get("attempts", 0) >= int(os.getenv("SQL_REPAIR_ATTEMPTS", "2")):
+        return False
+    started = state.get("started")
+    return started is None or time.monotonic() - started < float(os.getenv("SQL_REPAIR_BUDGET", "30"))
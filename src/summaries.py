@@ -0,0 +1,262 @@
+import argparse
+import os
+import threading
+import time
+import sqlalchemy
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REFRESH_TABLE = "summary_refresh"
+
+# Each summary is an aggregate over one fact table (the driver). Rows appended to
+# the driver since the last refresh are folded in by adding their partial
+# aggregates, so only additive columns (COUNT, SUM) are allowed.
+SUMMARIES = {
+    "summary_sales_by_country": {
+        "description": "Invoice count and total sales per billing country, precomputed from invoice",
+        "query": """
+            SELECT i.billing_country AS country, COUNT(*) AS invoice_count, SUM(i.total) AS total_sales
+            FROM invoice i
+            {where}
+            GROUP BY i.billing_country""",
+        "columns": [("country", "VARCHAR(40)"), ("invoice_count", "BIGINT"), ("total_sales", "NUMERIC(14,2)")],
+        "key": ["country"],
+        "additive": ["invoice_count", "total_sales"],
+        "driver": ("invoice", "i", "invoice_id"),
+    },
+    "summary_artist_tracks": {
+        "description": "Number of tracks per artist, precomputed from track, album and artist",
+        "query": """
+            SELECT ar.artist_id, ar.name AS artist_name, COUNT(*) AS track_count
+            FROM track t
+            JOIN album al ON al.album_id = t.album_id
+            JOIN artist ar ON ar.artist_id = al.artist_id
+            {where}
+            GROUP BY ar.artist_id, ar.name""",
+        "columns": [("artist_id", "INT"), ("artist_name", "VARCHAR(120)"), ("track_count", "BIGINT")],
+        "key": ["artist_id"],
+        "additive": ["track_count"],
+        "driver": ("track", "t", "track_id"),
+    },
+    "summary_genre_revenue": {
+        "description": "Revenue and units sold per genre, precomputed from invoice_line, track and genre",
+        "query": """
+            SELECT g.genre_id, g.name AS genre_name, SUM(il.unit_price * il.quantity) AS revenue,
+                SUM(il.quantity) AS units_sold
+            FROM invoice_line il
+            JOIN track t ON t.track_id = il.track_id
+            JOIN genre g ON g.genre_id = t.genre_id
+            {where}
+            GROUP BY g.genre_id, g.name""",
+        "columns": [("genre_id", "INT"), ("genre_name", "VARCHAR(120)"), ("revenue", "NUMERIC(14,2)"), ("units_sold", "BIGINT")],
+        "key": ["genre_id"],
+        "additive": ["revenue", "units_sold"],
+        "driver": ("invoice_line", "il", "invoice_line_id"),
+    },
+}
+
+def _max_age():
+    return float(os.getenv("SUMMARY_MAX_AGE", "3600"))
+
+def summary_annotations(engine, max_age=None):
+    """(notes, hidden) for the prompt schema
+
+    Summaries refreshed within `max_age` seconds get a note telling the model
+    to prefer them; stale or never refreshed ones are hidden, so answers do not
+    silently drift from the base tables. The freshness table is always hidden.
+    """
+    max_age = max_age if max_age is not None else _max_age()
+    try:
+        rows = freshness(engine)
+    except sqlalchemy.exc.SQLAlchemyError as e:
+        print(f"Could not read summary freshness: {e}")
+        rows = {}
+    notes, hidden = {}, {REFRESH_TABLE}
+    for name, summary in SUMMARIES.items():
+        row = rows.get(name)
+        if row is None or row["age_seconds"] > max_age:
+            hidden.add(name)
+        else:
+            notes[name] = f"Precomputed summary: {summary['description']}. Prefer it over joining the base tables for these totals."
+    return notes, hidden
+
+def create_summaries(engine):
+    """Create the summary tables and the freshness table if they do not exist"""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"""
+            CREATE TABLE IF NOT EXISTS {REFRESH_TABLE} (
+                name VARCHAR(63) PRIMARY KEY,
+                refreshed_at DOUBLE PRECISION NOT NULL,
+                mode VARCHAR(16) NOT NULL,
+                row_count BIGINT NOT NULL,
+                seconds DOUBLE PRECISION NOT NULL,
+                watermark BIGINT NOT NULL,
+                source_rows BIGINT NOT NULL
+            )""")
+        for name, summary in SUMMARIES.items():
+            columns = ", ".join(f"{column} {type_}" for column, type_ in summary["columns"])
+            conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {name} ({columns}, PRIMARY KEY ({', '.join(summary['key'])}))")
+
+def drop_summaries(engine):
+    with engine.begin() as conn:
+        for name in SUMMARIES:
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {name}")
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {REFRESH_TABLE}")
+
+def _source_state(conn, summary):
+    table, _, key = summary["driver"]
+    row = conn.execute(sqlalchemy.text(f"SELECT COALESCE(MAX({key}), 0), COUNT(*) FROM {table}")).one()
+    return int(row[0]), int(row[1])
+
+def _insert_sql(name, summary, where):
+    columns = ", ".join(column for column, _ in summary["columns"])
+    return f"INSERT INTO {name} ({columns}) {summary['query'].format(where=where)}"
+
+def _upsert_sql(name, summary):
+    _, alias, key = summary["driver"]
+    updates = [
+        f"{column} = {name}.{column} + excluded.{column}" if column in summary["additive"] else f"{column} = excluded.{column}"
+        for column, _ in summary["columns"] if column not in summary["key"]
+    ]
+    insert = _insert_sql(name, summary, f"WHERE {alias}.{key} > :watermark")
+    return f"{insert} ON CONFLICT ({', '.join(summary['key'])}) DO UPDATE SET {', '.join(updates)}"
+
+def refresh_summary(engine, name, mode="incremental"):
+    """Bring one summary up to date; freshness row as a dict
+
+    Incremental mode folds in driver rows above the stored watermark. It falls
+    back to a full rebuild when the summary was never built or when driver rows
+    at or below the watermark were deleted. Updates to old rows are not
+    detected, so a periodic full refresh is still needed when facts change.
+    """
+    summary = SUMMARIES[name]
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # Two workers folding in the same delta would count it twice; readers are not blocked
+            conn.exec_driver_sql(f"LOCK TABLE {name} IN EXCLUSIVE MODE")
+        previous = conn.execute(
+            sqlalchemy.text(f"SELECT watermark, source_rows FROM {REFRESH_TABLE} WHERE name = :name"), {"name": name}
+        ).first()
+        watermark, source_rows = _source_state(conn, summary)
+
+        if mode == "incremental" and previous is not None:
+            table, _, key = summary["driver"]
+            appended = conn.execute(
+                sqlalchemy.text(f"SELECT COUNT(*) FROM {table} WHERE {key} > :watermark"), {"watermark": previous[0]}
+            ).scalar()
+            if previous[1] + appended != source_rows:
+                mode = "full"
+            elif appended:
+                conn.execute(sqlalchemy.text(_upsert_sql(name, summary)), {"watermark": previous[0]})
+        else:
+            mode = "full"
+
+        if mode == "full":
+            conn.exec_driver_sql(f"DELETE FROM {name}")
+            conn.exec_driver_sql(_insert_sql(name, summary, ""))
+
+        freshness = {
+            "name": name,
+            "refreshed_at": time.time(),
+            "mode": mode,
+            "row_count": conn.execute(sqlalchemy.text(f"SELECT COUNT(*) FROM {name}")).scalar(),
+            "seconds": time.perf_counter() - start,
+            "watermark": watermark,
+            "source_rows": source_rows,
+        }
+        conn.execute(sqlalchemy.text(f"""
+            INSERT INTO {REFRESH_TABLE} (name, refreshed_at, mode, row_count, seconds, watermark, source_rows)
+            VALUES (:name, :refreshed_at, :mode, :row_count, :seconds, :watermark, :source_rows)
+            ON CONFLICT (name) DO UPDATE SET refreshed_at = excluded.refreshed_at, mode = excluded.mode,
+                row_count = excluded.row_count, seconds = excluded.seconds,
+                watermark = excluded.watermark, source_rows = excluded.source_rows"""), freshness)
+    return freshness
+
+def refresh_all(engine, mode="incremental", names=None):
+    return [refresh_summary(engine, name, mode) for name in (names or SUMMARIES)]
+
+def freshness(engine):
+    """Freshness rows per summary, with their age in seconds; empty when never created"""
+    if not sqlalchemy.inspect(engine).has_table(REFRESH_TABLE):
+        return {}
+    with engine.connect() as conn:
+        rows = conn.execute(sqlalchemy.text(f"SELECT * FROM {REFRESH_TABLE}")).mappings().all()
+    now = time.time()
+    return {row["name"]: {**row, "age_seconds": round(now - row["refreshed_at"], 1)} for row in rows}
+
+class SummaryRefresher:
+    """Background thread that refreshes the existing summaries every `interval` seconds
+
+    `on_refresh(rows)` runs after every attempt, with the freshness rows of
+    the summaries refreshed (empty when it failed).
+    """
+
+    def __init__(self, engine, interval=None, mode=None, on_refresh=None):
+        self.engine = engine
+        self.interval = interval or float(os.getenv("SUMMARY_REFRESH_INTERVAL", "300"))
+        self.mode = mode or os.getenv("SUMMARY_REFRESH_MODE", "incremental")
+        self.on_refresh = on_refresh
+        self.runs = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="summary-refresher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def stats(self):
+        return {"interval": self.interval, "mode": self.mode, "runs": self.runs, "errors": self.errors}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rows = []
+            try:
+                # Only summaries someone created with `summaries.py create`
+                names = list(freshness(self.engine))
+                if names:
+                    rows = refresh_all(self.engine, self.mode, names)
+                self.runs += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Summary refresh error: {e}")
+            if self.on_refresh is not None:
+                self.on_refresh(rows)
+
+def main():
+    from app_context import get_context
+
+    parser = argparse.ArgumentParser(description="Create, refresh and inspect the precomputed summary tables")
+    parser.add_argument("command", choices=["create", "refresh", "status", "drop"])
+    parser.add_argument("--full", action="store_true", help="rebuild instead of folding in new rows")
+    parser.add_argument("--name", action="append", choices=list(SUMMARIES), help="only this summary (repeatable)")
+    args = parser.parse_args()
+
+    engine = get_context().db._engine
+    if args.command == "drop":
+        drop_summaries(engine)
+        print("Summary tables dropped")
+        return
+    if args.command == "create":
+        create_summaries(engine)
+    if args.command in ("create", "refresh"):
+        mode = "full" if args.full or args.command == "create" else "incremental"
+        for row in refresh_all(engine, mode, args.name):
+            print(f"{row['name']:<28} {row['mode']:<12} {row['row_count']:>6} rows  {row['seconds'] * 1000:>9.1f} ms")
+        return
+
+    rows = freshness(engine)
+    if not rows:
+        print("No summaries yet; run: python src/summaries.py create")
+    for name, row in rows.items():
+        stale = "  STALE, hidden from the prompt" if row["age_seconds"] > _max_age() else ""
+        print(f"{name:<28} {row['row_count']:>6} rows  refreshed {row['age_seconds']:.0f}s ago ({row['mode']}), watermark {row['watermark']}{stale}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import os
+import re
+import threading
+from text_index import BM25Index
+
+REFERENCES_PATTERN = re.compile(r"REFERENCES\s+\"?(?:\w+\"?\.\"?)?(\w+)\"?", re.IGNORECASE)
+
+# Words people use for Chinook tables that never appear in the schema itself
+TABLE_ALIASES = {
+    "artist": "band singer musician performer",
+    "album": "record release",
+    "track": "song songs tune music",
+    "genre": "style category music",
+    "media_type": "format file",
+    "playlist": "playlists",
+    "playlist_track": "playlist song",
+    "customer": "client buyer",
+    "employee": "staff rep representative manager worker",
+    "invoice": "sale sales order purchase revenue billing spent spend",
+    "invoice_line": "sale sales sold purchase revenue quantity bought",
+}
+
+class TableSelector:
+    """Ranks tables against a question with a BM25 index over the cached schema"""
+
+    def __init__(self, schema_cache, top_k=None, aliases=None):
+        self.schema_cache = schema_cache
+        self.top_k = top_k or int(os.getenv("TABLE_SELECTION_TOP_K", "4"))
+        self.aliases = TABLE_ALIASES if aliases is None else aliases
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._index = None
+        self._references = {}
+
+    def _build(self):
+        documents = {}
+        references = {}
+        for table in self.schema_cache.get_usable_table_names():
+            info = self.schema_cache.get_table_info([table])
+            documents[table] = " ".join([table, table, self.aliases.get(table, ""), info])
+            references[table] = {
+                ref for ref in REFERENCES_PATTERN.findall(info) if ref != table
+            }
+
+        self._index = BM25Index(documents)
+        self._references = references
+
+    def _ensure_index(self):
+        with self._lock:
+            fingerprint = self.schema_cache.current_fingerprint
+            if self._index is None or fingerprint != self._fingerprint:
+                self._build()
+                self._fingerprint = fingerprint
+
+    def neighbors(self, tables):
+        """Tables referenced by, or referencing, any of the given tables"""
+        related = set()
+        for table in tables:
+            related.update(self._references.get(table, ()))
+        for table, refs in self._references.items():
+            if refs & set(tables):
+                related.add(table)
+        return related - set(tables)
+
+    def select(self, question, k=None):
+        """Top-k tables for the question plus their foreign-key neighbors"""
+        self._ensure_index()
+        scores = self._index.score(question)
+        ranked = [table for table, score in sorted(scores.items(), key=lambda item: -item[1]) if score > 0]
+        if not ranked:
+            return list(self._index.keys)
+
+        selected = ranked[:k or self.top_k]
+        chosen = set(selected)
+        # Referenced tables keep joins possible; referencing ones must also match
+        for table in selected:
+            chosen.update(self._references.get(table, ()))
+        for table in self.neighbors(selected):
+            if scores.get(table, 0) > 0:
+                chosen.add(table)
+
+        return [table for table in self._index.keys if table in chosen]
@@ -0,0 +1,141 @@
+import math
+import re
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from",
+    "give", "has", "have", "how", "i", "in", "is", "it", "list", "many", "me", "much",
+    "of", "on", "or", "show", "that", "the", "there", "to", "was", "what", "which",
+    "who", "with", "all", "each", "per", "not", "null", "varchar", "integer", "int",
+    "numeric", "create", "table", "rows", "constraint", "primary", "key",
+}
+
+# Words that flip or bound what a question asks for; BM25 can drop them, question matching must not
+NEGATIONS = {"not", "no", "never", "without", "except", "excluding", "none", "nor"}
+COMPARATIVES = {
+    "more", "less", "fewer", "greater", "than", "before", "after", "above", "below", "over", "under",
+    "most", "least", "between", "from", "to", "since", "until", "higher", "lower", "longer", "shorter",
+}
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+def estimate_tokens(text):
+    """Prompt token count, exact with tiktoken installed, ~4 chars/token otherwise"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+def _stem(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def tokenize(text):
+    """Lowercase word tokens with snake_case split, naive plural stripping and stopwords removed"""
+    tokens = []
+    for raw in TOKEN_PATTERN.findall(text.lower().replace("_", " ")):
+        if raw in STOPWORDS or raw.isdigit():
+            continue
+        tokens.append(_stem(raw))
+    return tokens
+
+def question_tokens(text, keep=frozenset()):
+    """Like tokenize, in order, but keeping numbers, negations, comparatives and any `keep` words"""
+    tokens = []
+    for raw in TOKEN_PATTERN.findall(text.lower().replace("_", " ")):
+        if raw in NEGATIONS or raw in COMPARATIVES or raw in keep or raw.isdigit():
+            tokens.append(raw)
+        elif raw not in STOPWORDS:
+            tokens.append(_stem(raw))
+    return tokens
+
+class BM25Index:
+    """Okapi BM25 with postings lists, so lookups only touch matching documents
+
+    Documents can be added and removed one at a time: idf and length
+    normalization are computed at query time from running counts, so a change
+    costs the terms of one document instead of a rebuild.
+    """
+
+    def __init__(self, documents=None, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._keys = []
+        self._positions = {}
+        self.term_freqs = []
+        self.doc_lengths = []
+        self.total_length = 0
+        self.postings = {}
+        for key, document in (documents or {}).items():
+            self.add(key, document)
+
+    @property
+    def keys(self):
+        """Keys of the indexed documents, in the order they were added"""
+        return [key for key in self._keys if key is not None]
+
+    def __len__(self):
+        return len(self._positions)
+
+    def add(self, key, document):
+        if key in self._positions:
+            self.remove(key)
+        i = len(self._keys)
+        tf = Counter(tokenize(document))
+        self._keys.append(key)
+        self._positions[key] = i
+        self.term_freqs.append(tf)
+        self.doc_lengths.append(sum(tf.values()))
+        self.total_length += self.doc_lengths[i]
+        for term, freq in tf.items():
+            self.postings.setdefault(term, {})[i] = freq
+
+    def remove(self, key):
+        i = self._positions.pop(key, None)
+        if i is None:
+            return
+        for term in self.term_freqs[i]:
+            postings = self.postings[term]
+            del postings[i]
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths[i]
+        self._keys[i] = None
+        self.term_freqs[i] = Counter()
+        self.doc_lengths[i] = 0
+
+    def _scores(self, query):
+        n = len(self._positions)
+        if not n:
+            return {}
+        avg_length = self.total_length / n
+        scores = {}
+        for term in tokenize(query):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, freq in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / avg_length) if avg_length else self.k1
+                scores[i] = scores.get(i, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        return scores
+
+    def score(self, query):
+        """BM25 score per document key for the query text"""
+        scores = self._scores(query)
+        return {key: scores.get(i, 0.0) for key, i in self._positions.items()}
+
+    def search(self, query, k=5):
+        """Top-k (key, score) pairs with a positive score, best first"""
+        ranked = sorted(self._scores(query).items(), key=lambda item: -item[1])
+        return [(self._keys[i], score) for i, score in ranked[:k] if score > 0]
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import sqlglot
+from sqlglot import exp
+
+def parameterize(query, dialect="postgres"):
+    """Normalized SQL with literals replaced by placeholders, so queries differing only in constants group together"""
+    try:
+        tree = sqlglot.parse_one(query, read=dialect)
+    except sqlglot.errors.SqlglotError:
+        return " ".join(query.split())
+
+    def strip_literal(node):
+        if isinstance(node, exp.Literal) and not isinstance(node.parent, exp.Limit):
+            return exp.Placeholder()
+        return node
+
+    return tree.transform(strip_literal).sql(dialect=dialect, normalize=True)
+
+def sql_fingerprint(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+class WorkloadRecorder:
+    """Appends one JSON line per executed query: parameterized SQL, fingerprint, timing and row count
+
+    WORKLOAD_SAMPLE below 1 records a random fraction of executions.
+    """
+
+    def __init__(self, path=None, sample=None):
+        self.path = path if path is not None else os.getenv("WORKLOAD_LOG", "")
+        self.sample = sample if sample is not None else float(os.getenv("WORKLOAD_SAMPLE", "1"))
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8") if self.path else None
+        self.recorded = 0
+
+    def record(self, query, dialect, db_ms, rows):
+        if self._file is None or (self.sample < 1 and random.random() >= self.sample):
+            return
+        text = parameterize(query, dialect)
+        line = json.dumps({
+            "ts": time.time(),
+            "fingerprint": sql_fingerprint(text),
+            "sql": text,
+            "example": query,
+            "dialect": dialect,
+            "ms": round(db_ms, 3),
+            "rows": rows,
+        })
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.recorded += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def read_workload(path):
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+def aggregate(records):
+    """Per fingerprint: count, total/mean/max ms, mean rows and the slowest example, by total time"""
+    groups = {}
+    for record in records:
+        group = groups.setdefault(record["fingerprint"], {
+            "fingerprint": record["fingerprint"],
+            "sql": record["sql"],
+            "dialect": record.get("dialect", "postgres"),
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "rows": 0,
+            "example": record["example"],
+        })
+        group["count"] += 1
+        group["total_ms"] += record["ms"]
+        group["rows"] += record.get("rows") or 0
+        if record["ms"] >= group["max_ms"]:
+            group["max_ms"] = record["ms"]
+            group["example"] = record["example"]
+
+    for group in groups.values():
+        group["mean_ms"] = group["total_ms"] / group["count"]
+        group["mean_rows"] = group.pop("rows") / group["count"]
+    return sorted(groups.values(), key=lambda group: -group["total_ms"])
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+
+import sqlalchemy
+from langchain_community.utilities import SQLDatabase
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(TESTS_DIR, "..", "src"))
+
+import app_context
+from app_context import AppContext
+
+def test_importing_the_service_connects_to_nothing():
+    """Nothing is built at import time, even with an unreachable database and LLM"""
+    script = (
+        f"import sys; sys.path.append({os.path.join(TESTS_DIR, '..', 'src')!r}); "
+        "import server, batch; from app_context import get_context; print(sorted(get_context()._values))"
+    )
+    env = {
+        **os.environ,
+        "DATABASE_URL": "postgresql://nobody@192.0.2.1:5432/none",
+        "OLLAMA_BASE_URL": "http://192.0.2.1:11434",
+        "LLM_BACKENDS": "",
+    }
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+def test_built_on_first_use_only(monkeypatch):
+    import database
+    import llm_config
+
+    calls = []
+    engine = sqlalchemy.create_engine("sqlite://")
+    monkeypatch.setattr(database, "create_database_connection", lambda: calls.append("db") or SQLDatabase(engine))
+    monkeypatch.setattr(llm_config, "get_available_llm", lambda: calls.append("llm") or (object(), "ollama"))
+
+    ctx = AppContext()
+    ctx.limiter
+    assert calls == []
+    assert not ctx.is_ready("db")
+
+    assert ctx.db is ctx.db
+    assert calls == ["db"]
+    ctx.llm_type
+    ctx.llm
+    assert calls == ["db", "llm"]
+
+def test_after_fork_rebuilds_the_pool_in_the_child(tmp_path, monkeypatch):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    db = SQLDatabase(engine)
+    ctx = app_context.get_context()
+    monkeypatch.setattr(ctx, "_values", {"db": db, "query_cache": object()})
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+    parent_pool = engine.pool
+    assert parent_pool.checkedin() == 1
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child: the at-fork hook has already run
+        ok = sorted(ctx._values) == ["db"] and ctx.db is db and engine.pool is not parent_pool
+        with engine.connect() as conn:
+            ok = ok and conn.exec_driver_sql("SELECT 1").scalar() == 1
+        os.write(write, b"ok" if ok else b"bad")
+        os._exit(0)
+
+    os.close(write)
+    os.waitpid(pid, 0)
+    assert os.read(read, 16) == b"ok"
+    os.close(read)
+    # The parent's pooled connection was neither closed nor replaced by the child
+    assert engine.pool is parent_pool
+    assert parent_pool.checkedin() == 1
+
+def test_after_fork_disposes_without_closing(monkeypatch):
+    disposed = []
+
+    class Engine:
+        def dispose(self, close=True):
+            disposed.append(close)
+
+    db = type("DB", (), {"_engine": Engine()})()
+    ctx = AppContext()
+    ctx._values.update({"db": db, "limiter": object(), "backend": object()})
+    lock = ctx._lock
+
+    ctx.after_fork()
+    assert disposed == [False]
+    assert ctx._values == {"db": db}
+    assert ctx._lock is not lock
@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from batch import finished_ids, read_questions
+
+def test_read_questions_jsonl_and_csv(tmp_path):
+    jsonl = tmp_path / "questions.jsonl"
+    jsonl.write_text('{"id": 0, "question": "How many artists?"}\n\n"How many albums?"\n')
+    assert read_questions(str(jsonl)) == [
+        {"id": "0", "question": "How many artists?"},
+        {"id": "3", "question": "How many albums?"},
+    ]
+
+    csv_file = tmp_path / "questions.csv"
+    csv_file.write_text("question\nHow many genres?\n")
+    assert read_questions(str(csv_file)) == [{"id": "1", "question": "How many genres?"}]
+
+def test_finished_ids_resume(tmp_path):
+    """Written ids are skipped, a truncated last line is ignored, failures can be retried"""
+    output = tmp_path / "results.jsonl"
+    output.write_text(
+        json.dumps({"id": "1", "answer": "3"}) + "\n"
+        + json.dumps({"id": "2", "error": "timeout"}) + "\n"
+        + '{"id": "3", "ans'
+    )
+    assert finished_ids(str(output)) == {"1", "2"}
+    assert finished_ids(str(output), retry_failed=True) == {"1"}
+    assert finished_ids(str(tmp_path / "missing.jsonl")) == set()
+
+def test_error_states_are_failures_and_resume_appends_on_a_new_line(tmp_path, monkeypatch):
+    """A graph run ending in an error state is written as failed and retried; a cut-off line is closed first"""
+    import asyncio
+    import batch
+
+    class Graph:
+        async def ainvoke(self, state, config=None):
+            if state["question"] == "bad":
+                return {"query": "", "error": "could not generate SQL: timeout", "answer": "Sorry"}
+            return {"query": "SELECT 1", "answer": "1"}
+
+    monkeypatch.setattr(batch, "graph_builder", Graph())
+    monkeypatch.setattr(batch.get_context(), "warm", lambda: None)
+
+    output = tmp_path / "results.jsonl"
+    output.write_text('{"id": "0", "ans')
+    questions = [{"id": "1", "question": "good"}, {"id": "2", "question": "bad"}]
+    stats = asyncio.run(batch.run_batch(questions, str(output), concurrency=1, db_workers=1))
+    assert (stats["completed"], stats["failed"]) == (1, 1)
+
+    records = [json.loads(line) for line in output.read_text().splitlines()[1:]]
+    assert [record.get("error") for record in records] == [None, "could not generate SQL: timeout"]
+    assert finished_ids(str(output), retry_failed=True) == {"1"}
+
+def test_answer_llm_failure_is_a_failed_row(tmp_path, monkeypatch):
+    """A query that ran but whose answer LLM call failed is counted as failed, so a resumed run retries it"""
+    import asyncio
+    import batch
+    import chain
+
+    class Context:
+        class llm:
+            @staticmethod
+            async def ainvoke(prompt):
+                raise ConnectionError("model unloaded")
+
+        llm_type = "ollama"
+        prompts = {"answer_template": "{question} {query} {result}"}
+
+        def llm_failed(self):
+            pass
+
+    monkeypatch.setattr(chain, "get_context", Context)
+
+    class Graph:
+        async def ainvoke(self, state, config=None):
+            state = {**state, "query": "SELECT 1", "result": "1"}
+            return {**state, **await chain.agenerate_answer(state)}
+
+    monkeypatch.setattr(batch, "graph_builder", Graph())
+    monkeypatch.setattr(batch.get_context(), "warm", lambda: None)
+
+    output = tmp_path / "results.jsonl"
+    stats = asyncio.run(batch.run_batch([{"id": "1", "question": "How many?"}], str(output), concurrency=1, db_workers=1))
+    assert (stats["completed"], stats["failed"]) == (0, 1)
+
+    record = json.loads(output.read_text())
+    assert record["answer_path"] == "error"
+    assert record["error"] == "could not generate answer: model unloaded"
+    assert finished_ids(str(output), retry_failed=True) == set()
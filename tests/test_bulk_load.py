@@ -0,0 +1,66 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from bulk_load import copy_lines, copy_rows, copy_value, key_offsets, split_primary_key
+
+CREATE_ALBUM = """CREATE TABLE album
+(
+    album_id INT NOT NULL,
+    title VARCHAR(160) NOT NULL,
+    artist_id INT NOT NULL,
+    CONSTRAINT album_pkey PRIMARY KEY  (album_id)
+)"""
+
+def make_dump():
+    return {
+        "tables": {
+            "artist": "CREATE TABLE artist\n(\n    artist_id INT NOT NULL,\n    CONSTRAINT artist_pkey PRIMARY KEY (artist_id)\n)",
+            "album": CREATE_ALBUM,
+        },
+        "foreign_keys": [(
+            "album",
+            "CONSTRAINT album_artist_id_fkey FOREIGN KEY (artist_id) REFERENCES artist (artist_id)",
+            "ALTER TABLE album ADD CONSTRAINT album_artist_id_fkey FOREIGN KEY (artist_id) REFERENCES artist (artist_id)",
+        )],
+        "indexes": [],
+        "columns": {"artist": ["artist_id"], "album": ["album_id", "title", "artist_id"]},
+        "rows": {"artist": [(1,), (2,), (3,)], "album": [(1, "A", 1), (2, "B", 3)]},
+    }
+
+def test_split_primary_key():
+    create, primary_key, columns = split_primary_key(CREATE_ALBUM)
+    assert "PRIMARY KEY" not in create
+    assert create.rstrip().endswith("artist_id INT NOT NULL\n)")
+    assert primary_key == "CONSTRAINT album_pkey PRIMARY KEY  (album_id)"
+    assert columns == ["album_id"]
+
+def test_copy_value_escapes():
+    assert copy_value(None) == "\\N"
+    assert copy_value("a\tb\\c\nd") == "a\\tb\\\\c\\nd"
+    assert copy_value(0.99) == "0.99"
+
+def test_scaled_copies_keep_keys_consistent():
+    dump = make_dump()
+    offsets = key_offsets(dump)
+    assert offsets == {"artist": {0: 3}, "album": {0: 2, 2: 3}}
+
+    albums = list(copy_lines(dump["rows"]["album"], offsets["album"], 3))
+    assert albums == ["1\tA\t1\n", "2\tB\t3\n", "3\tA\t4\n", "4\tB\t6\n", "5\tA\t7\n", "6\tB\t9\n"]
+    artists = {line.strip() for line in copy_lines(dump["rows"]["artist"], offsets["artist"], 3)}
+    assert {line.split("\t")[2].strip() for line in albums} <= artists
+
+def test_copy_rows_batches():
+    class Cursor:
+        def __init__(self):
+            self.copies = []
+
+        def copy_expert(self, statement, buffer):
+            self.copies.append((statement, buffer.read()))
+
+    cursor = Cursor()
+    lines = copy_lines([(1, "A", None), (2, "B", 3), (3, "C", 4)], {}, 1)
+    assert copy_rows(cursor, "album", ["album_id", "title", "artist_id"], lines, batch_size=2) == 3
+    assert [statement for statement, _ in cursor.copies] == ["COPY album (album_id, title, artist_id) FROM STDIN"] * 2
+    assert cursor.copies[0][1] == "1\tA\t\\N\n2\tB\t3\n"
@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from query_cache import QueryCache, normalize_question
+
+def test_normalize_question():
+    """Case, whitespace and trailing punctuation do not change the key"""
+    assert normalize_question("  How many   Artists are there? ") == "how many artists are there"
+    assert QueryCache.make_key("How many artists?", "m", "f") == QueryCache.make_key("how many artists", "m", "f")
+    assert QueryCache.make_key("How many artists?", "m", "f") != QueryCache.make_key("How many artists?", "m", "g")
+
+def test_query_cache_lru_eviction():
+    """Least recently used entry is evicted first"""
+    cache = QueryCache(max_entries=2, ttl=0, path="")
+    cache.put("a", "m", "f", "SELECT 1")
+    cache.put("b", "m", "f", "SELECT 2")
+    assert cache.get("a", "m", "f") == "SELECT 1"
+    cache.put("c", "m", "f", "SELECT 3")
+
+    assert cache.get("b", "m", "f") is None
+    assert cache.get("a", "m", "f") == "SELECT 1"
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+def test_query_cache_ttl():
+    """Expired entries are treated as misses"""
+    cache = QueryCache(max_entries=10, ttl=0.01, path="")
+    cache.put("a", "m", "f", "SELECT 1")
+    time.sleep(0.02)
+    assert cache.get("a", "m", "f") is None
+
+def test_query_cache_persists(tmp_path):
+    """SQLite store survives a new cache instance"""
+    path = str(tmp_path / "cache.db")
+    QueryCache(max_entries=10, ttl=0, path=path).put("How many artists?", "m", "f", "SELECT COUNT(*) FROM artist")
+
+    cache = QueryCache(max_entries=10, ttl=0, path=path)
+    assert cache.get("how many artists", "m", "f") == "SELECT COUNT(*) FROM artist"
+
+def test_semantic_cache_reuses_close_questions(tmp_path):
+    """Paraphrases hit at the default threshold; other questions, numbers or schema fingerprints miss; the index reloads"""
+    from embeddings import HashingEmbedder
+    from semantic_cache import SemanticCache
+
+    embedder = HashingEmbedder()
+    path = str(tmp_path / "semantic")
+    cache = SemanticCache(embedder, capacity=4, path=path, ann=False)
+    assert cache.threshold == embedder.default_threshold
+    cache.put("How many artists exist?", "m", "f", "SELECT COUNT(*) FROM artist")
+    cache.put("total sales by country", "m", "f", "SELECT billing_country, SUM(total) FROM invoice GROUP BY 1")
+    cache.put("Top 5 albums", "m", "f", "SELECT title FROM album LIMIT 5")
+
+    assert cache.get("how many artists are there", "m", "f")[0] == "SELECT COUNT(*) FROM artist"
+    assert cache.get("count of artists", "m", "f")[0] == "SELECT COUNT(*) FROM artist"
+    assert cache.get("sales total per country", "m", "f")[0].startswith("SELECT billing_country")
+    assert cache.get("how many albums are there", "m", "f")[0] is None
+    assert cache.get("List all artists", "m", "f")[0] is None
+    assert cache.get("total sales by genre", "m", "f")[0] is None
+    assert cache.get("how many artists are there", "m", "other")[0] is None
+    assert cache.get("Top 10 albums", "m", "f")[0] is None
+
+    reloaded = SemanticCache(embedder, capacity=4, path=path, ann=True)
+    assert reloaded.get("How many artists exist", "m", "f")[0] == "SELECT COUNT(*) FROM artist"
+
+def test_semantic_cache_bounded():
+    """A full cache overwrites the least recently used slot"""
+    from embeddings import HashingEmbedder
+    from semantic_cache import SemanticCache
+
+    cache = SemanticCache(HashingEmbedder(), capacity=2, threshold=0.99, path="")
+    for question in ["artists", "albums", "genres"]:
+        cache.put(question, "m", "f", f"SELECT * FROM {question}")
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert cache.get("artists", "m", "f")[0] is None
+
+def test_semantic_cache_keeps_opposite_questions_apart():
+    """Negated, swapped and reversed questions miss at the default threshold"""
+    from embeddings import HashingEmbedder
+    from semantic_cache import SemanticCache
+
+    cache = SemanticCache(HashingEmbedder(), capacity=8, path="")
+    cache.put("How many customers are from USA?", "m", "f", "SELECT COUNT(*) FROM customer WHERE country = 'USA'")
+    cache.put("Does Rock have more tracks than Jazz?", "m", "f", "SELECT 'rock'")
+    cache.put("Invoices from 2010 to 2012", "m", "f", "SELECT 'range'")
+
+    assert cache.get("How many customers are from USA", "m", "f")[0] is not None
+    assert cache.get("How many customers are not from USA?", "m", "f")[0] is None
+    assert cache.get("Does Jazz have more tracks than Rock?", "m", "f")[0] is None
+    assert cache.get("Invoices from 2012 to 2010", "m", "f")[0] is None
+
+def test_semantic_cache_journal_replays(tmp_path):
+    """Puts are journaled, survive a reopen without close, and compact into the index"""
+    import os
+    from embeddings import HashingEmbedder
+    from semantic_cache import SemanticCache
+
+    path = str(tmp_path / "semantic")
+    cache = SemanticCache(HashingEmbedder(), capacity=2, threshold=0.9, path=path)
+    cache.put("artists", "m", "f", "SELECT * FROM artist")
+    assert os.path.getsize(os.path.join(path, "journal.jsonl")) > 0
+
+    reopened = SemanticCache(HashingEmbedder(), capacity=2, threshold=0.9, path=path)
+    assert reopened.get("artists", "m", "f")[0] == "SELECT * FROM artist"
+    for question in ["albums", "genres"]:
+        reopened.put(question, "m", "f", f"SELECT * FROM {question}")
+    assert os.path.getsize(os.path.join(path, "journal.jsonl")) == 0
+    reopened.close()
+    assert SemanticCache(HashingEmbedder(), capacity=2, threshold=0.9, path=path).get("genres", "m", "f")[0] == "SELECT * FROM genres"
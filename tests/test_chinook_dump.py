@@ -0,0 +1,61 @@
+import decimal
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from chinook_dump import load_sqlite, parse_dump, parse_values, split_statements
+
+DUMP = """
+/* header; with a semicolon */
+CREATE TABLE artist
+(
+    artist_id INT NOT NULL,
+    name VARCHAR(120),
+    CONSTRAINT artist_pkey PRIMARY KEY  (artist_id)
+);
+CREATE TABLE album
+(
+    album_id INT NOT NULL,
+    artist_id INT NOT NULL,
+    price NUMERIC(10,2),
+    CONSTRAINT album_pkey PRIMARY KEY  (album_id)
+);
+-- a comment; ignored
+INSERT INTO artist (artist_id, name) VALUES
+    (1, N'AC/DC'),
+    (2, N'Guns N'' Roses; Friends'),
+    (3, NULL);
+INSERT INTO album (album_id, artist_id, price) VALUES (1, 1, 0.99);
+ALTER TABLE album ADD CONSTRAINT album_artist_id_fkey
+    FOREIGN KEY (artist_id) REFERENCES artist (artist_id) ON DELETE NO ACTION ON UPDATE NO ACTION;
+CREATE INDEX album_artist_id_idx ON album (artist_id);
+"""
+
+def test_split_statements_keeps_quoted_semicolons():
+    statements = split_statements("SELECT 'a;b'; -- x;\n/* y; */ SELECT 2")
+    assert statements == ["SELECT 'a;b'", "SELECT 2"]
+
+def test_parse_values():
+    rows = parse_values("(1, N'It''s', 2.50, NULL), (2, 'x', -3, NULL)")
+    assert rows == [(1, "It's", decimal.Decimal("2.50"), None), (2, "x", -3, None)]
+
+def test_parse_dump_and_load_sqlite(tmp_path):
+    path = tmp_path / "dump.sql"
+    path.write_text(DUMP)
+    dump = parse_dump(str(path))
+
+    assert list(dump["tables"]) == ["artist", "album"]
+    assert dump["rows"]["artist"][1] == (2, "Guns N' Roses; Friends")
+    assert [table for table, _, _ in dump["foreign_keys"]] == ["album"]
+    assert [table for table, _ in dump["indexes"]] == ["album"]
+
+    db_path = load_sqlite(dump, str(tmp_path / "chinook.db"))
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM artist").fetchone() == (3,)
+        assert conn.execute("SELECT price FROM album").fetchone() == (0.99,)
+        assert conn.execute("PRAGMA foreign_key_list(album)").fetchone()[2] == "artist"
+    finally:
+        conn.close()
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from concurrency import ConcurrencyLimiter, Overloaded
+
+def test_caps_requests_in_flight():
+    limiter = ConcurrencyLimiter(max_concurrent=2, max_waiting=10, wait_timeout=5)
+    peak = []
+
+    async def request():
+        async with limiter:
+            peak.append(limiter.active)
+            await asyncio.sleep(0.02)
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(6)))
+
+    asyncio.run(run())
+    assert max(peak) == 2
+    assert limiter.stats()["completed"] == 6
+    assert limiter.stats()["rejected"] == 0
+
+def test_rejects_when_queue_is_full():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_waiting=1, wait_timeout=5)
+
+    async def hold(release):
+        async with limiter:
+            await release.wait()
+
+    async def run():
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(release))
+        queued = asyncio.create_task(hold(release))
+        await asyncio.sleep(0.01)
+        assert (limiter.active, limiter.waiting) == (1, 1)
+
+        with pytest.raises(Overloaded):
+            async with limiter:
+                pass
+        release.set()
+        await asyncio.gather(holder, queued)
+
+    asyncio.run(run())
+    assert limiter.stats()["rejected"] == 1
+    assert limiter.stats()["completed"] == 2
+
+def test_rejects_after_wait_timeout():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_waiting=5, wait_timeout=0.05)
+
+    async def run():
+        async with limiter:
+            with pytest.raises(Overloaded, match="Timed out"):
+                async with limiter:
+                    pass
+            assert limiter.waiting == 0
+
+    asyncio.run(run())
+    assert limiter.stats()["rejected"] == 1
+    assert limiter.stats()["completed"] == 1
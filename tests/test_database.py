@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+
+import pytest
+import sqlalchemy
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from database import engine_options, pool_stats
+
+def make_engine(tmp_path, monkeypatch, size=1, overflow=0, timeout=5):
+    monkeypatch.setenv("DB_POOL_SIZE", str(size))
+    monkeypatch.setenv("DB_MAX_OVERFLOW", str(overflow))
+    monkeypatch.setenv("DB_POOL_TIMEOUT", str(timeout))
+    url = f"sqlite:///{tmp_path / 'db.sqlite'}"
+    return sqlalchemy.create_engine(url, **engine_options(url))
+
+def test_pool_size_and_overflow(tmp_path, monkeypatch):
+    engine = make_engine(tmp_path, monkeypatch, size=1, overflow=1)
+    first = engine.connect()
+    second = engine.connect()
+    stats = pool_stats(engine)
+    assert (stats["size"], stats["checked_out"], stats["overflow"]) == (1, 2, 1)
+    assert stats["checkouts"] == 2 and stats["timeouts"] == 0
+
+    second.close()
+    first.close()
+    stats = pool_stats(engine)
+    assert stats["checked_out"] == 0
+    assert stats["checked_in"] == 1
+
+def test_checkout_wait_is_recorded(tmp_path, monkeypatch):
+    engine = make_engine(tmp_path, monkeypatch)
+    held = engine.connect()
+    threading.Timer(0.1, held.close).start()
+
+    with engine.connect():
+        pass
+    stats = pool_stats(engine)
+    assert stats["checkouts"] == 2
+    # Waited at least until the holder gave its connection back
+    assert stats["max_wait_ms"] >= 90
+
+def test_checkout_timeout_is_counted(tmp_path, monkeypatch):
+    engine = make_engine(tmp_path, monkeypatch, timeout=0.05)
+    with engine.connect():
+        with pytest.raises(sqlalchemy.exc.TimeoutError):
+            engine.connect()
+    stats = pool_stats(engine)
+    assert stats["timeouts"] == 1
+    assert stats["checkouts"] == 1
+
+def test_stats_survive_dispose(tmp_path, monkeypatch):
+    engine = make_engine(tmp_path, monkeypatch)
+    with engine.connect():
+        pass
+    engine.dispose()
+    assert pool_stats(engine)["checkouts"] == 1
+
+def test_postgres_statement_timeout_at_connect(monkeypatch):
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT", "1234")
+    sync = engine_options("postgresql://user@db/chinook")
+    assert sync["connect_args"] == {"client_encoding": "utf8", "options": "-c statement_timeout=1234"}
+
+    async_ = engine_options("postgresql+asyncpg://user@db/chinook", AsyncAdaptedQueuePool)
+    assert async_["connect_args"] == {"server_settings": {"statement_timeout": "1234"}}
+    assert issubclass(async_["poolclass"], AsyncAdaptedQueuePool)
+
+    assert "connect_args" not in engine_options("sqlite://")
@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from embeddings import HashingEmbedder
+from example_store import ExampleStore, format_examples
+from text_index import estimate_tokens
+
+SEEDS = [
+    {"question": "How many artists are there?", "sql": "SELECT COUNT(*) FROM artist"},
+    {"question": "Which artist has the most albums?", "sql": "SELECT artist_id, COUNT(*) FROM album GROUP BY artist_id"},
+    {"question": "What are the total sales by country?", "sql": "SELECT billing_country, SUM(total) FROM invoice GROUP BY 1"},
+]
+
+def make_store(tmp_path, **kwargs):
+    seed_file = tmp_path / "seeds.jsonl"
+    seed_file.write_text("".join(json.dumps(seed) + "\n" for seed in SEEDS))
+    return ExampleStore(seed_path=str(seed_file), path=str(tmp_path / "learned.jsonl"), **kwargs)
+
+def test_select_nearest_within_budget(tmp_path):
+    store = make_store(tmp_path)
+    examples = store.select("Which artists have the most albums?", k=2, budget=1000)
+    assert examples[0][0] == "Which artist has the most albums?"
+    assert len(examples) == 2
+
+    one = estimate_tokens(format_examples(examples[:1]))
+    assert store.select("Which artists have the most albums?", k=2, budget=one) == examples[:1]
+    assert store.select("Which artists have the most albums?", budget=0) == []
+
+def test_learned_examples_persist(tmp_path):
+    store = make_store(tmp_path, max_learned=2)
+    assert not store.add("How many artists are there", "SELECT 1")
+    assert store.add("How many genres are there?", "SELECT COUNT(*) FROM genre")
+    assert not store.add("How many genres are there?", "SELECT COUNT(*) FROM genre")
+    store.add("How many playlists are there?", "SELECT COUNT(*) FROM playlist")
+    store.add("How many invoices are there?", "SELECT COUNT(*) FROM invoice")
+    assert store.stats()["learned"] == 2
+
+    reopened = make_store(tmp_path, max_learned=2)
+    assert reopened.select("invoices count", k=1) == [("How many invoices are there?", "SELECT COUNT(*) FROM invoice")]
+    assert reopened.select("genres count", k=1) == []
+
+def test_embeddings_find_paraphrases(tmp_path):
+    store = make_store(tmp_path, embedder=HashingEmbedder())
+    examples = store.select("sales totals per country", k=1)
+    assert examples[0][0] == "What are the total sales by country?"
+
+def test_learning_updates_the_index_in_place(tmp_path):
+    """Adds after the first lookup update the BM25 index instead of rebuilding it, and rank like a fresh build"""
+    store = make_store(tmp_path, max_learned=2, embedder=HashingEmbedder())
+    store.prepare()
+    index = store._index
+
+    store.add("How many genres are there?", "SELECT COUNT(*) FROM genre")
+    store.add("How many genres are there", "SELECT COUNT(genre_id) FROM genre")
+    store.add("How many playlists are there?", "SELECT COUNT(*) FROM playlist")
+    store.add("How many invoices are there?", "SELECT COUNT(*) FROM invoice")
+    assert store._index is index
+    assert len(index) == len(SEEDS) + 2
+
+    fresh = make_store(tmp_path, max_learned=2, embedder=HashingEmbedder())
+    for question in ["invoices count", "genres count", "playlists", "Which artists have the most albums?"]:
+        assert store.select(question, k=2) == fresh.select(question, k=2)
+    # Both genre examples were evicted by the cap
+    assert all("genre" not in question for question, _ in store.select("genres count", k=5))
+
+def test_bm25_incremental_matches_batch():
+    from text_index import BM25Index
+
+    documents = {1: "artist name", 2: "album title artist", 3: "track name genre", 4: "invoice total"}
+    batch = BM25Index({key: text for key, text in documents.items() if key != 2})
+    incremental = BM25Index()
+    for key, text in documents.items():
+        incremental.add(key, text)
+    incremental.remove(2)
+
+    assert incremental.keys == [1, 3, 4]
+    for query in ["artist", "name genre", "total", "album"]:
+        assert incremental.score(query) == batch.score(query)
@@ -0,0 +1,47 @@
+import os
+import sys
+import sqlalchemy
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from executor import ResultCollector, _session_sql, run_query
+
+def test_row_cap_sets_truncated():
+    collector = ResultCollector(max_rows=2, max_bytes=1000)
+    assert collector.add([(1, "a"), (2, "b")])
+    assert not collector.add([(3, "c")])
+    assert collector.result(["id", "name"]) == {"columns": ["id", "name"], "rows": [(1, "a"), (2, "b")], "truncated": True}
+
+def test_byte_cap_sets_truncated():
+    collector = ResultCollector(max_rows=100, max_bytes=20)
+    assert not collector.add([("x" * 8,), ("y" * 8,), ("z" * 8,)])
+    assert collector.rows == [("x" * 8,), ("y" * 8,)]
+    assert collector.truncated
+
+def test_oversized_first_row_is_cut_to_the_budget():
+    collector = ResultCollector(max_rows=100, max_bytes=100)
+    assert not collector.add([(1, "x" * 10000), (2, "short")])
+    assert len(collector.rows) == 1
+    row = collector.rows[0]
+    assert row[0] == 1 and row[1].endswith("...")
+    assert collector.bytes <= 100
+    assert collector.truncated
+
+def test_small_results_are_not_truncated(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE genre (genre_id INTEGER PRIMARY KEY, name TEXT)")
+        conn.exec_driver_sql("INSERT INTO genre (name) VALUES ('Rock'), ('Jazz')")
+
+    result = run_query(engine, "SELECT genre_id, name FROM genre ORDER BY genre_id", max_rows=10, max_bytes=1000)
+    assert result == {"columns": ["genre_id", "name"], "rows": [(1, "Rock"), (2, "Jazz")], "truncated": False}
+    assert run_query(engine, "SELECT name FROM genre", max_rows=1)["truncated"]
+    assert _session_sql(engine) == []
+
+def test_query_timeout_is_capped_by_the_pool_timeout(monkeypatch):
+    postgres = type("Engine", (), {"dialect": type("Dialect", (), {"name": "postgresql"})})()
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT", "30000")
+    monkeypatch.setenv("QUERY_TIMEOUT_MS", "10000")
+    assert _session_sql(postgres) == ["SET TRANSACTION READ ONLY", "SET LOCAL statement_timeout = 10000"]
+    monkeypatch.setenv("QUERY_TIMEOUT_MS", "60000")
+    assert _session_sql(postgres)[1] == "SET LOCAL statement_timeout = 30000"
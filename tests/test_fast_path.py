@@ -0,0 +1,35 @@
+import datetime
+import decimal
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from chain import fast_answer, format_answer, route_after_execute
+from fast_path import render_answer
+
+def test_render_answer_shapes():
+    assert render_answer(["count"], []) == "No matching records were found."
+    assert render_answer(["track_count"], [(3503,)]) == "Track count: 3503"
+    assert render_answer(["name", "total"], [("AC/DC", decimal.Decimal("12.50"))]) == "Name: AC/DC, Total: 12.5"
+    assert render_answer(["name"], [("Rock",), ("Jazz",)]) == "Found 2 results:\n- Rock\n- Jazz"
+    assert render_answer(["name", "hired"], [("Adams", datetime.datetime(2002, 8, 14)), ("Edwards", None)]) == (
+        "Found 2 results:\n  Name | Hired\n- Adams | 2002-08-14\n- Edwards | none"
+    )
+
+def test_large_results_need_the_llm():
+    assert render_answer(["name"], [(str(i),) for i in range(11)], max_rows=10) is None
+    assert render_answer(["a", "b", "c", "d", "e"], [(1, 2, 3, 4, 5)], max_columns=4) is None
+
+def test_fast_path_routing(monkeypatch):
+    small = {"columns": ["count"], "rows": [(3,)], "truncated": False}
+    assert fast_answer(small) == "Count: 3"
+    assert fast_answer({**small, "truncated": True}) is None
+    assert fast_answer({"columns": ["name"], "rows": [(str(i),) for i in range(50)], "truncated": False}) is None
+
+    assert route_after_execute({"fast_answer": "Count: 3"}) == "format_answer"
+    assert route_after_execute({"fast_answer": None}) == "generate_answer"
+    assert format_answer({"fast_answer": "Count: 3"}) == {"answer": "Count: 3", "answer_path": "template"}
+
+    monkeypatch.setenv("FAST_PATH", "0")
+    assert fast_answer(small) is None
@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from langgraph.graph import START, StateGraph
+from typing_extensions import TypedDict
+
+from fake_llm import FakeChatModel
+from instrumentation import PipelineInstrumentation, request_log
+from metrics import LLM_TOKENS, STAGE_SECONDS, Registry
+
+class State(TypedDict):
+    question: str
+    query: str
+    cache_hit: bool
+    rows: list
+    db_ms: float
+    answer: str
+    answer_path: str
+
+llm = FakeChatModel(responses=["SELECT 1"])
+
+def write_query(state: State):
+    return {"query": llm.invoke(state["question"]).content, "cache_hit": False}
+
+def execute_query(state: State):
+    return {"rows": [(1,)], "db_ms": 2.5}
+
+def format_answer(state: State):
+    return {"answer": "1", "answer_path": "template"}
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    counter = registry.counter("demo_total", "Demo counter", ("kind",))
+    histogram = registry.histogram("demo_seconds", "Demo histogram", buckets=(0.1, 1.0))
+    counter.inc(2, kind='a"b')
+    histogram.observe(0.5)
+    histogram.observe(5)
+    text = registry.render()
+    assert 'demo_total{kind="a\\"b"} 2' in text
+    assert 'demo_seconds_bucket{le="0.1"} 0' in text
+    assert 'demo_seconds_bucket{le="1.0"} 1' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 2' in text
+    assert "demo_seconds_count 2" in text
+
+def test_one_log_line_per_graph_run(caplog):
+    graph = StateGraph(State).add_sequence([
+        ("write_query", write_query),
+        ("execute_query", execute_query),
+        ("format_answer", format_answer),
+    ])
+    graph.add_edge(START, "write_query")
+    compiled = graph.compile().with_config(callbacks=[PipelineInstrumentation()])
+    tokens_before = LLM_TOKENS.value(stage="write_query", kind="prompt")
+    runs_before = STAGE_SECONDS.count(stage="execute_query")
+
+    with caplog.at_level(logging.INFO, logger=request_log.name):
+        compiled.invoke({"question": "How many artists?"})
+
+    records = [json.loads(record.getMessage()) for record in caplog.records if record.name == request_log.name]
+    assert len(records) == 1
+    record = records[0]
+    assert record["question"] == "How many artists?"
+    assert set(record["stages"]) == {"write_query", "execute_query", "format_answer"}
+    assert record["llm"]["write_query"]["prompt_tokens"] > 0
+    assert record["rows"] == 1 and record["db_ms"] == 2.5
+    assert record["answer_path"] == "template"
+    assert LLM_TOKENS.value(stage="write_query", kind="prompt") > tokens_before
+    assert STAGE_SECONDS.count(stage="execute_query") == runs_before + 1
+
+def test_rejected_query_is_a_failed_repair(monkeypatch):
+    import sqlalchemy
+    import chain
+    from metrics import REQUESTS, SQL_REPAIRS
+
+    engine = sqlalchemy.create_engine("sqlite://")
+    monkeypatch.setattr(chain, "get_context", lambda: type("Context", (), {"db": type("DB", (), {"_engine": engine})})())
+    graph = StateGraph(chain.State)
+    graph.add_node("guard_query", chain.check_query)
+    graph.add_node("format_answer", chain.format_answer)
+    graph.add_edge(START, "guard_query")
+    graph.add_conditional_edges("guard_query", chain.route_after_guard, ["format_answer"])
+    compiled = graph.compile().with_config(callbacks=[PipelineInstrumentation()])
+    failed_before = SQL_REPAIRS.value(outcome="failed")
+    fixed_before = SQL_REPAIRS.value(outcome="fixed")
+    rejected_before = REQUESTS.value(status="ok", answer_path="rejected")
+
+    # A repair attempt that produced a write
+    state = compiled.invoke({"question": "Remove every artist", "query": "DELETE FROM artist", "attempts": 1})
+
+    assert state["answer_path"] == "rejected"
+    assert SQL_REPAIRS.value(outcome="failed") == failed_before + 1
+    assert SQL_REPAIRS.value(outcome="fixed") == fixed_before
+    assert REQUESTS.value(status="ok", answer_path="rejected") == rejected_before + 1
@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from app_context import AppContext
+from llm_config import load_backend_state, save_backend_state
+
+def test_saved_backend_must_match_config(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_STATE_FILE", str(tmp_path / "backend.json"))
+    monkeypatch.setenv("OLLAMA_MODEL", "codellama:7b-instruct-q4_0")
+    save_backend_state({"llm_type": "ollama", "model": "codellama:7b-instruct-q4_0", "base_url": "http://localhost:11434"})
+    assert load_backend_state()["model"] == "codellama:7b-instruct-q4_0"
+
+    monkeypatch.setenv("OLLAMA_MODEL", "mistral:7b-instruct-q4_0")
+    assert load_backend_state() is None
+
+def test_failed_first_call_clears_saved_backend(tmp_path, monkeypatch):
+    state_file = tmp_path / "backend.json"
+    monkeypatch.setenv("LLM_STATE_FILE", str(state_file))
+    monkeypatch.delenv("LLM_BACKENDS", raising=False)
+    save_backend_state({"llm_type": "fake", "model": "saved"})
+
+    ctx = AppContext()
+    assert ctx.llm.model == "saved"
+    ctx.llm_failed()
+    assert not state_file.exists()
+    assert not ctx.is_ready("backend")
+
+    save_backend_state({"llm_type": "fake", "model": "saved"})
+    ctx.llm
+    ctx.llm_succeeded()
+    ctx.llm_failed()
+    assert state_file.exists()
+    assert ctx.is_ready("backend")
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from fake_llm import FakeChatModel
+import llm_router
+from llm_router import Backend, BackendUnavailable, LLMRouter
+
+def fake(name, latency=0.0, error=""):
+    return FakeChatModel(model=name, responses=[name], latency=latency, error=error)
+
+def test_failover_and_circuit_breaker():
+    """A failing backend is skipped once its circuit opens"""
+    down = Backend("down", fake("down", error="connection refused"), failure_threshold=2, reset_timeout=60)
+    router = LLMRouter([down, Backend("up", fake("up"))])
+    assert [router.invoke("q").content for _ in range(4)] == ["up"] * 4
+    assert down.requests == 2
+    assert down.stats()["circuit"] == "open"
+    assert router.stats()["failovers"] == 2
+
+def test_timeout_fails_over():
+    stalled = Backend("stalled", fake("stalled", latency=1.0))
+    router = LLMRouter([stalled, Backend("ok", fake("ok", latency=0.01))], timeout=0.1)
+    assert router.invoke("q").content == "ok"
+    assert stalled.timeouts == 1
+    assert asyncio.run(router.ainvoke("q")).content == "ok"
+
+def test_all_backends_down():
+    router = LLMRouter([Backend("a", fake("a", error="boom"))])
+    try:
+        router.invoke("q")
+        assert False, "expected BackendUnavailable"
+    except BackendUnavailable as e:
+        assert "a: boom" in str(e)
+
+def test_least_outstanding_balancing():
+    """Concurrent requests spread across equally healthy backends"""
+    backends = [Backend(name, fake(name, latency=0.05)) for name in ("a", "b", "c")]
+    router = LLMRouter(backends)
+    threads = [threading.Thread(target=router.invoke, args=("q",)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [backend.requests for backend in backends] == [2, 2, 2]
+
+class Clock:
+    """Stands in for time.monotonic; moves only when a model call does work"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+class ClockedModel:
+    """Waits for `release`, then takes one clock second"""
+
+    def __init__(self, clock, release):
+        self.clock = clock
+        self.release = release
+        self.inner = fake("clocked")
+
+    def _generate(self, messages, stop=None, **kwargs):
+        self.release.wait()
+        self.clock.now += 1.0
+        return self.inner._generate(messages, stop=stop, **kwargs)
+
+def wait_until(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+def test_latency_excludes_time_queued_for_a_worker(monkeypatch):
+    """A call waiting for the backend's only thread does not count that wait as backend latency"""
+    clock = Clock()
+    monkeypatch.setattr(llm_router, "time", clock)
+    release = threading.Event()
+    backend = Backend("only", ClockedModel(clock, release))
+    router = LLMRouter([backend], backend_workers=1)
+
+    threads = [threading.Thread(target=router.invoke, args=("q",)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: backend.requests == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    wait_until(lambda: len(backend.latencies) == 2)
+    # Queued from clock 0 and started at 1, so without the fix the second would read 2.0
+    assert list(backend.latencies) == [1.0, 1.0]
+
+def test_queued_call_fails_over_without_counting_as_a_failure():
+    """A call still waiting for a thread when the timeout hits is dropped, and the backend is not marked as failed for it"""
+    release = threading.Event()
+    stuck = Backend("stuck", ClockedModel(Clock(), release))
+    router = LLMRouter([stuck], backend_workers=1, timeout=0.1)
+
+    errors = []
+
+    def hold():
+        try:
+            router.invoke("q")
+        except BackendUnavailable as e:
+            errors.append(str(e))
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    wait_until(lambda: stuck.outstanding == 1)
+    with pytest.raises(BackendUnavailable, match="no free worker"):
+        router.invoke("q")
+    holder.join()
+    release.set()
+
+    assert errors == ["No LLM backend could answer: stuck: timed out after 0.1s"]
+
+    assert stuck.timeouts == 1
+    assert stuck.failures == 1
+    assert router.stats()["queue_timeouts"] == 1
+
+def test_hung_backend_does_not_starve_the_others():
+    hung = Backend("hung", fake("hung", latency=1.0), failure_threshold=10)
+    ok = Backend("ok", fake("ok"))
+    router = LLMRouter([hung, ok], backend_workers=1, timeout=0.1)
+
+    threads = [threading.Thread(target=router.invoke, args=("q",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Every request was answered by "ok", and "ok" was never blamed for "hung" hogging threads
+    assert ok.requests == 4
+    assert ok.failures == 0
+    assert router.stats()["requests"] == 4
+
+def test_hedged_request_wins():
+    """A request slower than the backend's usual p50 is also sent to another backend"""
+    usual = Backend("usual", fake("usual", latency=0.01))
+    spare = Backend("spare", fake("spare", latency=0.01))
+    router = LLMRouter([usual, spare], hedge_percentile=50, hedge_min_samples=3)
+    usual.latencies.extend([0.01, 0.01, 0.01])
+    usual.llm.latency = 0.5
+
+    assert router.invoke("q").content == "spare"
+    # Let the abandoned slow call finish so "usual" is the least loaded again
+    time.sleep(0.6)
+    assert asyncio.run(router.ainvoke("q")).content == "spare"
+    assert router.stats()["hedges"] == 2
+    assert router.stats()["hedge_wins"] == 2
+
+def test_streaming_fails_over_before_first_chunk():
+    router = LLMRouter([Backend("down", fake("down", error="boom")), Backend("up", fake("up"))])
+    assert "".join(chunk.content for chunk in router.stream("q")) == "up"
@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from fake_llm import FakeChatModel
+from llm_config import _keep_alive, get_llm_specific_prompt
+
+TABLE_INFO = "CREATE TABLE genre (genre_id INT, name TEXT)\n\nCREATE TABLE track (track_id INT, genre_id INT)"
+
+def common_prefix(a, b):
+    return os.path.commonprefix([a, b])
+
+def test_query_prompts_share_instructions_and_schema():
+    for llm_type in ("ollama", "openai"):
+        template = get_llm_specific_prompt(llm_type)["system_template"]
+        first = template.format(top_k=10, table_info=TABLE_INFO, examples="", input="How many genres?")
+        second = template.format(
+            top_k=10, table_info=TABLE_INFO, examples="\nExamples:\nQuestion: x\nSQL Query: y\n", input="Longest track?",
+        )
+        assert TABLE_INFO in common_prefix(first, second)
+
+def test_ollama_question_and_repair_follow_the_prefix():
+    prompts = get_llm_specific_prompt("ollama")
+    query = prompts["system_template"].format(top_k=10, table_info=TABLE_INFO, examples="", input="How many genres?")
+    repair = prompts["repair_template"].format(
+        top_k=10, table_info=TABLE_INFO, input="How many genres?", query="SELECT", error="syntax error",
+    )
+    assert query.rstrip().endswith("Question: How many genres?\n\nSQL Query:")
+    assert TABLE_INFO in common_prefix(query, repair)
+
+def test_fake_model_prefix_cache():
+    llm = FakeChatModel(prefix_cache=True)
+    llm.invoke("schema " * 100 + "question one")
+    assert llm.cached_tokens == 0
+    llm.invoke("schema " * 100 + "question two")
+    assert 0 < llm.cached_tokens < llm.prompt_tokens / 2
+
+def test_keep_alive_parsing(monkeypatch):
+    monkeypatch.setenv("OLLAMA_KEEP_ALIVE", "-1")
+    assert _keep_alive() == -1
+    monkeypatch.setenv("OLLAMA_KEEP_ALIVE", "1h")
+    assert _keep_alive() == "1h"
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from query_guard import QueryRejected, rewrite_query
+
+def test_limit_is_injected_and_clamped():
+    """Missing or oversized limits are replaced, small ones are kept"""
+    assert rewrite_query("SELECT name FROM artist", max_limit=100) == "SELECT name FROM artist LIMIT 100"
+    assert rewrite_query("SELECT name FROM artist LIMIT 5000", max_limit=100).endswith("LIMIT 100")
+    assert rewrite_query("SELECT name FROM artist LIMIT 5", max_limit=100).endswith("LIMIT 5")
+
+@pytest.mark.parametrize("query", [
+    "DELETE FROM artist",
+    "SELECT 1; DROP TABLE artist",
+    "SELECT * INTO copy FROM artist",
+    "SELECT * FROM artist FOR UPDATE",
+    "WITH gone AS (DELETE FROM artist RETURNING *) SELECT * FROM gone",
+    "SELECT pg_sleep(60)",
+    "SELECT setval('artist_artist_id_seq', 1)",
+    "SELECT pg_advisory_lock(1)",
+    "SELEC name FROM",
+    "SELECT 'abc",
+])
+def test_unsafe_queries_are_rejected(query):
+    with pytest.raises(QueryRejected):
+        rewrite_query(query)
@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from result_cache import ResultCache, normalize_sql, result_size, tables_read
+
+def result(rows):
+    return {"columns": ["n"], "rows": rows, "truncated": False}
+
+def test_normalized_sql_shares_entries():
+    assert normalize_sql("select count(*)   from artist") == normalize_sql("SELECT COUNT(*) FROM artist")
+    cache = ResultCache(max_bytes=10**6, ttl=0)
+    cache.put("SELECT COUNT(*) FROM artist", result([(275,)]))
+    assert cache.get("select count(*)\n  from artist") == result([(275,)])
+    assert cache.stats()["hits"] == 1
+
+def test_tables_read_skips_ctes():
+    query = "WITH top AS (SELECT artist_id FROM album) SELECT a.name FROM artist a JOIN top t ON t.artist_id = a.artist_id"
+    assert tables_read(query) == {"album", "artist"}
+
+def test_invalidate_by_table():
+    """A write to one table drops only the results that read it"""
+    cache = ResultCache(max_bytes=10**6, ttl=0)
+    cache.put("SELECT COUNT(*) FROM artist", result([(1,)]))
+    cache.put("SELECT COUNT(*) FROM track JOIN album ON track.album_id = album.album_id", result([(2,)]))
+    assert cache.invalidate("Album") == 1
+    assert cache.get("SELECT COUNT(*) FROM artist") is not None
+    assert cache.get("SELECT COUNT(*) FROM track JOIN album ON track.album_id = album.album_id") is None
+    assert cache.invalidate() == 1
+    assert cache.stats()["bytes"] == 0
+
+def test_ttl_and_memory_budget():
+    cache = ResultCache(max_bytes=10**6, ttl=0.05)
+    cache.put("SELECT 1 FROM artist", result([(1,)]))
+    time.sleep(0.1)
+    assert cache.get("SELECT 1 FROM artist") is None
+
+    big = result([(i,) for i in range(100)])
+    budget = 3 * result_size(big)
+    cache = ResultCache(max_bytes=budget, ttl=0)
+    for table in ("a", "b", "c"):
+        cache.put(f"SELECT n FROM {table}", big)
+    cache.get("SELECT n FROM a")
+    cache.put("SELECT n FROM d", big)
+    assert cache.stats()["bytes"] <= budget
+    assert cache.get("SELECT n FROM a") is not None
+    assert cache.get("SELECT n FROM b") is None
+    assert cache.stats()["evictions"] >= 1
@@ -0,0 +1,33 @@
+import datetime
+import decimal
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from result_format import format_result, render_for_prompt
+from text_index import estimate_tokens
+
+def test_values_are_normalized():
+    """No Decimal(...) or datetime(...) reprs reach the prompt"""
+    rows = [(decimal.Decimal("1.50"), datetime.datetime(2021, 1, 2), None)]
+    assert format_result(["total", "day", "note"], rows) == "total\tday\tnote\n1.5\t2021-01-02\tnone"
+    assert format_result(["a|b"], [("x|y",)], style="markdown") == "| a\\|b |\n| --- |\n| x\\|y |"
+
+def test_small_result_is_rendered_in_full():
+    rendered = render_for_prompt(["name"], [("AC/DC",), ("Accept",)], budget=100)
+    assert rendered["text"] == "name\nAC/DC\nAccept"
+    assert rendered["tokens_saved"] == 0
+
+def test_large_result_is_summarized_within_budget():
+    """Counts, min/max and first/last rows survive; the prompt stays near the budget"""
+    rows = [(i, f"track {i}", decimal.Decimal(i) / 100) for i in range(1000)]
+    rendered = render_for_prompt(["id", "name", "price"], rows, truncated=True, budget=200)
+    text = rendered["text"]
+    assert text.startswith("1000+ rows, 3 columns")
+    assert "- id: 1000 values, 1000 distinct, min 0, max 999" in text
+    assert "- price: 1000 values, 1000 distinct, min 0, max 9.99" in text
+    assert "0\ttrack 0\t0" in text and "999\ttrack 999\t9.99" in text
+    assert "rows omitted" in text
+    assert estimate_tokens(text) <= 200
+    assert rendered["tokens_saved"] > rendered["tokens"]
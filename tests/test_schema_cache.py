@@ -0,0 +1,77 @@
+import os
+import sys
+import threading
+
+import pytest
+import sqlalchemy
+from langchain_community.utilities import SQLDatabase
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from schema_cache import SchemaCache
+
+def make_db(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE artist (artist_id INTEGER PRIMARY KEY, name TEXT)")
+    return engine, SQLDatabase(engine)
+
+def test_fingerprint_change_reloads(tmp_path):
+    engine, db = make_db(tmp_path)
+    cache = SchemaCache(db, ttl=3600, check_interval=0).warm()
+    fingerprint = cache.current_fingerprint
+    assert cache.get_usable_table_names() == ["artist"]
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE album (album_id INTEGER PRIMARY KEY, title TEXT)")
+    assert cache.get_usable_table_names() == ["album", "artist"]
+    assert cache.current_fingerprint != fingerprint
+
+def test_no_reload_between_checks_until_invalidated(tmp_path):
+    engine, db = make_db(tmp_path)
+    cache = SchemaCache(db, ttl=3600, check_interval=3600).warm()
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE album (album_id INTEGER PRIMARY KEY, title TEXT)")
+    assert cache.get_usable_table_names() == ["artist"]
+
+    cache.invalidate()
+    assert cache.get_usable_table_names() == ["album", "artist"]
+
+def test_ttl_expiry_reloads_unchanged_schema(tmp_path):
+    """Sample rows are not part of the fingerprint, so only the TTL picks them up"""
+    engine, db = make_db(tmp_path)
+    cache = SchemaCache(db, ttl=0, check_interval=3600).warm()
+    assert "AC/DC" not in cache.get_table_info(["artist"])
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO artist (name) VALUES ('AC/DC')")
+    assert "AC/DC" in cache.get_table_info(["artist"])
+
+def test_unknown_table_raises(tmp_path):
+    _, db = make_db(tmp_path)
+    cache = SchemaCache(db).warm()
+    with pytest.raises(ValueError, match="missing"):
+        cache.get_table_info(["missing"])
+
+def test_invalidate_right_after_refresh_check(tmp_path):
+    """A lookup still answers when another thread invalidates between the freshness check and the read"""
+    _, db = make_db(tmp_path)
+    cache = SchemaCache(db).warm()
+
+    class InvalidatingLock:
+        def __init__(self):
+            self.lock = threading.RLock()
+
+        def __enter__(self):
+            self.lock.acquire()
+
+        def __exit__(self, *exc):
+            self.lock.release()
+            # What the summary refresher's invalidate() does as soon as the lock is free
+            cache._tables = None
+            cache._needs_reflect = True
+
+    cache._lock = InvalidatingLock()
+    assert cache.get_usable_table_names() == ["artist"]
+    assert "CREATE TABLE artist" in cache.get_table_info(["artist"])
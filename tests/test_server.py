@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessageChunk
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import chain
+import server
+from concurrency import ConcurrencyLimiter
+
+TOKENS = ["Art", "ists: ", "275"]
+
+class FakeGraph:
+    """Streams answer tokens like the compiled graph; with `hold` set it stalls after the first one"""
+
+    def __init__(self, hold=None):
+        self.hold = hold
+        self.closed = False
+
+    async def astream(self, inputs, stream_mode):
+        try:
+            for token in TOKENS:
+                yield "messages", (AIMessageChunk(content=token), {"langgraph_node": "generate_answer"})
+                if self.hold is not None:
+                    await self.hold.wait()
+            yield "updates", {"generate_answer": {"answer": "".join(TOKENS), "answer_path": "llm"}}
+        finally:
+            self.closed = True
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_waiting=0, wait_timeout=1)
+    monkeypatch.setattr(chain, "get_context", lambda: type("Context", (), {"limiter": limiter})())
+    return limiter
+
+def parse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+def test_tokens_stream_in_order(limiter, monkeypatch):
+    monkeypatch.setattr(chain, "graph_builder", FakeGraph())
+    response = TestClient(server.app).post("/ask/stream", json={"question": "How many artists?"})
+
+    events = parse_events(response.text)
+    assert [data for event, data in events if event == "token"] == TOKENS
+    assert events[-1][0] == "done"
+    assert events[-1][1]["answer"] == "Artists: 275"
+    assert limiter.stats()["active"] == 0 and limiter.stats()["completed"] == 1
+
+def test_disconnect_while_waiting_releases_the_limiter(limiter, monkeypatch):
+    async def run():
+        graph = FakeGraph(hold=asyncio.Event())
+        monkeypatch.setattr(chain, "graph_builder", graph)
+        response = await server.ask_stream(server.Question(question="How many artists?"))
+        assert limiter.active == 1
+
+        async def send(message):
+            pass
+
+        # Starlette cancels the streaming task when the client goes away
+        task = asyncio.create_task(response.stream_response(send))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Checked while the response is still referenced, before the loop finalizes leftover generators
+        assert graph.closed
+        assert limiter.stats()["active"] == 0
+
+    asyncio.run(run())
+
+def test_failed_send_releases_the_limiter(limiter, monkeypatch):
+    async def run():
+        graph = FakeGraph(hold=asyncio.Event())
+        monkeypatch.setattr(chain, "graph_builder", graph)
+        response = await server.ask_stream(server.Question(question="How many artists?"))
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                raise OSError("client went away")
+
+        with pytest.raises(OSError):
+            await response.stream_response(send)
+        assert graph.closed
+        assert limiter.stats()["active"] == 0
+
+    asyncio.run(run())
+
+def test_use_cache_false_reaches_the_graph(limiter, monkeypatch):
+    """Load tests can send use_cache=false to run the full pipeline instead of cache lookups"""
+    inputs = []
+
+    class Graph:
+        async def ainvoke(self, state):
+            inputs.append(state)
+            return {**state, "answer": "275", "cache_hit": False}
+
+    monkeypatch.setattr(chain, "graph_builder", Graph())
+    client = TestClient(server.app)
+    body = client.post("/ask", json={"question": "How many artists?", "use_cache": False}).json()
+    assert inputs == [{"question": "How many artists?", "use_cache": False}]
+    assert body["answer"] == "275" and body["cache_hit"] is False
+    assert chain.lookup_query({"question": "How many artists?", "use_cache": False})["cache_hit"] is False
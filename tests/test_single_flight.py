@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from single_flight import SingleFlight
+
+def test_threads_share_one_call():
+    flight = SingleFlight()
+    runs = []
+
+    def slow():
+        runs.append(1)
+        time.sleep(0.2)
+        return "SELECT 1"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("q", slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["SELECT 1"] * 5
+    assert len(runs) == 1
+    assert flight.stats() == {"calls": 5, "executed": 1, "coalesced": 4, "in_flight": 0}
+    # Finished calls are not cached
+    assert flight.do("q", lambda: "SELECT 2") == "SELECT 2"
+
+def test_coroutines_share_result_and_errors():
+    flight = SingleFlight()
+    runs = []
+
+    async def slow():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return 3
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    async def main():
+        assert await asyncio.gather(*(flight.ado("q", slow) for _ in range(4))) == [3] * 4
+        errors = await asyncio.gather(*(flight.ado("bad", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(error, ValueError) for error in errors)
+
+    asyncio.run(main())
+    assert len(runs) == 1
+    assert flight.stats()["coalesced"] == 5
+
+def test_cancelled_caller_does_not_cancel_others():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    async def main():
+        first = asyncio.ensure_future(flight.ado("q", slow))
+        second = asyncio.ensure_future(flight.ado("q", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == "ok"
+
+    asyncio.run(main())
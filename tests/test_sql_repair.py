@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import pytest
+import sqlalchemy
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from query_guard import QueryRejected, rewrite_query
+from sql_repair import can_repair, classify_error, error_message, is_repairable
+
+def database_error(query):
+    engine = sqlalchemy.create_engine("sqlite://")
+    with engine.connect() as conn:
+        conn.exec_driver_sql("CREATE TABLE artist (artist_id INTEGER, name TEXT)")
+        conn.exec_driver_sql("CREATE TABLE album (album_id INTEGER, artist_id INTEGER)")
+        try:
+            conn.execute(sqlalchemy.text(query))
+        except sqlalchemy.exc.SQLAlchemyError as e:
+            return e
+    raise AssertionError(f"{query} did not fail")
+
+@pytest.mark.parametrize("query, kind", [
+    ("SELECT title FROM artist", "undefined_column"),
+    ("SELECT * FROM artists", "undefined_table"),
+    ("SELECT artist_id FROM artist JOIN album USING (album_id)", "undefined_column"),
+    ("SELECT artist_id FROM artist, album", "ambiguous_column"),
+    ("SELECT name FROM artist WHERE", "syntax"),
+    ("SELECT no_such_fn(name) FROM artist", "undefined_function"),
+])
+def test_classify_database_errors(query, kind):
+    error = database_error(query)
+    assert classify_error(error) == kind
+    assert is_repairable(kind)
+    assert "\n" not in error_message(error)
+
+def test_guard_rejections():
+    with pytest.raises(QueryRejected) as parse_error:
+        rewrite_query("SELEC name FROM artist")
+    assert classify_error(parse_error.value) == "syntax"
+
+    with pytest.raises(QueryRejected) as unsafe:
+        rewrite_query("DELETE FROM artist")
+    assert classify_error(unsafe.value) == "rejected"
+    assert not is_repairable("rejected")
+
+def test_unrepairable_errors():
+    class DriverError(Exception):
+        pgcode = "57014"
+
+    timeout = sqlalchemy.exc.OperationalError("SELECT 1", {}, DriverError("canceling statement due to statement timeout"))
+    assert classify_error(timeout) == "timeout"
+    DriverError.pgcode = "08006"
+    assert classify_error(sqlalchemy.exc.OperationalError("SELECT 1", {}, DriverError("server closed"))) == "connection"
+    assert classify_error(RuntimeError("boom")) == "unknown"
+
+def test_can_repair_budget(monkeypatch):
+    monkeypatch.setenv("SQL_REPAIR_ATTEMPTS", "2")
+    monkeypatch.setenv("SQL_REPAIR_BUDGET", "5")
+    state = {"error_kind": "undefined_column", "attempts": 0, "started": time.monotonic()}
+    assert can_repair(state)
+    assert not can_repair({**state, "attempts": 2})
+    assert not can_repair({**state, "started": time.monotonic() - 10})
+    assert not can_repair({**state, "error_kind": "timeout"})
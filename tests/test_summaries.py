@@ -0,0 +1,86 @@
+import os
+import sys
+import sqlalchemy
+from langchain_community.utilities import SQLDatabase
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(TESTS_DIR, "..", "src"))
+sys.path.append(os.path.join(TESTS_DIR, "..", "scripts"))
+
+from chinook_dump import load_sqlite, parse_dump
+from schema_cache import SchemaCache
+from summaries import REFRESH_TABLE, SUMMARIES, create_summaries, freshness, refresh_all, refresh_summary, summary_annotations
+
+DUMP = os.path.join(TESTS_DIR, "..", "data", "Chinook_PostgreSql.sql")
+
+def make_engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{load_sqlite(parse_dump(DUMP), str(tmp_path / 'chinook.db'))}")
+    create_summaries(engine)
+    return engine
+
+def contents(engine):
+    with engine.connect() as conn:
+        return {
+            name: sorted(tuple(round(v, 2) if isinstance(v, float) else v for v in row)
+                         for row in conn.exec_driver_sql(f"SELECT * FROM {name}"))
+            for name in SUMMARIES
+        }
+
+def test_incremental_refresh_matches_full(tmp_path):
+    engine = make_engine(tmp_path)
+    assert {row["mode"] for row in refresh_all(engine)} == {"full"}
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO invoice (invoice_id, customer_id, invoice_date, billing_country, total) "
+            "VALUES (1000, 1, '2025-01-01', 'Atlantis', 3.96), (1001, 2, '2025-01-02', 'USA', 1.98)"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO invoice_line (invoice_line_id, invoice_id, track_id, unit_price, quantity) "
+            "VALUES (5000, 1000, 1, 0.99, 4), (5001, 1001, 2, 0.99, 2)"
+        )
+        conn.exec_driver_sql("INSERT INTO track (track_id, name, album_id, media_type_id, genre_id, milliseconds, unit_price) "
+                             "VALUES (9000, 'New', 1, 1, 1, 1000, 0.99)")
+
+    rows = refresh_all(engine)
+    assert {row["mode"] for row in rows} == {"incremental"}
+    incremental = contents(engine)
+    assert ("Atlantis", 1, 3.96) in incremental["summary_sales_by_country"]
+
+    refresh_all(engine, "full")
+    assert contents(engine) == incremental
+
+def test_deleted_rows_force_full_refresh(tmp_path):
+    engine = make_engine(tmp_path)
+    refresh_summary(engine, "summary_sales_by_country")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM invoice_line WHERE invoice_id = 1")
+        conn.exec_driver_sql("DELETE FROM invoice WHERE invoice_id = 1")
+
+    row = refresh_summary(engine, "summary_sales_by_country")
+    assert row["mode"] == "full"
+    assert freshness(engine)["summary_sales_by_country"]["source_rows"] == 411
+
+def test_schema_cache_advertises_fresh_summaries(tmp_path):
+    engine = make_engine(tmp_path)
+    cache = SchemaCache(SQLDatabase(engine), annotations=lambda: summary_annotations(engine))
+    names = cache.get_usable_table_names()
+    assert REFRESH_TABLE not in names
+    assert not set(SUMMARIES) & set(names)
+
+    refresh_all(engine)
+    cache.refresh_annotations()
+    assert set(SUMMARIES) <= set(cache.get_usable_table_names())
+    info = cache.get_table_info(["summary_genre_revenue"])
+    assert info.startswith("\n/* Precomputed summary: Revenue and units sold per genre")
+    assert "CREATE TABLE summary_genre_revenue" in info
+
+def test_stale_summaries_are_hidden(tmp_path):
+    engine = make_engine(tmp_path)
+    refresh_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"UPDATE {REFRESH_TABLE} SET refreshed_at = refreshed_at - 7200 WHERE name = 'summary_artist_tracks'")
+
+    notes, hidden = summary_annotations(engine, max_age=3600)
+    assert hidden == {REFRESH_TABLE, "summary_artist_tracks"}
+    assert set(notes) == {"summary_sales_by_country", "summary_genre_revenue"}
@@ -0,0 +1,51 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from table_selector import TableSelector
+
+TABLES = {
+    "artist": "CREATE TABLE artist (artist_id INT, name VARCHAR(120))",
+    "album": "CREATE TABLE album (album_id INT, title VARCHAR(160), artist_id INT REFERENCES artist (artist_id))",
+    "genre": "CREATE TABLE genre (genre_id INT, name VARCHAR(120))",
+    "track": "CREATE TABLE track (track_id INT, name VARCHAR(200), album_id INT REFERENCES album (album_id), "
+             "genre_id INT REFERENCES genre (genre_id), milliseconds INT)",
+    "employee": "CREATE TABLE employee (employee_id INT, last_name VARCHAR(20), hire_date TIMESTAMP)",
+}
+
+class Schema:
+    """The part of SchemaCache the selector uses"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.current_fingerprint = "v1"
+
+    def get_usable_table_names(self):
+        return list(self.tables)
+
+    def get_table_info(self, names):
+        return "\n\n".join(self.tables[name] for name in names)
+
+def test_selects_tables_named_by_the_question():
+    selector = TableSelector(Schema(TABLES), top_k=1)
+    assert selector.select("When was each employee hired?") == ["employee"]
+
+def test_referenced_tables_are_pulled_in():
+    selector = TableSelector(Schema(TABLES), top_k=1)
+    # track references album and genre, so both come along for the joins
+    assert selector.select("Which song is the longest?") == ["album", "genre", "track"]
+    assert selector.neighbors(["album"]) == {"artist", "track"}
+
+def test_unmatched_question_falls_back_to_all_tables():
+    selector = TableSelector(Schema(TABLES))
+    assert selector.select("xyzzy plugh") == list(TABLES)
+
+def test_index_is_rebuilt_when_the_schema_changes():
+    schema = Schema(dict(TABLES))
+    selector = TableSelector(schema, top_k=1)
+    assert selector.select("every playlist") == list(TABLES)
+
+    schema.tables["playlist"] = "CREATE TABLE playlist (playlist_id INT, name VARCHAR(120))"
+    schema.current_fingerprint = "v2"
+    assert selector.select("every playlist") == ["playlist"]
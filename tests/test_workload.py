@@ -0,0 +1,72 @@
+import os
+import sys
+import sqlalchemy
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from index_advisor import advise, candidate_columns, existing_indexes, has_parameters, is_summary_query, what_if
+from workload import WorkloadRecorder, aggregate, parameterize, read_workload
+
+SCHEMA = {
+    "track": {"track_id", "name", "album_id", "genre_id", "unit_price"},
+    "album": {"album_id", "title", "artist_id"},
+    "genre": {"genre_id", "name"},
+}
+
+def test_parameterize_groups_by_shape():
+    a = parameterize("select name from track where genre_id = 1 and name like 'A%' limit 5")
+    b = parameterize("SELECT name FROM track WHERE genre_id = 7 AND name LIKE 'B%' LIMIT 5")
+    assert a == b == "SELECT name FROM track WHERE genre_id = %s AND name LIKE %s LIMIT 5"
+
+def test_recorder_and_aggregate(tmp_path):
+    path = str(tmp_path / "workload.jsonl")
+    recorder = WorkloadRecorder(path=path)
+    recorder.record("SELECT * FROM track WHERE album_id = 1", "postgres", 5.0, 10)
+    recorder.record("SELECT * FROM track WHERE album_id = 2", "postgres", 15.0, 12)
+    recorder.record("SELECT COUNT(*) FROM genre", "postgres", 1.0, 1)
+    recorder.close()
+
+    groups = aggregate(read_workload(path))
+    assert [group["count"] for group in groups] == [2, 1]
+    assert groups[0]["total_ms"] == 20.0
+    assert groups[0]["mean_rows"] == 11
+    assert groups[0]["example"] == "SELECT * FROM track WHERE album_id = 2"
+
+def test_candidate_columns():
+    query = """
+        SELECT g.name, COUNT(*) FROM track t
+        JOIN genre g ON g.genre_id = t.genre_id
+        WHERE unit_price > 0.99 AND LOWER(t.name) = 'x'
+        GROUP BY g.name
+    """
+    assert candidate_columns(query, "postgres", SCHEMA) == [
+        ("track", "unit_price"), ("genre", "genre_id"), ("track", "genre_id"),
+    ]
+
+def test_summary_query_detection():
+    summary = "SELECT g.name, COUNT(*) FROM track t JOIN genre g ON g.genre_id = t.genre_id GROUP BY g.name LIMIT 10"
+    assert is_summary_query(summary, "postgres")
+    assert not has_parameters(summary, "postgres")
+    assert has_parameters("SELECT COUNT(*) FROM track WHERE genre_id = 3", "postgres")
+    assert not is_summary_query("SELECT COUNT(*) FROM track", "postgres")
+
+def test_what_if_on_sqlite_leaves_no_index(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE track (track_id INTEGER PRIMARY KEY, genre_id INTEGER)")
+        conn.exec_driver_sql(
+            "INSERT INTO track (genre_id) "
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 50000) SELECT i % 500 FROM n"
+        )
+
+    before, after = what_if(engine, "SELECT COUNT(*) FROM track WHERE genre_id = 7", "track", "genre_id")
+    assert before > 0 and after > 0
+    assert existing_indexes(engine)["track"] == {"track_id"}
+
+    groups = [{
+        "fingerprint": "f", "sql": "", "example": "SELECT COUNT(*) FROM track WHERE genre_id = 7",
+        "count": 3, "total_ms": 3 * before, "mean_ms": before,
+    }]
+    proposals = advise(engine, groups)
+    assert [proposal["sql"] for proposal in proposals] == ["CREATE INDEX ON track (genre_id)"]
+    assert proposals[0]["estimated_saving_ms"] is None